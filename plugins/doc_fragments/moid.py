@@ -34,6 +34,8 @@ class ModuleDocFragment(object):
                 - The file will be stored on the host that run the module.
                 - If the value is not specified in the task, the value of environment variable
                   C(VMWARE_REST_LOG_FILE) will be used instead.
+                - If the file name ends with C(.jsonl), each request is recorded as a JSON document
+                  with its answer and its timing.
             type: str
         vcenter_username:
             description:
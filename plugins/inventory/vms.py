@@ -0,0 +1,329 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+
+DOCUMENTATION = r"""
+name: vms
+short_description: vSphere virtual machines inventory source using vCenter REST API
+description:
+    - Returns the virtual machines of a vCenter as inventory hosts.
+    - The host variables are the fields of the virtual machine list, like C(vm) or
+      C(power_state), with the name of the virtual machine as C(vm_name).
+    - The guest identity and the guest network interfaces of the powered on virtual
+      machines are fetched concurrently.
+    - The result can be stored in the Ansible inventory cache, the following runs
+      then load the inventory without any request to the vCenter.
+    - The C(compose), C(groups), C(keyed_groups) and C(filters) are evaluated locally,
+      on the cached result too.
+    - Uses a YAML configuration file that ends with C(vms.yml) or C(vms.yaml).
+author:
+    - Ansible Cloud Team (@ansible-collections)
+version_added: 2.2.0
+requirements:
+    - vSphere 7.0.2 or greater
+    - python >= 3.6
+    - aiohttp
+extends_documentation_fragment:
+    - constructed
+    - inventory_cache
+options:
+    plugin:
+        description: Token that ensures this is a source file for the plugin.
+        required: true
+        choices: ['vmware.vmware_rest.vms']
+    vcenter_hostname:
+        description:
+            - The hostname or IP address of the vSphere vCenter.
+        required: true
+        type: str
+        env:
+            - name: VMWARE_HOST
+    vcenter_username:
+        description:
+            - The vSphere vCenter username.
+        required: true
+        type: str
+        env:
+            - name: VMWARE_USER
+    vcenter_password:
+        description:
+            - The vSphere vCenter password.
+        required: true
+        type: str
+        env:
+            - name: VMWARE_PASSWORD
+    vcenter_validate_certs:
+        description:
+            - Allows connection when SSL certificates are not valid. Set to C(false) when
+              certificates are not trusted.
+        default: true
+        type: bool
+        env:
+            - name: VMWARE_VALIDATE_CERTS
+    vcenter_rest_log_file:
+        description:
+            - You can use this optional parameter to set the location of a log file.
+            - This file will be used to record the HTTP REST interaction.
+            - If the file name ends with C(.jsonl), each request is recorded as a JSON document
+              with its answer and its timing.
+        type: str
+        env:
+            - name: VMWARE_REST_LOG_FILE
+    list_filters:
+        description:
+            - The filters of the virtual machine list, applied by the vCenter, e.g
+              C(clusters), C(datacenters), C(folders), C(hosts), C(names), C(power_states)
+              or C(resource_pools).
+            - When vCenter refuses to list that many virtual machines, the list is split
+              by datacenter, then by host.
+        type: dict
+        default: {}
+    properties:
+        description:
+            - The details to fetch for each virtual machine, on top of the list summary.
+            - C(identity) is the guest identity, exposed as C(guest_identity).
+            - C(interfaces) is the list of the guest network interfaces, exposed as
+              C(guest_interfaces).
+            - C(detail) is the full description of the virtual machine, exposed as
+              C(vm_detail).
+            - The guest details need the VMware Tools, they are only fetched for the
+              powered on virtual machines and are C(null) when the tools don't run.
+        type: list
+        elements: str
+        choices: ['detail', 'identity', 'interfaces']
+        default: ['identity', 'interfaces']
+    hostnames:
+        description:
+            - The Jinja2 expressions evaluated to name each host. The first one that
+              returns a non-empty value is used.
+            - The moid of the virtual machine is used if none of them does.
+        type: list
+        elements: str
+        default: ['vm_name']
+    filters:
+        description:
+            - The Jinja2 conditionals that a host must all pass to be added to the inventory.
+            - They are evaluated locally, with the host variables.
+        type: list
+        elements: str
+        default: []
+    max_concurrent_requests:
+        description:
+            - The maximum number of detail requests sent to the vCenter at the same time.
+        type: int
+        default: 16
+"""
+
+
+EXAMPLES = r"""
+# vms.yml
+plugin: vmware.vmware_rest.vms
+vcenter_hostname: vcenter.test
+vcenter_username: administrator@vsphere.local
+vcenter_password: "1234"
+list_filters:
+  datacenters: [datacenter-1001]
+hostnames:
+  - guest_identity.host_name
+  - vm_name
+filters:
+  - power_state == "POWERED_ON"
+keyed_groups:
+  - key: guest_identity.family | default("unknown")
+    prefix: family
+compose:
+  ansible_user: "'root'"
+cache: true
+cache_plugin: ansible.builtin.jsonfile
+cache_connection: /tmp/vmware_rest_inventory
+cache_timeout: 3600
+"""
+
+
+import asyncio
+import re
+import urllib.parse
+
+from ansible.errors import AnsibleParserError
+from ansible.module_utils._text import to_native
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.plugins.inventory import BaseInventoryPlugin, Cacheable, Constructable
+
+from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
+    build_full_device_list,
+    gather_bounded,
+    get_vm_sub_resource,
+    list_sharded,
+    open_session,
+    VM_LIST_SHARDS,
+    VM_SUB_RESOURCES,
+)
+
+
+# The guest details, by name of the properties option, and the host
+# variable that exposes them, named after the VM sub-resource
+GUEST_PROPERTIES = {
+    "identity": "guest_identity",
+    "interfaces": "guest_interfaces",
+}
+
+
+# The hostnames like guest_identity.host_name are resolved without Jinja2, the
+# compilation of an expression costs more than a millisecond, for each host.
+VARIABLE_PATH = re.compile(r"^[A-Za-z_]\w*(\.[A-Za-z_]\w*)*$")
+
+
+def get_variable(variables, path):
+    for key in path.split("."):
+        if not isinstance(variables, dict):
+            return None
+        variables = variables.get(key)
+    return variables
+
+
+class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
+
+    NAME = "vmware.vmware_rest.vms"
+
+    def verify_file(self, path):
+        return super().verify_file(path) and path.endswith(("vms.yml", "vms.yaml"))
+
+    def parse(self, inventory, loader, path, cache=True):
+        super().parse(inventory, loader, path, cache=cache)
+        self._read_config_data(path)
+
+        cache_key = self.get_cache_key(path)
+        use_cache = self.get_option("cache") and cache
+        update_cache = self.get_option("cache") and not cache
+
+        vms = None
+        if use_cache:
+            try:
+                vms = self._cache[cache_key]
+            except KeyError:
+                update_cache = True
+        if vms is None:
+            vms = self.fetch_vms()
+        if update_cache:
+            self._cache[cache_key] = vms
+
+        self.populate(vms)
+
+    def fetch_vms(self):
+        # The inventory runs in the controller, outside of the turbo daemon,
+        # the sessions are only kept for this run.
+        loop = asyncio.new_event_loop()
+        pool, open_session._pool = open_session._pool, {}
+        try:
+            return loop.run_until_complete(self._fetch_vms())
+        except AnsibleParserError:
+            raise
+        except Exception as e:  # pylint: disable=broad-except
+            raise AnsibleParserError(
+                f"Failed to list the virtual machines: {to_native(e)}"
+            )
+        finally:
+            for session in open_session._pool.values():
+                connector = session.connector
+                loop.run_until_complete(session.close())
+                loop.run_until_complete(connector.close())
+            open_session._pool = pool
+            loop.close()
+
+    async def _fetch_vms(self):
+        session = await open_session(
+            vcenter_hostname=self.get_option("vcenter_hostname"),
+            vcenter_username=self.get_option("vcenter_username"),
+            vcenter_password=self.get_option("vcenter_password"),
+            validate_certs=self.get_option("vcenter_validate_certs"),
+            log_file=self.get_option("vcenter_rest_log_file"),
+        )
+        url = "https://{vcenter_hostname}/api/vcenter/vm".format(
+            vcenter_hostname=self.get_option("vcenter_hostname")
+        )
+        query = urllib.parse.urlencode(self.get_option("list_filters"), doseq=True)
+        status, vms = await list_sharded(
+            session, f"{url}?{query}", "vm", VM_LIST_SHARDS
+        )
+        if status != 200:
+            messages = vms.get("messages", []) if isinstance(vms, dict) else []
+            raise AnsibleParserError(
+                "Failed to list the virtual machines: {0}".format(
+                    " ".join(i.get("default_message", "") for i in messages) or status
+                )
+            )
+
+        limit = self.get_option("max_concurrent_requests")
+        properties = self.get_option("properties")
+        powered_on = [i["vm"] for i in vms if i.get("power_state") == "POWERED_ON"]
+        # name is a reserved host variable
+        hostvars = {
+            i["vm"]: {"vm_name" if k == "name" else k: v for k, v in i.items()}
+            for i in vms
+        }
+        if "detail" in properties:
+            details = await build_full_device_list(
+                session, url, [{"vm": i} for i in hostvars], limit
+            )
+            for vm, detail in zip(hostvars.values(), details):
+                vm["vm_detail"] = detail and detail["value"]
+
+        selected = [v for k, v in GUEST_PROPERTIES.items() if k in properties]
+        for vm in hostvars.values():
+            vm.update(dict.fromkeys(selected))
+        guest = [(vm_id, var) for var in selected for vm_id in powered_on]
+        values = await gather_bounded(
+            (
+                get_vm_sub_resource(session, url, vm_id, VM_SUB_RESOURCES[var])
+                for vm_id, var in guest
+            ),
+            limit,
+        )
+        for (vm_id, var), value in zip(guest, values):
+            hostvars[vm_id][var] = value
+        return list(hostvars.values())
+
+    def host_name(self, vm):
+        for expression in self.get_option("hostnames"):
+            if VARIABLE_PATH.match(expression):
+                name = get_variable(vm, expression)
+            else:
+                try:
+                    name = self._compose(expression, vm)
+                except Exception:  # pylint: disable=broad-except
+                    continue
+            if name:
+                return to_native(name)
+        return vm["vm"]
+
+    def populate(self, vms):
+        strict = self.get_option("strict")
+        filters = self.get_option("filters")
+        for vm in vms:
+            hostvars = dict(vm)
+            ip_address = (hostvars.get("guest_identity") or {}).get("ip_address")
+            if ip_address:
+                hostvars["ansible_host"] = ip_address
+            if not all(
+                boolean(self._compose(i, hostvars), strict=False) for i in filters
+            ):
+                continue
+
+            host = self.host_name(hostvars)
+            self.inventory.add_host(host)
+            for k, v in hostvars.items():
+                self.inventory.set_variable(host, k, v)
+            self._set_composite_vars(
+                self.get_option("compose"), hostvars, host, strict=strict
+            )
+            self._add_host_to_composed_groups(
+                self.get_option("groups"), hostvars, host, strict=strict
+            )
+            self._add_host_to_keyed_groups(
+                self.get_option("keyed_groups"), hostvars, host, strict=strict
+            )
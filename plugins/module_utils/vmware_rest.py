@@ -28,11 +28,22 @@
 # USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #
 
+import asyncio
+import base64
+import collections
+import filecmp
 import hashlib
 import importlib
 import json
+import operator
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
 
-from ansible.module_utils.basic import missing_required_lib
+from ansible.module_utils.basic import env_fallback, missing_required_lib
 from ansible.module_utils.parsing.convert_bool import boolean
 
 
@@ -54,8 +65,45 @@ async def open_session(
     digest = m.hexdigest()
     # TODO: Handle session timeout
     if digest in open_session._pool:
-        return open_session._pool[digest]
+        return RequestScope(
+            open_session._pool[digest], open_session._renewals.get(digest)
+        )
 
+    # The concurrent invocations wait for the same authentication
+    if digest not in open_session._pending:
+        open_session._pending[digest] = asyncio.ensure_future(
+            create_session(
+                vcenter_hostname,
+                vcenter_username,
+                vcenter_password,
+                validate_certs,
+                log_file,
+                digest,
+            )
+        )
+    try:
+        session = await asyncio.shield(open_session._pending[digest])
+    finally:
+        open_session._pending.pop(digest, None)
+    open_session._pool[digest] = session
+    return RequestScope(session, open_session._renewals.get(digest))
+
+
+open_session._pool = {}
+open_session._pending = {}
+# The SessionRenewal of the pooled sessions whose ID comes from the session
+# cache and has not been accepted by vCenter yet
+open_session._renewals = {}
+
+
+async def create_session(
+    vcenter_hostname,
+    vcenter_username,
+    vcenter_password,
+    validate_certs,
+    log_file,
+    digest,
+):
     exceptions = importlib.import_module(
         "ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions"
     )
@@ -68,28 +116,65 @@ async def open_session(
         raise exceptions.EmbeddedModuleFailure(msg="Failed to import aiohttp")
 
     if log_file:
-        trace_config = aiohttp.TraceConfig()
-
-        async def on_request_end(session, trace_config_ctx, params):
-            with open(log_file, "a+", encoding="utf-8") as fd:
-                answer = await params.response.text()
-                fd.write(
-                    f"{params.method}: {params.url}\n"
-                    f"headers: {params.headers}\n"
-                    f"  status: {params.response.status}\n"
-                    f"  answer: {answer}\n\n"
-                )
-
-        trace_config.on_request_end.append(on_request_end)
-        trace_configs = [trace_config]
+        trace_configs = [trace_config(aiohttp, log_file)]
     else:
         trace_configs = []
 
-    auth = aiohttp.BasicAuth(vcenter_username, vcenter_password)
     if validate_certs:
         connector = aiohttp.TCPConnector(limit=20)
     else:
         connector = aiohttp.TCPConnector(limit=20, ssl=False)
+
+    async def login():
+        return await authenticate(
+            aiohttp,
+            exceptions,
+            connector,
+            trace_configs,
+            vcenter_hostname,
+            vcenter_username,
+            vcenter_password,
+        )
+
+    def client_session(session_id):
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers={
+                "vmware-api-session-id": session_id,
+                "content-type": "application/json",
+            },
+            connector_owner=False,
+            trace_configs=trace_configs,
+        )
+
+    cache_dir = os.environ.get("VMWARE_REST_SESSION_CACHE")
+    if not cache_dir:
+        return client_session(await login())
+
+    session_id, cached = await cached_session_id(cache_dir, digest, login)
+    if cached:
+
+        async def renew():
+            new_session_id, _ = await cached_session_id(
+                cache_dir, digest, login, stale=session_id
+            )
+            return client_session(new_session_id)
+
+        open_session._renewals[digest] = SessionRenewal(digest, renew)
+    return client_session(session_id)
+
+
+async def authenticate(
+    aiohttp,
+    exceptions,
+    connector,
+    trace_configs,
+    vcenter_hostname,
+    vcenter_username,
+    vcenter_password,
+):
+    """Open a vCenter session, return its ID."""
+    auth = aiohttp.BasicAuth(vcenter_username, vcenter_password)
     async with aiohttp.ClientSession(
         connector=connector, connector_owner=False, trace_configs=trace_configs
     ) as session:
@@ -109,22 +194,459 @@ async def open_session(
                 json = await resp.json()
         except aiohttp.client_exceptions.ClientConnectorError as e:
             raise exceptions.EmbeddedModuleFailure(f"Authentication failure: {e}")
+    return json["value"]
+
+
+# The idle time after which the cached session IDs are not tried anymore,
+# vCenter expires the sessions after 30 minutes of inactivity by default
+SESSION_CACHE_TTL = 25 * 60
+
+
+async def lock_file(fd):
+    """Wait for an exclusive lock of fd, without blocking the event loop."""
+    import fcntl
+
+    while True:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            await asyncio.sleep(0.05)
+
+
+async def cached_session_id(cache_dir, digest, login, stale=None):
+    """Return the session ID cached in cache_dir for digest, or the ID of a
+    new session opened by login(), and whether it comes from the cache.
+
+    The cached ID is not checked, vCenter may have closed the session, see
+    SessionRenewal. stale is an ID that vCenter has rejected, it is replaced
+    unless another task already did it.
+
+    The cache file of each digest is only readable by its owner, and locked
+    during the login, the concurrent tasks wait for the same session.
+    """
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    path = os.path.join(cache_dir, f"{digest}.json")
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        os.fchmod(fd, 0o600)
+        await lock_file(fd)
+        try:
+            cache = json.loads(os.read(fd, 4096) or b"{}")
+        except ValueError:
+            cache = {}
+        session_id = cache.get("session_id")
+        cached = bool(
+            session_id and session_id != stale and cache.get("expires", 0) > time.time()
+        )
+        if not cached:
+            session_id = await login()
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        os.write(
+            fd,
+            json.dumps(
+                {"session_id": session_id, "expires": time.time() + SESSION_CACHE_TTL}
+            ).encode(),
+        )
+        return session_id, cached
+    finally:
+        # closing the file releases the lock
+        os.close(fd)
+
+
+class SessionRenewal:
+    """The replacement of a pooled session whose ID comes from the session
+    cache, in case vCenter has closed it since.
+
+    Instead of checking the ID first, the requests are sent, the first 401
+    answer opens a new session, once for all the concurrent requests, and
+    they are sent again. The first other answer proves that the ID is valid,
+    the requests are then sent as usual.
+    """
+
+    def __init__(self, digest, renew):
+        self.digest = digest
+        self._renew = renew
+        self._future = None
+
+    @property
+    def done(self):
+        return open_session._renewals.get(self.digest) is not self
+
+    def accept(self):
+        """vCenter has accepted the cached ID."""
+        if not self.done and self._future is None:
+            del open_session._renewals[self.digest]
+
+    async def session(self):
+        """The new pooled session."""
+        if self._future is None:
+            self._future = asyncio.ensure_future(self._replace())
+        return await asyncio.shield(self._future)
 
-    session_id = json["value"]
-    session = aiohttp.ClientSession(
-        connector=connector,
-        headers={
-            "vmware-api-session-id": session_id,
-            "content-type": "application/json",
-        },
-        connector_owner=False,
-        trace_configs=trace_configs,
+    async def _replace(self):
+        session = await self._renew()
+        previous = open_session._pool.get(self.digest)
+        open_session._pool[self.digest] = session
+        open_session._renewals.pop(self.digest, None)
+        if previous:
+            await previous.close()
+        return session
+
+
+# The request and answer bodies above this size are not recorded
+RECORD_MAX_BODY = 1 << 20
+RECORD_REDACTED_HEADERS = {"authorization", "vmware-api-session-id"}
+RECORD_SESSION_PATHS = {"/rest/com/vmware/cis/session", "/api/session"}
+# The keys of the JSON bodies that are not recorded, the no_log options
+RECORD_REDACTED_KEYS = {
+    "client_token",
+    "encryption_key",
+    "password",
+    "user_name",
+    "username",
+}
+
+
+def is_text_answer(response):
+    content_type = response.headers.get("Content-Type", "")
+    return content_type.startswith(("application/json", "text/"))
+
+
+def record_headers(headers):
+    return [
+        [k, "REDACTED" if k.lower() in RECORD_REDACTED_HEADERS else v]
+        for k, v in headers.items()
+    ]
+
+
+def redact_keys(data):
+    """data without the values of the RECORD_REDACTED_KEYS."""
+    if isinstance(data, dict):
+        return {
+            k: "REDACTED" if k in RECORD_REDACTED_KEYS else redact_keys(v)
+            for k, v in data.items()
+        }
+    if isinstance(data, list):
+        return [redact_keys(i) for i in data]
+    return data
+
+
+def record_body(chunks, size):
+    if size > RECORD_MAX_BODY:
+        return {"size": size}
+    body = b"".join(chunks)
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"size": size, "base64": base64.b64encode(body).decode()}
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {"size": size, "text": text}
+    redacted = redact_keys(data)
+    if redacted != data:
+        text = json.dumps(redacted)
+    return {"size": size, "text": text}
+
+
+def open_log_file(log_file):
+    """Open log_file to append a record, the file is created with the 0600
+    mode, it may hold the answers of vCenter."""
+    fd = os.open(log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    return open(fd, "a", encoding="utf-8")
+
+
+def trace_config(aiohttp, log_file):
+    """Record the HTTP interaction in log_file.
+
+    When the name of the file ends with .jsonl, each request is written as a
+    JSON document with its headers, its body, the answer and the timing. Such
+    a recording can be served again by tests/simulator/replay.py. The binary
+    answers, e.g: a file download, are not read to keep them streamed. The
+    credentials, the session IDs and the RECORD_REDACTED_KEYS of the JSON
+    bodies are replaced by REDACTED.
+    """
+    config = aiohttp.TraceConfig()
+    structured = log_file.endswith(".jsonl")
+
+    async def on_request_start(session, trace_config_ctx, params):
+        trace_config_ctx.started = time.time()
+        trace_config_ctx.clock = time.monotonic()
+        trace_config_ctx.chunks = []
+        trace_config_ctx.size = 0
+
+    async def on_request_chunk_sent(session, trace_config_ctx, params):
+        trace_config_ctx.size += len(params.chunk)
+        if trace_config_ctx.size <= RECORD_MAX_BODY:
+            trace_config_ctx.chunks.append(params.chunk)
+
+    async def on_request_end(session, trace_config_ctx, params):
+        response = params.response
+        # read() keeps the body around for the caller
+        answer = await response.read() if is_text_answer(response) else None
+        elapsed = time.monotonic() - trace_config_ctx.clock
+        if not structured:
+            text = await response.text() if answer is not None else "<stream>"
+            with open_log_file(log_file) as fd:
+                fd.write(
+                    f"{params.method}: {params.url}\n"
+                    f"headers: {params.headers}\n"
+                    f"  status: {response.status}\n"
+                    f"  answer: {text}\n\n"
+                )
+            return
+        if (
+            answer
+            and params.method == "POST"
+            and response.status < 300
+            and params.url.path in RECORD_SESSION_PATHS
+        ):
+            # Don't leave a valid session ID in the recording
+            token = json.loads(answer)
+            answer = json.dumps(
+                {"value": "REDACTED"} if isinstance(token, dict) else "REDACTED"
+            ).encode()
+        record = {
+            "time": trace_config_ctx.started,
+            "elapsed": round(elapsed, 6),
+            "method": params.method,
+            "url": str(params.url),
+            "request": {
+                "headers": record_headers(params.headers),
+                "body": record_body(trace_config_ctx.chunks, trace_config_ctx.size),
+            },
+            "status": response.status,
+            "response": {
+                "headers": record_headers(response.headers),
+                "body": record_body([answer], len(answer))
+                if answer is not None
+                else {"size": response.content_length},
+            },
+        }
+        with open_log_file(log_file) as fd:
+            fd.write(json.dumps(record) + "\n")
+
+    config.on_request_start.append(on_request_start)
+    config.on_request_chunk_sent.append(on_request_chunk_sent)
+    config.on_request_end.append(on_request_end)
+    return config
+
+
+# The interval of the stack sampler of profile(), in seconds
+PROFILE_SAMPLE_INTERVAL = 0.001
+
+
+def sample_stacks(thread_id, stop, stacks):
+    """Count the stacks of the thread until stop is set, in the collapsed
+    format of flamegraph.pl."""
+    while not stop.wait(PROFILE_SAMPLE_INTERVAL):
+        frame = sys._current_frames().get(thread_id)
+        names = []
+        while frame:
+            code = frame.f_code
+            names.append(
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+            )
+            frame = frame.f_back
+        if names:
+            stacks[";".join(reversed(names))] += 1
+
+
+async def profile(name, coroutine):
+    """Await coroutine, under cProfile and a stack sampler when the
+    VMWARE_REST_PROFILE_DIR environment variable is set.
+
+    Each invocation writes a <name>-<time>-<pid>-<n>.pstats file, for pstats or
+    snakeviz, and a .collapsed file, for flamegraph.pl or speedscope. The
+    daemon runs the other invocations on the same event loop, they show up in
+    the profiles, and only one invocation at a time is profiled.
+    """
+    profile_dir = os.environ.get("VMWARE_REST_PROFILE_DIR")
+    if not profile_dir or profile.active:
+        return await coroutine
+
+    import cProfile
+
+    profile.active = True
+    profile.count += 1
+    profiler = cProfile.Profile()
+    stacks = collections.Counter()
+    stop = threading.Event()
+    sampler = threading.Thread(
+        target=sample_stacks, args=(threading.get_ident(), stop, stacks), daemon=True
     )
-    open_session._pool[digest] = session
-    return session
+    sampler.start()
+    profiler.enable()
+    try:
+        return await coroutine
+    finally:
+        profiler.disable()
+        stop.set()
+        sampler.join()
+        profile.active = False
+        os.makedirs(profile_dir, exist_ok=True)
+        prefix = os.path.join(
+            profile_dir,
+            f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{profile.count}",
+        )
+        profiler.dump_stats(prefix + ".pstats")
+        with open(prefix + ".collapsed", "w", encoding="utf-8") as fd:
+            for stack, count in stacks.items():
+                fd.write(f"{stack} {count}\n")
 
 
-open_session._pool = {}
+profile.active = False
+profile.count = 0
+
+
+class _Flight:
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+
+
+class _MemoizedGet:
+    def __init__(self, scope, url, kwargs):
+        self._scope = scope
+        self._url = url
+        self._kwargs = kwargs
+
+    async def __aenter__(self):
+        return await self._scope._fetch(self._url, self._kwargs)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class _RenewedRequest:
+    """A request sent again with a new session if vCenter rejects the cached
+    session ID, see SessionRenewal. A streamed body can't be sent twice, its
+    401 answer is returned."""
+
+    def __init__(self, scope, method, url, kwargs):
+        self._scope = scope
+        self._method = method
+        self._url = url
+        self._kwargs = kwargs
+        self._resp = None
+
+    async def __aenter__(self):
+        scope = self._scope
+        renewal = scope._renewal
+        if scope._session.closed:  # already renewed by another scope
+            scope._session = open_session._pool[renewal.digest]
+        self._resp = await scope._session.request(
+            self._method, self._url, **self._kwargs
+        )
+        if self._resp.status != 401:
+            renewal.accept()
+            return self._resp
+        data = self._kwargs.get("data")
+        if data is not None and not isinstance(data, (bytes, str, dict)):
+            return self._resp
+        self._resp.release()
+        scope._session = await renewal.session()
+        self._resp = await scope._session.request(
+            self._method, self._url, **self._kwargs
+        )
+        return self._resp
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._resp is not None:
+            self._resp.release()
+
+
+class RequestScope:
+    """Wrap the pooled session for the duration of one invocation.
+
+    Identical GET calls in flight are coalesced, and their answers are
+    memoized until a mutating call hits the same URL prefix.
+    """
+
+    def __init__(self, session, renewal=None):
+        self._session = session
+        self._renewal = renewal
+        self._flights = {}
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def request(self, method, url, **kwargs):
+        """Send the request, see SessionRenewal for a session from the cache."""
+        if self._renewal and not self._renewal.done:
+            return _RenewedRequest(self, method, url, kwargs)
+        if self._renewal and self._session.closed:
+            self._session = open_session._pool[self._renewal.digest]
+        return self._session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        # Only the plain calls are shared, e.g: a Range header changes the answer
+        if set(kwargs) - {"timeout"}:
+            return self.request("GET", url, **kwargs)
+        return _MemoizedGet(self, str(url), kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        self.invalidate(url)
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        self.invalidate(url)
+        return self.request("PATCH", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        self.invalidate(url)
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        self.invalidate(url)
+        return self.request("DELETE", url, **kwargs)
+
+    def invalidate(self, url):
+        """Forget the answers of the URLs in the same branch as url."""
+        prefix = str(url).split("?")[0].rstrip("/")
+        for cached in list(self._flights):
+            path = cached.split("?")[0].rstrip("/")
+            if path.startswith(prefix) or prefix.startswith(path):
+                del self._flights[cached]
+
+    async def _do_get(self, url, kwargs):
+        async with self.request("GET", url, **kwargs) as resp:
+            # The body stays attached to the response object, json() and
+            # text() can be called again by each consumer.
+            await resp.read()
+            return resp
+
+    async def _fetch(self, url, kwargs):
+        flight = self._flights.get(url)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(self._do_get(url, kwargs)))
+            self._flights[url] = flight
+        flight.waiters += 1
+        try:
+            resp = await asyncio.shield(flight.future)
+        except asyncio.CancelledError:
+            # Nobody else is waiting for this answer, abort the request
+            if flight.waiters == 1 and not flight.future.done():
+                flight.future.cancel()
+                self._forget(url, flight)
+            raise
+        except Exception:
+            self._forget(url, flight)
+            raise
+        finally:
+            flight.waiters -= 1
+        if resp.status >= 500:
+            self._forget(url, flight)
+        return resp
+
+    def _forget(self, url, flight):
+        if self._flights.get(url) is flight:
+            del self._flights[url]
 
 
 def gen_args(params, in_query_parameter):
@@ -279,9 +801,9 @@ async def list_devices(session, url):
         return _json
 
 
-async def build_full_device_list(session, url, device_list):
-    import asyncio
-
+def get_device_ids(device_list):
+    """Return the IDs of a list answer, or None if the entries already come
+    with the details."""
     device_ids = []
 
     if isinstance(device_list, list):
@@ -291,13 +813,35 @@ async def build_full_device_list(session, url, device_list):
     for i in value:
         # Content library returns string {"value": "library_id"}
         if isinstance(i, str):
-            device_ids = value
-            break
+            return value
         fields = list(i.values())
         if len(fields) != 1:
             # The list already comes with all the details
-            return device_list
+            return None
         device_ids.append(fields[0])
+    return device_ids
+
+
+async def gather_bounded(coroutines, limit):
+    """Like asyncio.gather(), with at most limit coroutines running at once."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(i) for i in coroutines))
+
+
+async def build_full_device_list(session, url, device_list, limit=None):
+    device_ids = get_device_ids(device_list)
+    if device_ids is None:
+        return device_list
+
+    if limit:
+        return await gather_bounded(
+            (get_device_info(session, url, _id) for _id in device_ids), limit
+        )
 
     tasks = [
         asyncio.ensure_future(get_device_info(session, url, _id)) for _id in device_ids
@@ -306,13 +850,18 @@ async def build_full_device_list(session, url, device_list):
     return [await i for i in tasks]
 
 
-async def get_device_info(session, url, _id):
+async def get_device_info(session, url, _id, memoize=True):
     # workaround for content_library_item_info
     if "item?library_id=" in url:
         item_url = url.split("?")[0] + "/" + _id
     else:
         item_url = url + "/" + _id
-    async with session.get(item_url) as resp:
+    if memoize:
+        request = session.get(item_url)
+    else:
+        # not kept by the RequestScope until the end of the invocation
+        request = session.request("GET", item_url)
+    async with request as resp:
         if resp.status == 200:
             _json = await resp.json()
             if "value" not in _json:  # 7.0.2+
@@ -321,53 +870,138 @@ async def get_device_info(session, url, _id):
             return _json
 
 
+def get_subkey(root, path):
+    cur_loc = root
+    for j in path.split("/"):
+        if not isinstance(cur_loc, dict):
+            return
+        cur_loc = cur_loc.get(j)
+    return cur_loc
+
+
+# The collections of the VM description that hold the same details as the
+# /api/vcenter/vm/{vm}/hardware/<path>/{id} end-points.
+VM_DEVICE_KEYS = {
+    "adapter/sata": "sata_adapters",
+    "adapter/scsi": "scsi_adapters",
+    "cdrom": "cdroms",
+    "disk": "disks",
+    "ethernet": "nics",
+    "floppy": "floppies",
+    "parallel": "parallel_ports",
+    "serial": "serial_ports",
+}
+
+
+async def get_vm_devices(session, url):
+    """Read the devices of a VM hardware list end-point from the VM
+    description, in a single call. Return None for the other end-points."""
+    vm_url, _, device_path = url.partition("/hardware/")
+    key = VM_DEVICE_KEYS.get(device_path)
+    if not key or "/api/vcenter/vm/" not in vm_url:
+        return
+    async with session.get(vm_url) as resp:
+        if resp.status != 200:
+            return
+        vm_info = await resp.json()
+    if "value" in vm_info:  # 7.0.2 <
+        vm_info = vm_info["value"]
+    if key not in vm_info:
+        return
+    return [{"value": v, "id": k} for k, v in (vm_info[key] or {}).items()]
+
+
+def match_device(params, device, unicity_keys):
+    for k in unicity_keys:
+        if not params.get(k):
+            continue
+        if isinstance(device, dict):  # 7.0.2 <
+            v = device["value"].get(k)
+        elif isinstance(device, list):
+            v = device
+        else:
+            exceptions = importlib.import_module(
+                "ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions"
+            )
+            raise exceptions.EmbeddedModuleFailure(msg="Unexpect type")
+
+        if isinstance(k, int) or isinstance(v, str):
+            k = str(k)
+            v = str(v)
+        if v == params.get(k):
+            return True
+    return False
+
+
 async def exists(params, session, url, unicity_keys=None):
     if not unicity_keys:
         unicity_keys = []
 
     unicity_keys += ["label", "pci_slot_number", "sata"]
 
+    # Without a value to compare with, no device can match.
+    if not any(params.get(k) for k in unicity_keys):
+        return
+
+    # The VM description comes with the details of all the devices
+    vm_devices = await get_vm_devices(session, url)
+    if vm_devices is not None:
+        for device in vm_devices:
+            if match_device(params, device, unicity_keys):
+                return device
+        return
+
     devices = await list_devices(session, url)
-    full_devices = await build_full_device_list(session, url, devices)
-
-    for device in full_devices:
-        for k in unicity_keys:
-            if not params.get(k):
-                continue
-            if isinstance(device, dict):  # 7.0.2 <
-                v = device["value"].get(k)
-            elif isinstance(device, list):
-                v = device
-            else:
-                exceptions = importlib.import_module(
-                    "ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions"
-                )
-                raise exceptions.EmbeddedModuleFailure(msg="Unexpect type")
+    device_ids = get_device_ids(devices)
+    if device_ids is None:
+        if isinstance(devices, dict):  # 7.0.2 <
+            devices = devices["value"]
+        for device in devices:
+            device = {"value": device}
+            if match_device(params, device, unicity_keys):
+                return device
+        return
 
-            if isinstance(k, int) or isinstance(v, str):
-                k = str(k)
-                v = str(v)
-            if v == params.get(k):
+    # Compare the devices as their details arrive and stop as soon as
+    # we've got a match, the pending requests are cancelled.
+    tasks = [
+        asyncio.ensure_future(get_device_info(session, url, _id)) for _id in device_ids
+    ]
+    try:
+        for next_device in asyncio.as_completed(tasks):
+            device = await next_device
+            if device and match_device(params, device, unicity_keys):
                 return device
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# The PAYLOAD_FORMAT paths, e.g: "placement/folder", split once in their
+# parent keys and their last key
+PAYLOAD_PATHS = {}
 
 
 def set_subkey(root, path, value):
+    try:
+        parents, key = PAYLOAD_PATHS[path]
+    except KeyError:
+        keys = path.split("/")
+        parents, key = PAYLOAD_PATHS[path] = (tuple(keys[:-1]), keys[-1])
     cur_loc = root
-    splitted = path.split("/")
-    for j in splitted[:-1]:
+    for j in parents:
         if j not in cur_loc:
             cur_loc[j] = {}
         cur_loc = cur_loc[j]
-    cur_loc[splitted[-1]] = value
+    cur_loc[key] = value
 
 
 def prepare_payload(params, payload_format):
     payload = {}
-    for i in payload_format["body"].keys():
+    for i, path in payload_format["body"].items():
         if params[i] is None:
             continue
-
-        path = payload_format["body"][i]
         set_subkey(payload, path, params[i])
     return payload
 
@@ -397,3 +1031,1069 @@ def get_device_type(url):
         return "port"
     else:
         return device_type
+
+
+# The units a device can use on each type of adapter, the SCSI controller
+# itself sits on the unit 7.
+ADAPTER_UNITS = {
+    "ide": [(True, True), (True, False), (False, True), (False, False)],
+    "sata": list(range(30)),
+    "scsi": [i for i in range(16) if i != 7],
+}
+
+# The keys that identify a device of the VM description beside its ID and
+# its label.
+DEVICE_ADDRESS_KEYS = {
+    "cdroms": ["ide", "sata"],
+    "disks": ["ide", "sata", "scsi"],
+    "nics": ["mac_address", "pci_slot_number"],
+    "sata_adapters": ["bus"],
+    "scsi_adapters": ["bus"],
+}
+
+
+def is_same(expected, current):
+    """Compare a declared value with the current one, the keys that are
+    not declared are ignored."""
+    if isinstance(expected, dict) and isinstance(current, dict):
+        return all(is_same(v, current.get(k)) for k, v in expected.items())
+    return expected == current
+
+
+def get_slot(bus_type, address):
+    if bus_type == "ide":
+        return (address.get("primary"), address.get("master"))
+    return (address.get("bus"), address.get("unit"))
+
+
+def plan_device_slots(vm_info, entries):
+    """Give a free adapter slot to the entries that only come with a type
+    or a bus."""
+    used = set()
+    for key in ["cdroms", "disks"]:
+        for device in (vm_info.get(key) or {}).values():
+            for bus_type in ADAPTER_UNITS:
+                if device.get(bus_type):
+                    used.add((bus_type,) + get_slot(bus_type, device[bus_type]))
+    for entry in entries:
+        for bus_type in ADAPTER_UNITS:
+            if entry.get(bus_type) and None not in get_slot(bus_type, entry[bus_type]):
+                used.add((bus_type,) + get_slot(bus_type, entry[bus_type]))
+    buses = {
+        "scsi": sorted(
+            i["scsi"]["bus"] for i in (vm_info.get("scsi_adapters") or {}).values()
+        ),
+        "sata": sorted(i["bus"] for i in (vm_info.get("sata_adapters") or {}).values()),
+    }
+
+    for entry in entries:
+        bus_type = (entry.get("type") or "").lower()
+        if bus_type not in ADAPTER_UNITS:
+            continue
+        address = entry.get(bus_type) or {}
+        if None not in get_slot(bus_type, address):
+            continue
+        if bus_type == "ide":
+            candidates = [
+                i
+                for i in ADAPTER_UNITS["ide"]
+                if address.get("primary") in [None, i[0]]
+                and address.get("master") in [None, i[1]]
+            ]
+        else:
+            if address.get("bus") is not None:
+                bus_candidates = [address["bus"]]
+            else:
+                bus_candidates = buses[bus_type]
+            candidates = [
+                (bus, unit)
+                for bus in bus_candidates
+                for unit in ADAPTER_UNITS[bus_type]
+            ]
+        slot = next((i for i in candidates if (bus_type,) + i not in used), None)
+        if slot is None:
+            exceptions = importlib.import_module(
+                "ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions"
+            )
+            raise exceptions.EmbeddedModuleFailure(
+                msg=f"No free {bus_type.upper()} slot left for {entry}"
+            )
+        used.add((bus_type,) + slot)
+        if bus_type == "ide":
+            entry["ide"] = {"primary": slot[0], "master": slot[1]}
+        else:
+            entry[bus_type] = {"bus": slot[0], "unit": slot[1]}
+
+
+def get_device_address(key, device, address_key):
+    # The SCSI adapters expose their bus through their own SCSI address
+    if key == "scsi_adapters" and address_key == "bus":
+        return (device.get("scsi") or {}).get("bus")
+    return device.get(address_key)
+
+
+def designates_device(entry, key, id_key):
+    """Whether entry designates a single device, by its ID, its label or a
+    complete address."""
+    if entry.get(id_key) or entry.get("label"):
+        return True
+    for k in DEVICE_ADDRESS_KEYS.get(key, []):
+        if entry.get(k) is None:
+            continue
+        if k not in ADAPTER_UNITS or None not in get_slot(k, entry[k]):
+            return True
+    return False
+
+
+def find_device(entry, devices, key, id_key, claimed):
+    """Return the ID of the device of the VM description that entry
+    designates."""
+    if entry.get(id_key):
+        return entry[id_key] if entry[id_key] in devices else None
+    candidates = [i for i in devices if i not in claimed]
+    if entry.get("label"):
+        for _id in candidates:
+            if devices[_id].get("label") == entry["label"]:
+                return _id
+    for k in DEVICE_ADDRESS_KEYS.get(key, []):
+        if entry.get(k) is None:
+            continue
+        if k in ADAPTER_UNITS and None in get_slot(k, entry[k]):
+            continue
+        for _id in candidates:
+            if is_same(entry[k], get_device_address(key, devices[_id], k)):
+                return _id
+
+
+async def _batch_create(params, session, url, payload):
+    async with session.post(url, json=payload, **session_timeout(params)) as resp:
+        _json = {}
+        if resp.content_type == "application/json":
+            _json = await resp.json()
+        if isinstance(_json, str):  # 7.0.2 and greater
+            _json = {"value": _json}
+        elif "value" not in _json:
+            _json = {"value": _json}
+        if resp.status in [200, 201] and isinstance(_json["value"], str):
+            _json_device_info = await get_device_info(session, url, _json["value"])
+            if _json_device_info:
+                _json = _json_device_info
+        return await update_changed_flag(_json, resp.status, "create")
+
+
+async def _batch_update(params, session, url, _id, payload):
+    _url = url + "/" + _id
+    async with session.patch(_url, json=payload, **session_timeout(params)) as resp:
+        _json = {}
+        if resp.content_type == "application/json":
+            _json = await resp.json()
+        if not _json and resp.status == 204:
+            _json = await get_device_info(session, url, _id) or {}
+        if "value" not in _json:
+            _json = {"value": _json}
+        _json["id"] = _id
+        return await update_changed_flag(_json, resp.status, "update")
+
+
+async def _batch_delete(params, session, url, _id):
+    async with session.delete(url + "/" + _id, **session_timeout(params)) as resp:
+        _json = {}
+        if resp.content_type == "application/json":
+            _json = await resp.json()
+        if "value" not in _json:
+            _json = {"value": _json}
+        _json["id"] = _id
+        return await update_changed_flag(_json, resp.status, "delete")
+
+
+async def batch_devices(module, session, url, key, payload_format):
+    """Create, update or remove all the devices listed in the key option of
+    the module, e.g: disks.
+
+    Each entry must designate a single device, by its ID, its label or a
+    complete address, see designates_device(). The virtual hardware is
+    fetched once, the entries are matched with the existing devices, the free
+    slots are assigned locally and the calls are sent concurrently. In check
+    mode, the planned calls are returned instead.
+    """
+    params = module.params
+    id_key = get_device_type(url)
+    if params["state"] not in ["absent", "present"]:
+        return {
+            "failed": True,
+            "changed": False,
+            "msg": f"{key} is only used with state=present or state=absent",
+        }
+    for entry in params[key]:
+        if not designates_device(entry, key, id_key):
+            return {
+                "failed": True,
+                "changed": False,
+                "msg": f"Each entry of {key} needs a {id_key}, a label or a complete address: {entry}",
+            }
+
+    vm_url = url.split("/hardware/")[0]
+    async with session.get(vm_url, **session_timeout(params)) as resp:
+        vm_info = await resp.json()
+        if resp.status != 200:
+            return await update_changed_flag(vm_info, resp.status, "get")
+    if "value" in vm_info:  # 7.0.2 <
+        vm_info = vm_info["value"]
+    devices = vm_info.get(key) or {}
+
+    claimed = set()
+    matches = []
+    for entry in params[key]:
+        _id = find_device(entry, devices, key, id_key, claimed)
+        if _id is not None:
+            claimed.add(_id)
+        matches.append(_id)
+
+    tasks = []
+    if params["state"] == "absent":
+        for _id in matches:
+            if _id is None:
+                tasks.append(update_changed_flag({"value": {}}, 404, "delete"))
+            elif module.check_mode:
+                _json = {"value": devices[_id], "id": _id}
+                tasks.append(update_changed_flag(_json, 204, "delete"))
+            else:
+                tasks.append(_batch_delete(params, session, url, _id))
+        return await gather_batch(tasks)
+
+    plan_device_slots(
+        vm_info, [entry for entry, _id in zip(params[key], matches) if _id is None]
+    )
+    for entry, _id in zip(params[key], matches):
+        if _id is None:
+            entry_params = {k: entry.get(k) for k in payload_format["create"]["body"]}
+            payload = prepare_payload(entry_params, payload_format["create"])
+            if module.check_mode:
+                tasks.append(update_changed_flag({"value": payload}, 201, "create"))
+            else:
+                tasks.append(_batch_create(params, session, url, payload))
+            continue
+        entry_params = {k: entry.get(k) for k in payload_format["update"]["body"]}
+        payload = prepare_payload(entry_params, payload_format["update"])
+        payload = {
+            k: v for k, v in payload.items() if not is_same(v, devices[_id].get(k))
+        }
+        if payload and module.check_mode:
+            _json = {"value": dict(devices[_id], **payload), "id": _id}
+            tasks.append(update_changed_flag(_json, 204, "update"))
+        elif payload:
+            tasks.append(_batch_update(params, session, url, _id, payload))
+        else:
+            _json = {"value": devices[_id], "id": _id}
+            tasks.append(update_changed_flag(_json, 200, "get"))
+    return await gather_batch(tasks)
+
+
+async def gather_batch(tasks):
+    results = await asyncio.gather(*tasks)
+    return {
+        "value": results,
+        "changed": any(i.get("changed") for i in results),
+        "failed": any(i.get("failed") for i in results),
+    }
+
+
+class TransferError(Exception):
+    """A failure of a file transfer module, its entry_point() returns it as
+    the error of the module."""
+
+
+async def transfer_request(session, method, url, params, **kwargs):
+    """Send a request of a file transfer module and return the value of its
+    JSON answer, raise TransferError if it has failed."""
+    async with getattr(session, method)(
+        url, **kwargs, **session_timeout(params)
+    ) as resp:
+        _json = None
+        if resp.content_type == "application/json":
+            _json = await resp.json()
+        if isinstance(_json, dict) and "value" in _json:  # 7.0.2 <
+            _json = _json["value"]
+        if resp.status >= 400:
+            raise TransferError(
+                f"Request has failed: {method.upper()} {url}, status={resp.status}, {_json}"
+            )
+        return _json
+
+
+def file_checksum(path, algorithm="sha256", chunk_size=1024 * 1024):
+    """Hash a local file without loading it in memory."""
+    m = hashlib.new(algorithm)
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(chunk_size), b""):
+            m.update(chunk)
+    return m.hexdigest()
+
+
+async def file_sender(path, offset=0, chunk_size=1024 * 1024):
+    """Stream a local file, starting at offset, chunk by chunk."""
+    loop = asyncio.get_event_loop()
+    with open(path, "rb") as fd:
+        fd.seek(offset)
+        while True:
+            chunk = await loop.run_in_executor(None, fd.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def throttle(chunks, rate):
+    """Pace a stream of chunks to rate bytes per second."""
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    sent = 0
+    async for chunk in chunks:
+        yield chunk
+        sent += len(chunk)
+        delay = start + sent / rate - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+# The shared runtime of the generated modules
+
+
+def connection_argument_spec():
+    """The connection options of all the modules."""
+    return {
+        "vcenter_hostname": dict(
+            type="str", required=True, fallback=(env_fallback, ["VMWARE_HOST"]),
+        ),
+        "vcenter_username": dict(
+            type="str", required=True, fallback=(env_fallback, ["VMWARE_USER"]),
+        ),
+        "vcenter_password": dict(
+            type="str",
+            required=True,
+            no_log=True,
+            fallback=(env_fallback, ["VMWARE_PASSWORD"]),
+        ),
+        "vcenter_validate_certs": dict(
+            type="bool",
+            required=False,
+            default=True,
+            fallback=(env_fallback, ["VMWARE_VALIDATE_CERTS"]),
+        ),
+        "vcenter_rest_log_file": dict(
+            type="str",
+            required=False,
+            fallback=(env_fallback, ["VMWARE_REST_LOG_FILE"]),
+        ),
+        "session_timeout": dict(
+            type="float",
+            required=False,
+            fallback=(env_fallback, ["VMWARE_SESSION_TIMEOUT"]),
+        ),
+    }
+
+
+async def run_module(
+    module_class, name, argument_spec, entry_point, json_lines=False, **kwargs
+):
+    """The main() of the modules: check the connection options, open the
+    session, then run entry_point() and exit with its result.
+
+    json_lines is set by the info modules, their dest option is then the path
+    of a JSON Lines file that receives the objects of the result, see
+    JsonLinesWriter. In check mode, the file is not written and the objects
+    are returned. The other modules keep their own dest option.
+    """
+    exceptions = importlib.import_module(
+        "ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions"
+    )
+    module = module_class(
+        argument_spec=argument_spec, supports_check_mode=True, **kwargs
+    )
+    for option in ("vcenter_hostname", "vcenter_username", "vcenter_password"):
+        if not module.params[option]:
+            module.fail_json(f"{option} cannot be empty")
+    try:
+        session = await open_session(
+            vcenter_hostname=module.params["vcenter_hostname"],
+            vcenter_username=module.params["vcenter_username"],
+            vcenter_password=module.params["vcenter_password"],
+            validate_certs=module.params["vcenter_validate_certs"],
+            log_file=module.params["vcenter_rest_log_file"],
+        )
+    except exceptions.EmbeddedModuleFailure as err:
+        module.fail_json(err.get_message())
+    writer = None
+    if json_lines and module.params.get("dest") and not module.check_mode:
+        try:
+            writer = module.result_writer = JsonLinesWriter(
+                module.params["dest"], module.params.get("fields")
+            )
+        except OSError as e:
+            module.fail_json(f"Cannot write {module.params['dest']}: {e}")
+    try:
+        result = await profile(name, entry_point(module, session))
+        if writer:
+            result = writer.finish(result)
+        elif json_lines and module.params.get("dest") and not result.get("failed"):
+            # the file would be written
+            result["changed"] = True
+    finally:
+        if writer:
+            writer.discard()
+    module.exit_json(
+        **shape_result(result, module.params.get("fields"), module.params.get("format"))
+    )
+
+
+def shape_result(result, fields=None, result_format=None):
+    """Apply the fields and format options of the info modules to the value of
+    the result, before Ansible serializes it.
+
+    fields are the dotted paths of the keys to keep in each object. With
+    result_format=columnar, a list of objects becomes a list of columns, the
+    paths of the fields or the keys of the objects, and a list of rows.
+    """
+    value = result.get("value")
+    if result.get("failed") or not (fields or result_format == "columnar"):
+        return result
+    paths = [i.replace(".", "/") for i in fields or []]
+    objects = value if isinstance(value, list) else [value]
+    if not all(isinstance(i, dict) for i in objects):
+        return result
+
+    if result_format == "columnar" and isinstance(value, list):
+        if not paths:
+            paths = list(dict.fromkeys(k for i in objects for k in i))
+        result["value"] = {
+            "columns": [i.replace("/", ".") for i in paths],
+            "rows": [[get_subkey(i, path) for path in paths] for i in objects],
+        }
+    elif paths:
+        projected = [project(i, paths) for i in objects]
+        result["value"] = projected if isinstance(value, list) else projected[0]
+    return result
+
+
+def project(obj, paths):
+    """The object with only the keys of paths, e.g: hardware/version."""
+    entry = {}
+    for path in paths:
+        set_subkey(entry, path, get_subkey(obj, path))
+    return entry
+
+
+class JsonLinesWriter:
+    """The dest option of the info modules: the objects of the result are
+    written to a local file, one JSON document per line, instead of being
+    returned by the module.
+
+    The functions that fetch the objects one by one, e.g: list_or_get(), call
+    write() as each one arrives and don't keep it. finish() writes what is
+    left in the result. The file at path is only replaced once complete, and
+    only if its content changes.
+    """
+
+    def __init__(self, path, fields=None):
+        self.path = path
+        self.paths = [i.replace(".", "/") for i in fields or []]
+        self.count = 0
+        self.part_path = f"{path}.part"
+        self.fd = open(self.part_path, "w")
+
+    def write(self, obj):
+        if self.paths and isinstance(obj, dict):
+            obj = project(obj, self.paths)
+        self.fd.write(json.dumps(obj))
+        self.fd.write("\n")
+        self.count += 1
+
+    def finish(self, result):
+        """Write the value of the result, then return the result with the
+        path of the file and the number of objects instead. The result is
+        changed if the file is replaced."""
+        if result.get("failed"):
+            return result
+        if "value" in result:
+            value = result.pop("value")
+            for i in value if isinstance(value, list) else [value]:
+                self.write(i)
+        self.fd.close()
+        if os.path.isfile(self.path) and filecmp.cmp(
+            self.part_path, self.path, shallow=False
+        ):
+            os.remove(self.part_path)
+        else:
+            os.replace(self.part_path, self.path)
+            result["changed"] = True
+        result.update(dest=self.path, count=self.count)
+        return result
+
+    def discard(self):
+        """Remove the partial file, if the module has failed."""
+        if not self.fd.closed:
+            self.fd.close()
+            os.remove(self.part_path)
+
+
+class StateDiff:
+    """The state_file option of the info modules with a list end-point: the
+    file keeps a fingerprint of each object of the previous run, by ID, and
+    only the objects added or modified since then are returned.
+
+    The fingerprint is a short hash of the object, the ID is its id_key or id
+    key, or the fingerprint itself if it has none. The objects are
+    fingerprinted as they are returned, with their description if it is
+    fetched, a change that the summary doesn't show, e.g: a new disk on a VM,
+    is then seen. When the summaries of the list are returned as they are,
+    prefilter() fingerprints them before the other options, e.g: where, go
+    through the list. A state file that can't be read is replaced, all the
+    objects are then returned, with a warning.
+    """
+
+    def __init__(self, path, id_key=None):
+        self.path = path
+        self.id_key = id_key
+        self.warnings = []
+        try:
+            with open(path) as fd:
+                self.previous = json.load(fd)["fingerprints"]
+            if not isinstance(self.previous, dict):
+                raise TypeError("fingerprints is not a dict")
+        except FileNotFoundError:
+            self.previous = {}
+        except (ValueError, KeyError, TypeError) as e:
+            self.warnings.append(
+                f"Cannot read the state file {path}, all the objects are returned: {e}"
+            )
+            self.previous = {}
+        self.fingerprints = {}
+        self.added = []
+        self.modified = []
+        # the IDs of the prefiltered objects not returned yet
+        self.pending = None
+
+    def object_id(self, obj, fingerprint=None):
+        _id = obj
+        if isinstance(obj, dict):
+            _id = obj.get(self.id_key) or obj.get("id") or fingerprint
+        return str(_id)
+
+    def is_new(self, obj):
+        """Record the fingerprint of the object, whether it was added or
+        modified since the previous run."""
+        fingerprint = hashlib.blake2b(
+            json.dumps(obj, sort_keys=True).encode(), digest_size=8
+        ).hexdigest()
+        _id = self.object_id(obj, fingerprint)
+        self.fingerprints[_id] = fingerprint
+        previous = self.previous.get(_id)
+        if previous == fingerprint:
+            return False
+        (self.added if previous is None else self.modified).append(_id)
+        return True
+
+    def prefilter(self, entries):
+        """The entries of a list answer added or modified since the previous
+        run, compared before their description is fetched. The objects must
+        then go through filter() or select()."""
+        new = [i for i in entries if self.is_new(i)]
+        self.pending = set(self.object_id(i) for i in new)
+        return new
+
+    def filter(self, write):
+        """The write() function, for the added and modified objects only."""
+
+        def write_new(obj):
+            if self.pending is not None:
+                self.pending.discard(self.object_id(obj))
+                write(obj)
+            elif self.is_new(obj):
+                write(obj)
+
+        return write_new
+
+    def select(self, result, check_mode=False):
+        """Only keep the added and modified objects of the value, then finish()."""
+        if result.get("failed") or not isinstance(result.get("value"), list):
+            return result
+        if self.pending is None:
+            result["value"] = [i for i in result["value"] if self.is_new(i)]
+        else:
+            for i in result["value"]:
+                self.pending.discard(self.object_id(i))
+        return self.finish(result, check_mode)
+
+    def finish(self, result, check_mode=False):
+        """Add the IDs of the added, modified and removed objects to the result
+        and save the fingerprints, unless in check mode.
+
+        The prefiltered objects that were not returned, e.g: because of the
+        where option, are forgotten."""
+        for _id in self.pending or []:
+            del self.fingerprints[_id]
+        self.added = [i for i in self.added if i in self.fingerprints]
+        self.modified = [i for i in self.modified if i in self.fingerprints]
+        result["added"] = sorted(self.added)
+        result["modified"] = sorted(self.modified)
+        result["removed"] = sorted(set(self.previous) - set(self.fingerprints))
+        if self.warnings:
+            result.setdefault("warnings", []).extend(self.warnings)
+        if not check_mode:
+            with open(f"{self.path}.part", "w") as fd:
+                json.dump({"fingerprints": self.fingerprints}, fd)
+            os.replace(f"{self.path}.part", self.path)
+        return result
+
+
+def open_state_diff(module, id_key):
+    """The StateDiff of the state_file option, None without it or when the
+    module returns a single object."""
+    if not module.params.get("state_file") or not id_key:
+        return None
+    if module.params.get(id_key) or module.params.get("label"):
+        return None
+    return StateDiff(module.params["state_file"], id_key)
+
+
+# The operators of the where option, the test of a value with the operand
+WHERE_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "contains": operator.contains,
+    "endswith": lambda value, operand: value.endswith(operand),
+    "in": lambda value, operand: value in operand,
+    "matches": lambda value, operand: operand.search(value) is not None,
+    "startswith": lambda value, operand: value.startswith(operand),
+}
+
+# e.g: memory_size_MiB > 16384, not guest_OS startswith RHEL
+WHERE_CONDITION = re.compile(
+    r"^\s*(not\s+)?([A-Za-z_][\w.]*)\s*"
+    r"(==|!=|<=|>=|<|>|\s(?:contains|endswith|in|matches|startswith)\s)\s*(.*?)\s*$"
+)
+
+
+def parse_condition(expression):
+    """The (path, test) of a condition of the where option, test() is called
+    with the value of the object at path."""
+    match = WHERE_CONDITION.match(expression)
+    if not match:
+        raise ValueError(f"Invalid condition: {expression}")
+    negate, path, name, operand = match.groups()
+    name = name.strip()
+    try:
+        operand = json.loads(operand)
+    except ValueError:
+        if len(operand) > 1 and operand[0] == operand[-1] == "'":
+            operand = operand[1:-1]
+    if name in ("endswith", "startswith"):
+        operand = str(operand)
+    elif name == "matches":
+        try:
+            operand = re.compile(str(operand))
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression in {expression}: {e}")
+    test = WHERE_OPERATORS[name]
+
+    def check(value):
+        try:
+            result = bool(test(value, operand))
+        except (AttributeError, TypeError):  # e.g: a missing field
+            result = False
+        return result != bool(negate)
+
+    return path.replace(".", "/"), check
+
+
+class Where:
+    """The where option: the conditions that each object of a list must pass,
+    e.g: name matches ^web, evaluated by the module."""
+
+    def __init__(self, expressions=()):
+        self.conditions = [parse_condition(i) for i in expressions]
+
+    def __bool__(self):
+        return bool(self.conditions)
+
+    def __call__(self, obj):
+        return all(check(get_subkey(obj, path)) for path, check in self.conditions)
+
+    def keys(self):
+        """The top-level keys the conditions use."""
+        return list(dict.fromkeys(path.split("/")[0] for path, _ in self.conditions))
+
+    def _subset(self, conditions):
+        where = Where()
+        where.conditions = conditions
+        return where
+
+    def prefilter(self, entries):
+        """The entries that pass the conditions on their own keys, e.g: the
+        fields of the list, before their description is fetched."""
+        if not entries or not isinstance(entries[0], dict):
+            return entries
+        where = self._subset(
+            [i for i in self.conditions if i[0].split("/")[0] in entries[0]]
+        )
+        return [i for i in entries if where(i)] if where else entries
+
+    def remaining(self, entries):
+        """The conditions that prefilter() has not checked on the entries."""
+        if not entries or not isinstance(entries[0], dict):
+            return self
+        return self._subset(
+            [i for i in self.conditions if i[0].split("/")[0] not in entries[0]]
+        )
+
+    def select(self, objects):
+        return [i for i in objects if self(i)]
+
+    def filter(self, write):
+        """The write() function, for the objects that pass only."""
+
+        def write_selected(obj):
+            if self(obj):
+                write(obj)
+
+        return write_selected
+
+
+async def run_state(module, session, operations):
+    """The entry_point() of the modules with a state parameter, call the
+    _<operation>() function of operations, the globals() of the module."""
+    if module.params["state"] == "present":
+        if "_create" in operations:
+            operation = "create"
+        else:
+            operation = "update"
+    elif module.params["state"] == "absent":
+        operation = "delete"
+    else:
+        operation = module.params["state"]
+
+    return await operations["_" + operation](module.params, session)
+
+
+async def get_info(params, session, url, payload_format):
+    """The entry_point() of the info modules without a list end-point."""
+    _in_query_parameters = list(payload_format.values())[0]["query"].keys()
+    _url = url + gen_args(params, _in_query_parameters)
+    _json = None
+    async with session.get(_url, **session_timeout(params)) as resp:
+        try:
+            if resp.headers["Content-Type"] == "application/json":
+                _json = await resp.json()
+        except KeyError:
+            _json = {}
+        return await update_changed_flag(_json, resp.status, "get")
+
+
+async def list_or_get(
+    module, session, url, id_key=None, shards=None, stream=True, where=None
+):
+    """The entry_point() of the info modules with a list end-point.
+
+    With id_key, the ID of the object is added to its description and the
+    entries of a list are expanded with their description, see wants_detail().
+    With shards, a list that vCenter finds too large is split, see split_list().
+    With the dest option and stream, the descriptions are written as they
+    arrive, see JsonLinesWriter. With the state_file option and stream, only
+    the objects added or modified since the previous run are returned, see
+    StateDiff. Without stream, the caller completes the objects and handles
+    both options, e.g: vcenter_vm_info and its include option. With where, the objects of a list must pass its conditions, the ones on
+    the fields of the list are checked before the descriptions are fetched.
+    Without stream, the caller checks the other ones.
+    """
+    writer = getattr(module, "result_writer", None) if stream else None
+    state = open_state_diff(module, id_key) if stream else None
+    warnings = []
+    # a list too large is split along the shards, then handled like the others
+    status, _json = await list_sharded(
+        session, url, id_key, shards, **session_timeout(module.params)
+    )
+    if "value" not in _json:  # 7.0.2+
+        _json = {"value": _json}
+
+    if not id_key:
+        pass
+    elif module.params.get(id_key):
+        _json["id"] = module.params.get(id_key)
+    elif module.params.get("label"):  # TODO extend the list of filter
+        _json = await exists(module.params, session, url)
+    else:
+        if where and isinstance(_json["value"], list):
+            _json["value"] = where.prefilter(_json["value"])
+            where = where.remaining(_json["value"])
+        detail = wants_detail(module.params.get("detail"), _json["value"], id_key)
+        if not detail and is_auto_limited(module.params.get("detail"), _json["value"]):
+            warnings.append(
+                f"The list has {len(_json['value'])} objects, more than the"
+                f" {DETAIL_AUTO_LIMIT} of detail=auto, they are returned without"
+                " their description. Use detail=full to get them, or"
+                " detail=summary to keep the list as is without this warning."
+            )
+        # the descriptions are fingerprinted once fetched, a change that the
+        # summary doesn't show is then seen
+        if state and not detail and is_summary_list(_json["value"]):
+            _json["value"] = state.prefilter(_json["value"])
+        if detail:
+            # the description of each object of the list
+            ids = [i if isinstance(i, str) else i[id_key] for i in _json["value"]]
+            if "item?library_id=" not in url:  # see get_device_info()
+                url = url.split("?")[0]
+            if writer:
+                write = state.filter(writer.write) if state else writer.write
+                write = where.filter(write) if where else write
+                await stream_full_device_list(session, url, _json["value"], ids, write)
+                result = await update_changed_flag({"value": []}, status, "get")
+                del result["value"]
+                return state.finish(result, module.check_mode) if state else result
+            full_device_list = await build_full_device_list(
+                session, url, ids, DETAIL_CONCURRENCY
+            )
+            # the summaries keep their fields, e.g: the ID of a VM
+            _json = {
+                "value": [
+                    dict(entry, **i["value"]) if isinstance(entry, dict) else i["value"]
+                    for entry, i in zip(_json["value"], full_device_list)
+                    if i
+                ]
+            }
+
+    if where and stream and isinstance(_json["value"], list):
+        _json["value"] = where.select(_json["value"])
+    result = await update_changed_flag(_json, status, "get")
+    if warnings:
+        result.setdefault("warnings", []).extend(warnings)
+    if state and stream:
+        return state.select(result, module.check_mode)
+    return result
+
+
+def is_summary_list(entries):
+    """Whether a list answer has a summary of each object, not only its ID."""
+    return (
+        isinstance(entries, list)
+        and bool(entries)
+        and all(isinstance(i, dict) for i in entries)
+    )
+
+
+async def stream_full_device_list(session, url, entries, ids, write):
+    """Like build_full_device_list(), but each description is passed to write()
+    as it arrives, merged with its list entry, instead of being returned. The
+    descriptions are not memoized, the memory use doesn't grow with the list."""
+
+    async def describe(entry, _id):
+        info = await get_device_info(session, url, _id, memoize=False)
+        if info:
+            write(
+                dict(entry, **info["value"])
+                if isinstance(entry, dict)
+                else info["value"]
+            )
+
+    await gather_bounded(
+        (describe(entry, _id) for entry, _id in zip(entries, ids)), DETAIL_CONCURRENCY
+    )
+
+
+# With detail=auto, the largest list of IDs expanded with the description of
+# each object
+DETAIL_AUTO_LIMIT = 200
+
+# The number of descriptions fetched at the same time
+DETAIL_CONCURRENCY = 16
+
+
+def is_auto_limited(detail, entries):
+    """Whether detail=auto keeps a list of IDs because it is too large."""
+    return (
+        detail == "auto"
+        and isinstance(entries, list)
+        and len(entries) > DETAIL_AUTO_LIMIT
+        and isinstance(entries[0], str)
+    )
+
+
+def wants_detail(detail, entries, id_key):
+    """Whether the entries of a list answer are replaced by the descriptions.
+
+    summary keeps the list answer, full fetches the description of each
+    entry and auto only does it for a short list of bare IDs.
+    """
+    if not isinstance(entries, list) or not entries or detail == "summary":
+        return False
+    if isinstance(entries[0], str):
+        return detail == "full" or len(entries) <= DETAIL_AUTO_LIMIT
+    return detail == "full" and id_key in entries[0]
+
+
+# The sub-resources of a VM, and their path under /api/vcenter/vm/{vm}
+VM_SUB_RESOURCES = {
+    "guest_identity": "guest/identity",
+    "guest_interfaces": "guest/networking/interfaces",
+    "guest_local_filesystem": "guest/local-filesystem",
+    "guest_networking": "guest/networking",
+    "guest_routes": "guest/networking/routes",
+    "storage_policy": "storage/policy",
+    "tools": "tools",
+}
+
+# The keys of the VM description, GET /api/vcenter/vm/{vm}
+VM_DESCRIPTION_KEYS = (
+    "boot",
+    "boot_devices",
+    "cdroms",
+    "cpu",
+    "disks",
+    "floppies",
+    "guest_OS",
+    "hardware",
+    "identity",
+    "memory",
+    "nics",
+    "parallel_ports",
+    "sata_adapters",
+    "scsi_adapters",
+    "serial_ports",
+)
+
+
+async def get_vm_sub_resource(session, url, vm_id, path=None, memoize=True):
+    """A sub-resource of a VM, or its description without path.
+
+    None if vCenter does not return it, e.g: the guest details of a VM without
+    the VMware Tools running. See get_device_info() for memoize."""
+    item_url = f"{url}/{vm_id}/{path}" if path else f"{url}/{vm_id}"
+    if memoize:
+        request = session.get(item_url)
+    else:
+        request = session.request("GET", item_url)
+    async with request as resp:
+        if resp.status != 200:
+            return None
+        _json = await resp.json()
+        if isinstance(_json, dict) and list(_json) == ["value"]:  # 7.0.2 <
+            _json = _json["value"]
+        return _json
+
+
+async def include_vm_resources(session, url, vms, include, write=None):
+    """Add the included keys of the VM description and sub-resources.
+
+    vms maps the ID of each VM to its summary or to its description, that gets
+    the included keys. The descriptions are only fetched if a key is missing,
+    all the requests run concurrently, DETAIL_CONCURRENCY at a time. With
+    write, each VM is passed to it once complete, and vms is left unchanged,
+    the answers are then not memoized.
+    """
+    description_keys = [i for i in include if i in VM_DESCRIPTION_KEYS]
+    semaphore = asyncio.Semaphore(DETAIL_CONCURRENCY)
+
+    async def fetch(vm_id, name):
+        async with semaphore:
+            return await get_vm_sub_resource(
+                session, url, vm_id, VM_SUB_RESOURCES.get(name), memoize=not write
+            )
+
+    async def complete(vm_id, vm):
+        names = [i for i in include if i in VM_SUB_RESOURCES]
+        if any(k not in vm for k in description_keys):
+            names.append(None)
+        values = await asyncio.gather(*(fetch(vm_id, i) for i in names))
+        entry = {}
+        for name, value in zip(names, values):
+            if name:
+                entry[name] = value
+            else:
+                entry.update({k: (value or {}).get(k) for k in description_keys})
+        if write:
+            write(dict(vm, **entry))
+        else:
+            vm.update(entry)
+
+    await asyncio.gather(*(complete(vm_id, vm) for vm_id, vm in vms.items()))
+
+
+# The error of vCenter when a list would be larger than it accepts to build,
+# e.g: more than 4000 VMs
+LIST_TOO_LARGE = "UNABLE_TO_ALLOCATE_RESOURCE"
+
+# The filters that split a VM list, from the coarsest to the finest. For each
+# one, the list end-point of its values, the ID key of their summary, and the
+# filters of the VM list that also restrict this list. Every VM runs on a
+# host, the hosts of a datacenter split it without a gap, unlike its clusters
+# or its folders.
+VM_LIST_SHARDS = (
+    ("datacenters", "/api/vcenter/datacenter", "datacenter", ("datacenters",)),
+    ("hosts", "/api/vcenter/host", "host", ("clusters", "datacenters", "hosts")),
+)
+
+# The number of shards listed at the same time, per level
+SHARD_CONCURRENCY = 8
+
+
+def is_list_too_large(status, answer):
+    return (
+        status == 400
+        and isinstance(answer, dict)
+        and answer.get("error_type") == LIST_TOO_LARGE
+    )
+
+
+async def list_sharded(session, url, id_key, shards, **kwargs):
+    """GET a list, split along the shards if vCenter finds it too large.
+
+    Return the HTTP status and the answer."""
+    async with session.get(url, **kwargs) as resp:
+        _json = await resp.json()
+        if not (shards and is_list_too_large(resp.status, _json)):
+            return resp.status, _json
+    return await split_list(session, url, id_key, shards, **kwargs)
+
+
+async def split_list(session, url, id_key, shards, **kwargs):
+    """The entries of a list too large for vCenter, one shard at a time.
+
+    The URL gets one more filter, e.g: datacenters=datacenter-1, for each
+    value of the first shard. The values are listed within the filters of the
+    URL and a shard still too large is split with the next one. The entries
+    are deduplicated on id_key.
+    """
+    (key, endpoint, shard_id_key, scope), shards = shards[0], shards[1:]
+    parsed = urllib.parse.urlsplit(url)
+    query = urllib.parse.parse_qs(parsed.query)
+
+    shard_query = urllib.parse.urlencode(
+        {k: v for k, v in query.items() if k in scope}, doseq=True
+    )
+    shard_url = parsed._replace(path=endpoint, query=shard_query).geturl()
+    async with session.get(shard_url, **kwargs) as resp:
+        _json = await resp.json()
+        if resp.status != 200:
+            return resp.status, _json
+    values = [i[shard_id_key] for i in _json]
+
+    def with_filter(value):
+        filtered = urllib.parse.urlencode(dict(query, **{key: [value]}), doseq=True)
+        return parsed._replace(query=filtered).geturl()
+
+    results = await gather_bounded(
+        (
+            list_sharded(session, with_filter(i), id_key, shards, **kwargs)
+            for i in values
+        ),
+        SHARD_CONCURRENCY,
+    )
+    entries = {}
+    for status, _json in results:
+        if status != 200:
+            return status, _json
+        for entry in _json:
+            entries.setdefault(entry[id_key], entry)
+    return 200, list(entries.values())
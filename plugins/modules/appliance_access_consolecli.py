@@ -55,6 +55,7 @@ options:
     - 'The file will be stored on the host that run the module. '
     - 'If the value is not specified in the task, the value of '
     - environment variable C(VMWARE_REST_LOG_FILE) will be used instead.
+    - If the file name ends with C(.jsonl), each request is recorded as a JSON document with its answer and its timing.
     type: str
   vcenter_username:
     description:
@@ -104,7 +105,6 @@ PAYLOAD_FORMAT = {
 
 import json
 import socket
-from ansible.module_utils.basic import env_fallback
 
 try:
     from ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions import (
@@ -118,50 +118,20 @@ try:
 except ImportError:
     from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
-    build_full_device_list,
     exists,
     gen_args,
-    get_device_info,
     get_subdevice_type,
-    list_devices,
-    open_session,
     prepare_payload,
     update_changed_flag,
     session_timeout,
+    connection_argument_spec,
+    run_module,
+    run_state,
 )
 
 
 def prepare_argument_spec():
-    argument_spec = {
-        "vcenter_hostname": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_HOST"]),
-        ),
-        "vcenter_username": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_USER"]),
-        ),
-        "vcenter_password": dict(
-            type="str",
-            required=True,
-            no_log=True,
-            fallback=(env_fallback, ["VMWARE_PASSWORD"]),
-        ),
-        "vcenter_validate_certs": dict(
-            type="bool",
-            required=False,
-            default=True,
-            fallback=(env_fallback, ["VMWARE_VALIDATE_CERTS"]),
-        ),
-        "vcenter_rest_log_file": dict(
-            type="str",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_REST_LOG_FILE"]),
-        ),
-        "session_timeout": dict(
-            type="float",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_SESSION_TIMEOUT"]),
-        ),
-    }
+    argument_spec = connection_argument_spec()
 
     argument_spec["enabled"] = {"required": True, "type": "bool"}
     argument_spec["state"] = {"type": "str", "choices": ["set"], "default": "set"}
@@ -172,28 +142,13 @@ def prepare_argument_spec():
 async def main():
     required_if = list([])
 
-    module_args = prepare_argument_spec()
-    module = AnsibleModule(
-        argument_spec=module_args, required_if=required_if, supports_check_mode=True
+    await run_module(
+        AnsibleModule,
+        "appliance_access_consolecli",
+        prepare_argument_spec(),
+        entry_point,
+        required_if=required_if,
     )
-    if not module.params["vcenter_hostname"]:
-        module.fail_json("vcenter_hostname cannot be empty")
-    if not module.params["vcenter_username"]:
-        module.fail_json("vcenter_username cannot be empty")
-    if not module.params["vcenter_password"]:
-        module.fail_json("vcenter_password cannot be empty")
-    try:
-        session = await open_session(
-            vcenter_hostname=module.params["vcenter_hostname"],
-            vcenter_username=module.params["vcenter_username"],
-            vcenter_password=module.params["vcenter_password"],
-            validate_certs=module.params["vcenter_validate_certs"],
-            log_file=module.params["vcenter_rest_log_file"],
-        )
-    except EmbeddedModuleFailure as err:
-        module.fail_json(err.get_message())
-    result = await entry_point(module, session)
-    module.exit_json(**result)
 
 
 # template: default_module.j2
@@ -204,20 +159,7 @@ def build_url(params):
 
 
 async def entry_point(module, session):
-
-    if module.params["state"] == "present":
-        if "_create" in globals():
-            operation = "create"
-        else:
-            operation = "update"
-    elif module.params["state"] == "absent":
-        operation = "delete"
-    else:
-        operation = module.params["state"]
-
-    func = globals()["_" + operation]
-
-    return await func(module.params, session)
+    return await run_state(module, session, globals())
 
 
 async def _set(params, session):
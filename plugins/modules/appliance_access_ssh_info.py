@@ -15,6 +15,37 @@ module: appliance_access_ssh_info
 short_description: Get enabled state of the SSH-based controlled CLI.
 description: Get enabled state of the SSH-based controlled CLI.
 options:
+  dest:
+    description:
+    - The path of a local file where the objects are written, one JSON document
+      per line, instead of being returned. The objects fetched one by one are
+      written as they arrive, in that order.
+    - The module then returns the path as C(dest) and the number of objects as
+      C(count). The I(fields) apply to each object, I(format) does not.
+    - The file is replaced once complete, if its content changes, the module is
+      then C(changed). In check mode, the file is not written and the objects
+      are returned.
+    type: path
+    version_added: 2.2.0
+  fields:
+    description:
+    - The dotted paths of the keys to keep in the result, for each object, e.g.
+      C(name) or C(hardware.version). The other keys are dropped by the module.
+    elements: str
+    type: list
+    version_added: 2.2.0
+  format:
+    choices:
+    - columnar
+    - native
+    default: native
+    description:
+    - C(native) returns the objects as vCenter describes them.
+    - C(columnar) returns a list of objects as a list of C(columns), the I(fields)
+      or all the keys of the objects, and a list of C(rows), the values of each
+      object in the order of the columns.
+    type: str
+    version_added: 2.2.0
   session_timeout:
     description:
     - 'Timeout settings for client session. '
@@ -44,6 +75,7 @@ options:
     - 'The file will be stored on the host that run the module. '
     - 'If the value is not specified in the task, the value of '
     - environment variable C(VMWARE_REST_LOG_FILE) will be used instead.
+    - If the file name ends with C(.jsonl), each request is recorded as a JSON document with its answer and its timing.
     type: str
   vcenter_username:
     description:
@@ -93,7 +125,6 @@ PAYLOAD_FORMAT = {
 
 import json
 import socket
-from ansible.module_utils.basic import env_fallback
 
 try:
     from ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions import (
@@ -107,49 +138,20 @@ try:
 except ImportError:
     from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
-    build_full_device_list,
-    exists,
-    gen_args,
-    get_device_info,
-    get_subdevice_type,
-    list_devices,
-    open_session,
-    prepare_payload,
-    update_changed_flag,
-    session_timeout,
+    connection_argument_spec,
+    get_info,
+    run_module,
 )
 
 
 def prepare_argument_spec():
-    argument_spec = {
-        "vcenter_hostname": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_HOST"]),
-        ),
-        "vcenter_username": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_USER"]),
-        ),
-        "vcenter_password": dict(
-            type="str",
-            required=True,
-            no_log=True,
-            fallback=(env_fallback, ["VMWARE_PASSWORD"]),
-        ),
-        "vcenter_validate_certs": dict(
-            type="bool",
-            required=False,
-            default=True,
-            fallback=(env_fallback, ["VMWARE_VALIDATE_CERTS"]),
-        ),
-        "vcenter_rest_log_file": dict(
-            type="str",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_REST_LOG_FILE"]),
-        ),
-        "session_timeout": dict(
-            type="float",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_SESSION_TIMEOUT"]),
-        ),
+    argument_spec = connection_argument_spec()
+    argument_spec["dest"] = {"type": "path"}
+    argument_spec["fields"] = {"type": "list", "elements": "str"}
+    argument_spec["format"] = {
+        "choices": ["columnar", "native"],
+        "default": "native",
+        "type": "str",
     }
 
     return argument_spec
@@ -158,28 +160,14 @@ def prepare_argument_spec():
 async def main():
     required_if = list([])
 
-    module_args = prepare_argument_spec()
-    module = AnsibleModule(
-        argument_spec=module_args, required_if=required_if, supports_check_mode=True
+    await run_module(
+        AnsibleModule,
+        "appliance_access_ssh_info",
+        prepare_argument_spec(),
+        entry_point,
+        required_if=required_if,
+        json_lines=True,
     )
-    if not module.params["vcenter_hostname"]:
-        module.fail_json("vcenter_hostname cannot be empty")
-    if not module.params["vcenter_username"]:
-        module.fail_json("vcenter_username cannot be empty")
-    if not module.params["vcenter_password"]:
-        module.fail_json("vcenter_password cannot be empty")
-    try:
-        session = await open_session(
-            vcenter_hostname=module.params["vcenter_hostname"],
-            vcenter_username=module.params["vcenter_username"],
-            vcenter_password=module.params["vcenter_password"],
-            validate_certs=module.params["vcenter_validate_certs"],
-            log_file=module.params["vcenter_rest_log_file"],
-        )
-    except EmbeddedModuleFailure as err:
-        module.fail_json(err.get_message())
-    result = await entry_point(module, session)
-    module.exit_json(**result)
 
 
 # template: info_no_list_module.j2
@@ -188,22 +176,9 @@ def build_url(params):
 
 
 async def entry_point(module, session):
-    return await _info(module.params, session)
-
-
-async def _info(params, session):
-    payload_format = list(PAYLOAD_FORMAT.values())[0]
-    _in_query_parameters = payload_format["query"].keys()
-    _url = ("https://{vcenter_hostname}" "/api/appliance/access/ssh").format(
-        **params
-    ) + gen_args(params, _in_query_parameters)
-    async with session.get(_url, **session_timeout(params)) as resp:
-        try:
-            if resp.headers["Content-Type"] == "application/json":
-                _json = await resp.json()
-        except KeyError:
-            _json = {}
-        return await update_changed_flag(_json, resp.status, "get")
+    return await get_info(
+        module.params, session, build_url(module.params), PAYLOAD_FORMAT
+    )
 
 
 if __name__ == "__main__":
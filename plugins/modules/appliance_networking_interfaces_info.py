@@ -15,6 +15,53 @@ module: appliance_networking_interfaces_info
 short_description: Get information about a particular network interface.
 description: Get information about a particular network interface.
 options:
+  dest:
+    description:
+    - The path of a local file where the objects are written, one JSON document
+      per line, instead of being returned. The objects fetched one by one are
+      written as they arrive, in that order.
+    - The module then returns the path as C(dest) and the number of objects as
+      C(count). The I(fields) apply to each object, I(format) does not.
+    - The file is replaced once complete, if its content changes, the module is
+      then C(changed). In check mode, the file is not written and the objects
+      are returned.
+    type: path
+    version_added: 2.2.0
+  detail:
+    choices:
+    - auto
+    - full
+    - summary
+    default: auto
+    description:
+    - C(summary) returns the list as vCenter answers it, for some objects only
+      their IDs.
+    - C(full) also fetches the description of each object of the list, with a
+      bounded number of concurrent requests.
+    - C(auto) fetches the descriptions when the list only has the IDs of at most
+      200 objects, a larger list is returned as is, with a warning.
+    - Not used when a single object is requested.
+    type: str
+    version_added: 2.2.0
+  fields:
+    description:
+    - The dotted paths of the keys to keep in the result, for each object, e.g.
+      C(name) or C(hardware.version). The other keys are dropped by the module.
+    elements: str
+    type: list
+    version_added: 2.2.0
+  format:
+    choices:
+    - columnar
+    - native
+    default: native
+    description:
+    - C(native) returns the objects as vCenter describes them.
+    - C(columnar) returns a list of objects as a list of C(columns), the I(fields)
+      or all the keys of the objects, and a list of C(rows), the values of each
+      object in the order of the columns.
+    type: str
+    version_added: 2.2.0
   interface_name:
     description:
     - Network interface, for example, "nic0". Required with I(state=['get'])
@@ -27,6 +74,21 @@ options:
     - The default value is 300s.
     type: float
     version_added: 2.1.0
+  state_file:
+    description:
+    - The path of a local file that keeps a fingerprint of each object of the
+      list, a hash of the object, from one run to the next.
+    - Only the objects added or modified since the previous run are returned,
+      their IDs are returned as C(added) and C(modified), the IDs of the objects
+      that are gone as C(removed). The first run returns all the objects.
+    - The objects are compared as they are returned, a change of their
+      description, e.g. a new disk of a VM with I(detail=full), is seen. All
+      the descriptions are then fetched on each run.
+    - A state file that cannot be read is replaced, all the objects are then
+      returned with a warning.
+    - The file is not updated in check mode. Not used to get a single object.
+    type: path
+    version_added: 2.2.0
   vcenter_hostname:
     description:
     - The hostname or IP address of the vSphere vCenter
@@ -48,6 +110,7 @@ options:
     - 'The file will be stored on the host that run the module. '
     - 'If the value is not specified in the task, the value of '
     - environment variable C(VMWARE_REST_LOG_FILE) will be used instead.
+    - If the file name ends with C(.jsonl), each request is recorded as a JSON document with its answer and its timing.
     type: str
   vcenter_username:
     description:
@@ -117,7 +180,6 @@ PAYLOAD_FORMAT = {
 
 import json
 import socket
-from ansible.module_utils.basic import env_fallback
 
 try:
     from ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions import (
@@ -131,52 +193,30 @@ try:
 except ImportError:
     from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
-    build_full_device_list,
-    exists,
     gen_args,
-    get_device_info,
-    get_subdevice_type,
-    list_devices,
-    open_session,
-    prepare_payload,
-    update_changed_flag,
-    session_timeout,
+    connection_argument_spec,
+    list_or_get,
+    run_module,
 )
 
 
 def prepare_argument_spec():
-    argument_spec = {
-        "vcenter_hostname": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_HOST"]),
-        ),
-        "vcenter_username": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_USER"]),
-        ),
-        "vcenter_password": dict(
-            type="str",
-            required=True,
-            no_log=True,
-            fallback=(env_fallback, ["VMWARE_PASSWORD"]),
-        ),
-        "vcenter_validate_certs": dict(
-            type="bool",
-            required=False,
-            default=True,
-            fallback=(env_fallback, ["VMWARE_VALIDATE_CERTS"]),
-        ),
-        "vcenter_rest_log_file": dict(
-            type="str",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_REST_LOG_FILE"]),
-        ),
-        "session_timeout": dict(
-            type="float",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_SESSION_TIMEOUT"]),
-        ),
-    }
+    argument_spec = connection_argument_spec()
 
+    argument_spec["dest"] = {"type": "path"}
+    argument_spec["detail"] = {
+        "choices": ["auto", "full", "summary"],
+        "default": "auto",
+        "type": "str",
+    }
+    argument_spec["fields"] = {"type": "list", "elements": "str"}
+    argument_spec["format"] = {
+        "choices": ["columnar", "native"],
+        "default": "native",
+        "type": "str",
+    }
     argument_spec["interface_name"] = {"type": "str"}
+    argument_spec["state_file"] = {"type": "path"}
 
     return argument_spec
 
@@ -184,28 +224,14 @@ def prepare_argument_spec():
 async def main():
     required_if = list([])
 
-    module_args = prepare_argument_spec()
-    module = AnsibleModule(
-        argument_spec=module_args, required_if=required_if, supports_check_mode=True
+    await run_module(
+        AnsibleModule,
+        "appliance_networking_interfaces_info",
+        prepare_argument_spec(),
+        entry_point,
+        required_if=required_if,
+        json_lines=True,
     )
-    if not module.params["vcenter_hostname"]:
-        module.fail_json("vcenter_hostname cannot be empty")
-    if not module.params["vcenter_username"]:
-        module.fail_json("vcenter_username cannot be empty")
-    if not module.params["vcenter_password"]:
-        module.fail_json("vcenter_password cannot be empty")
-    try:
-        session = await open_session(
-            vcenter_hostname=module.params["vcenter_hostname"],
-            vcenter_username=module.params["vcenter_username"],
-            vcenter_password=module.params["vcenter_password"],
-            validate_certs=module.params["vcenter_validate_certs"],
-            log_file=module.params["vcenter_rest_log_file"],
-        )
-    except EmbeddedModuleFailure as err:
-        module.fail_json(err.get_message())
-    result = await entry_point(module, session)
-    module.exit_json(**result)
 
 
 # template: info_list_and_get_module.j2
@@ -226,27 +252,9 @@ def build_url(params):
 
 
 async def entry_point(module, session):
-    url = build_url(module.params)
-    async with session.get(url, **session_timeout(module.params)) as resp:
-        _json = await resp.json()
-
-        if "value" not in _json:  # 7.0.2+
-            _json = {"value": _json}
-
-        if module.params.get("interface_name"):
-            _json["id"] = module.params.get("interface_name")
-        elif module.params.get("label"):  # TODO extend the list of filter
-            _json = await exists(module.params, session, url)
-        elif (
-            isinstance(_json["value"], list)
-            and len(_json["value"]) > 0
-            and isinstance(_json["value"][0], str)
-        ):
-            # this is a list of id, we fetch the details
-            full_device_list = await build_full_device_list(session, url, _json)
-            _json = {"value": [i["value"] for i in full_device_list]}
-
-        return await update_changed_flag(_json, resp.status, "get")
+    return await list_or_get(
+        module, session, build_url(module.params), id_key="interface_name"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,445 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+
+DOCUMENTATION = r"""
+module: content_library_item_download
+short_description: Download the files of a library item
+description:
+- Fetch the files of a library item (e.g an OVF and its disks, or an ISO image) to
+  a local directory through a download session.
+- Each file is split in parts downloaded concurrently with HTTP range requests, the
+  parts are written directly at their position in a preallocated local file.
+- The checksum of the downloaded files is verified against the one known by vCenter.
+- The parts already transferred by an interrupted run are kept and only the missing
+  parts are downloaded again.
+- Nothing is downloaded if the local files are already identical.
+options:
+  chunk_size:
+    default: 1048576
+    description:
+    - The size in bytes of the chunks read from the network and written to disk.
+    type: int
+  dest:
+    description:
+    - The local directory where the files are written. The directory is created if
+      it doesn't exist.
+    required: true
+    type: path
+  files:
+    description:
+    - The names of the files to download. By default, all the files of the item are
+      downloaded.
+    elements: str
+    type: list
+  library_item_id:
+    description:
+    - Identifier of the library item.
+    required: true
+    type: str
+  max_concurrent_requests:
+    default: 8
+    description:
+    - The maximal number of range requests running at the same time.
+    type: int
+  part_size:
+    default: 67108864
+    description:
+    - The size in bytes of the range requested for each part of a file.
+    type: int
+  resume:
+    default: true
+    description:
+    - Keep the parts downloaded by an interrupted run.
+    type: bool
+  session_timeout:
+    description:
+    - 'Timeout settings for client session. '
+    - 'The maximal number of seconds for the whole operation including connection
+      establishment, request sending and response. '
+    - The default value is 300s.
+    type: float
+  type:
+    description:
+    - The type of the library item, e.g C(ovf) or C(iso). Used when the item is created.
+    type: str
+  vcenter_hostname:
+    description:
+    - The hostname or IP address of the vSphere vCenter
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_HOST) will be used instead.
+    required: true
+    type: str
+  vcenter_password:
+    description:
+    - The vSphere vCenter password
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_PASSWORD) will be used instead.
+    required: true
+    type: str
+  vcenter_rest_log_file:
+    description:
+    - 'You can use this optional parameter to set the location of a log file. '
+    - 'This file will be used to record the HTTP REST interaction. '
+    - 'The file will be stored on the host that run the module. '
+    - 'If the value is not specified in the task, the value of '
+    - environment variable C(VMWARE_REST_LOG_FILE) will be used instead.
+    - If the file name ends with C(.jsonl), each request is recorded as a JSON document with its answer and its timing.
+    type: str
+  vcenter_username:
+    description:
+    - The vSphere vCenter username
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_USER) will be used instead.
+    required: true
+    type: str
+  vcenter_validate_certs:
+    default: true
+    description:
+    - Allows connection when SSL certificates are not valid. Set to C(false) when
+      certificates are not trusted.
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_VALIDATE_CERTS) will be used instead.
+    type: bool
+author:
+- Ansible Cloud Team (@ansible-collections)
+version_added: 2.2.0
+requirements:
+- vSphere 7.0.2 or greater
+- python >= 3.6
+- aiohttp
+notes:
+- Tested on vSphere 7.0.2
+"""
+
+EXAMPLES = r"""
+- name: Look up the template in the library
+  vmware.vmware_rest.content_library_item_info:
+    library_id: '{{ ds_lib.id }}'
+  register: lib_items
+
+- name: Download the files of the template
+  vmware.vmware_rest.content_library_item_download:
+    library_item_id: '{{ lib_items.value[0].id }}'
+    dest: /srv/dr/my_template
+
+- name: Only download the descriptor, with 4 parallel requests
+  vmware.vmware_rest.content_library_item_download:
+    library_item_id: '{{ lib_items.value[0].id }}'
+    dest: /srv/dr/my_template
+    files:
+    - my_template.ovf
+    max_concurrent_requests: 4
+"""
+
+RETURN = r"""
+id:
+  description: moid of the library item
+  returned: On success
+  sample: 6d8b6a4c-8a2b-4b1e-9d7e-7b1f3f1b3c22
+  type: str
+value:
+  description: The downloaded files
+  returned: On success
+  sample:
+  - changed: true
+    checksum_info:
+      algorithm: SHA256
+      checksum: 2f3c...
+    name: my_template-disk1.vmdk
+    path: /srv/dr/my_template/my_template-disk1.vmdk
+    size: 42949672960
+  type: list
+"""
+
+import asyncio
+import json
+import os
+
+try:
+    from ansible_collections.cloud.common.plugins.module_utils.turbo.module import (
+        AnsibleTurboModule as AnsibleModule,
+    )
+
+    AnsibleModule.collection_name = "vmware.vmware_rest"
+except ImportError:
+    from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
+    file_checksum,
+    TransferError,
+    transfer_request,
+    session_timeout,
+    connection_argument_spec,
+    run_module,
+)
+
+
+def prepare_argument_spec():
+    argument_spec = connection_argument_spec()
+
+    argument_spec["chunk_size"] = {"type": "int", "default": 1048576}
+    argument_spec["dest"] = {"required": True, "type": "path"}
+    argument_spec["files"] = {"type": "list", "elements": "str"}
+    argument_spec["library_item_id"] = {"required": True, "type": "str"}
+    argument_spec["max_concurrent_requests"] = {"type": "int", "default": 8}
+    argument_spec["part_size"] = {"type": "int", "default": 67108864}
+    argument_spec["resume"] = {"type": "bool", "default": True}
+
+    return argument_spec
+
+
+async def main():
+    required_if = list([])
+
+    await run_module(
+        AnsibleModule,
+        "content_library_item_download",
+        prepare_argument_spec(),
+        entry_point,
+        required_if=required_if,
+    )
+
+
+def build_url(params):
+    return ("https://{vcenter_hostname}" "/api/content/library/item").format(**params)
+
+
+async def gather_or_cancel(coros):
+    tasks = [asyncio.ensure_future(i) for i in coros]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def is_downloaded(path, remote_file):
+    if not os.path.isfile(path) or os.stat(path).st_size != remote_file["size"]:
+        return False
+    checksum_info = remote_file.get("checksum_info")
+    if not checksum_info:
+        return True
+    checksum = file_checksum(path, checksum_info["algorithm"].lower())
+    return checksum == checksum_info["checksum"]
+
+
+def load_progress(params, remote_file, part_path):
+    state = {
+        "size": remote_file["size"],
+        "checksum_info": remote_file.get("checksum_info"),
+        "part_size": params["part_size"],
+        "done": [],
+    }
+    if not params["resume"] or not os.path.isfile(part_path):
+        return state
+    try:
+        with open(part_path + ".json") as fd:
+            previous = json.load(fd)
+    except (OSError, ValueError):
+        return state
+    if all(previous.get(k) == state[k] for k in ("size", "checksum_info", "part_size")):
+        state["done"] = previous.get("done") or []
+    return state
+
+
+def save_progress(part_path, state):
+    with open(part_path + ".json", "w") as fd:
+        json.dump(state, fd)
+
+
+def open_part_file(part_path, size, resumed):
+    if resumed:
+        return os.open(part_path, os.O_RDWR)
+    fd = os.open(part_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    os.ftruncate(fd, size)
+    if size and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except OSError:  # e.g: not supported by the filesystem
+            pass
+    return fd
+
+
+async def prepare_file(params, session, session_id, name):
+    url = build_url(params) + "/downloadsession/file/" + session_id
+    await transfer_request(
+        session,
+        "post",
+        url + "?action=prepare",
+        params,
+        json={"file_name": name, "endpoint_type": "HTTPS"},
+    )
+    while True:
+        session.invalidate(url)
+        info = await transfer_request(
+            session, "get", url + "?file_name=" + name, params
+        )
+        if info["status"] == "PREPARED":
+            return info
+        if info["status"] == "ERROR":
+            raise TransferError(f"Failed to prepare {name}: {info}")
+        await asyncio.sleep(1)
+
+
+async def download_part(params, session, uri, fd, start, end, semaphore):
+    async with semaphore:
+        async with session.get(
+            uri,
+            headers={"Range": "bytes={0}-{1}".format(start, end)},
+            **session_timeout(params),
+        ) as resp:
+            # A server may ignore the range and send the whole file
+            whole_file = start == 0 and resp.content_length == end + 1
+            if resp.status != 206 and not (resp.status == 200 and whole_file):
+                raise TransferError(
+                    f"Request has failed: GET {uri}, Range: bytes={start}-{end}, status={resp.status}"
+                )
+            loop = asyncio.get_event_loop()
+            offset = start
+            async for chunk in resp.content.iter_chunked(params["chunk_size"]):
+                await loop.run_in_executor(None, os.pwrite, fd, chunk, offset)
+                offset += len(chunk)
+    if offset != end + 1:
+        raise TransferError(
+            f"Short read: GET {uri}, Range: bytes={start}-{end}, got {offset - start} bytes"
+        )
+
+
+async def download_file(params, session, session_id, remote_file, semaphore):
+    loop = asyncio.get_event_loop()
+    path = os.path.join(params["dest"], remote_file["name"])
+    part_path = path + ".part"
+    size = remote_file["size"]
+    part_size = params["part_size"]
+    parts = [
+        (start, min(start + part_size, size) - 1) for start in range(0, size, part_size)
+    ]
+    state = load_progress(params, remote_file, part_path)
+    todo = [i for i in range(len(parts)) if i not in state["done"]]
+
+    fd = open_part_file(part_path, size, bool(state["done"]))
+    try:
+        if todo:
+            info = await prepare_file(params, session, session_id, remote_file["name"])
+            uri = info["download_endpoint"]["uri"]
+
+            async def fetch(index):
+                await download_part(
+                    params, session, uri, fd, *parts[index], semaphore=semaphore
+                )
+                state["done"].append(index)
+                save_progress(part_path, state)
+
+            await gather_or_cancel([fetch(i) for i in todo])
+        await loop.run_in_executor(None, os.fsync, fd)
+    finally:
+        os.close(fd)
+
+    checksum_info = remote_file.get("checksum_info")
+    if checksum_info:
+        checksum = await loop.run_in_executor(
+            None, file_checksum, part_path, checksum_info["algorithm"].lower()
+        )
+        if checksum != checksum_info["checksum"]:
+            os.remove(part_path)
+            os.remove(part_path + ".json")
+            raise TransferError(
+                f"Checksum mismatch for {remote_file['name']}: {checksum}"
+            )
+    os.replace(part_path, path)
+    if os.path.exists(part_path + ".json"):
+        os.remove(part_path + ".json")
+
+
+async def keep_alive(params, session, session_id):
+    url = build_url(params) + "/download-session/" + session_id + "?action=keep-alive"
+    while True:
+        await asyncio.sleep(60)
+        await transfer_request(session, "post", url, params)
+
+
+async def download(params, session, item_id, remote_files):
+    url = build_url(params) + "/download-session"
+    session_id = await transfer_request(
+        session, "post", url, params, json={"library_item_id": item_id}
+    )
+    semaphore = asyncio.Semaphore(params["max_concurrent_requests"])
+    keeper = asyncio.ensure_future(keep_alive(params, session, session_id))
+    try:
+        await gather_or_cancel(
+            [
+                download_file(params, session, session_id, i, semaphore)
+                for i in remote_files
+            ]
+        )
+    finally:
+        keeper.cancel()
+        await asyncio.gather(keeper, return_exceptions=True)
+        # The partial files stay on disk, the next run starts a new session
+        await transfer_request(session, "delete", url + "/" + session_id, params)
+
+
+async def entry_point(module, session):
+    params = module.params
+    loop = asyncio.get_event_loop()
+    item_id = params["library_item_id"]
+
+    try:
+        remote_files = await transfer_request(
+            session, "get", build_url(params) + "/" + item_id + "/file", params
+        )
+    except TransferError as e:
+        return {"failed": True, "changed": False, "msg": str(e)}
+    if params["files"]:
+        missing = set(params["files"]) - set([i["name"] for i in remote_files])
+        if missing:
+            return {
+                "failed": True,
+                "changed": False,
+                "msg": "Unknown files: {0}".format(", ".join(sorted(missing))),
+            }
+        remote_files = [i for i in remote_files if i["name"] in params["files"]]
+    paths = [os.path.join(params["dest"], i["name"]) for i in remote_files]
+    downloaded = await asyncio.gather(
+        *[
+            loop.run_in_executor(None, is_downloaded, path, remote_file)
+            for path, remote_file in zip(paths, remote_files)
+        ]
+    )
+    value = [
+        {
+            "name": remote_file["name"],
+            "path": path,
+            "size": remote_file["size"],
+            "checksum_info": remote_file.get("checksum_info"),
+            "changed": not done,
+        }
+        for path, remote_file, done in zip(paths, remote_files, downloaded)
+    ]
+    to_download = [i for i, done in zip(remote_files, downloaded) if not done]
+    if not to_download or module.check_mode:
+        return {"id": item_id, "value": value, "changed": bool(to_download)}
+
+    os.makedirs(params["dest"], exist_ok=True)
+    try:
+        await download(params, session, item_id, to_download)
+    except TransferError as e:
+        return {
+            "id": item_id,
+            "value": value,
+            "changed": False,
+            "failed": True,
+            "msg": str(e),
+        }
+    return {"id": item_id, "value": value, "changed": True}
+
+
+if __name__ == "__main__":
+    current_loop = asyncio.get_event_loop_policy().get_event_loop()
+    current_loop.run_until_complete(main())
@@ -0,0 +1,421 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+
+DOCUMENTATION = r"""
+module: content_library_item_upload
+short_description: Upload local files to a library item
+description:
+- Push local files (e.g an OVF and its disks, or an ISO image) to an item of a local
+  content library through an update session.
+- The files are streamed chunk by chunk and uploaded concurrently, their SHA256 checksum
+  is computed locally and verified by vCenter.
+- An update session interrupted during a previous run is resumed, the files that
+  are already transferred are skipped and the partial files continue from the last
+  transferred byte.
+- Nothing is uploaded if the item already holds the same files.
+options:
+  chunk_size:
+    default: 1048576
+    description:
+    - The size in bytes of the chunks read from the local files.
+    type: int
+  description:
+    description:
+    - The description of the library item, used when the item is created.
+    type: str
+  files:
+    description:
+    - The local paths of the files to upload. The files keep their base name in the
+      library item.
+    elements: path
+    required: true
+    type: list
+  library_id:
+    description:
+    - Identifier of the library holding the item.
+    required: true
+    type: str
+  library_item_id:
+    description:
+    - Identifier of the library item. If not set, the item is looked up by I(name)
+      and created if it doesn't exist.
+    type: str
+  max_concurrent_uploads:
+    default: 4
+    description:
+    - The maximal number of files uploaded at the same time.
+    type: int
+  name:
+    description:
+    - The name of the library item. Required if I(library_item_id) is not set.
+    type: str
+  resume:
+    default: true
+    description:
+    - Resume the update session left active by an interrupted run.
+    type: bool
+  session_timeout:
+    description:
+    - 'Timeout settings for client session. '
+    - 'The maximal number of seconds for the whole operation including connection
+      establishment, request sending and response. '
+    - The default value is 300s.
+    type: float
+  type:
+    description:
+    - The type of the library item, e.g C(ovf) or C(iso). Used when the item is created.
+    type: str
+  vcenter_hostname:
+    description:
+    - The hostname or IP address of the vSphere vCenter
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_HOST) will be used instead.
+    required: true
+    type: str
+  vcenter_password:
+    description:
+    - The vSphere vCenter password
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_PASSWORD) will be used instead.
+    required: true
+    type: str
+  vcenter_rest_log_file:
+    description:
+    - 'You can use this optional parameter to set the location of a log file. '
+    - 'This file will be used to record the HTTP REST interaction. '
+    - 'The file will be stored on the host that run the module. '
+    - 'If the value is not specified in the task, the value of '
+    - environment variable C(VMWARE_REST_LOG_FILE) will be used instead.
+    - If the file name ends with C(.jsonl), each request is recorded as a JSON document with its answer and its timing.
+    type: str
+  vcenter_username:
+    description:
+    - The vSphere vCenter username
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_USER) will be used instead.
+    required: true
+    type: str
+  vcenter_validate_certs:
+    default: true
+    description:
+    - Allows connection when SSL certificates are not valid. Set to C(false) when
+      certificates are not trusted.
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_VALIDATE_CERTS) will be used instead.
+    type: bool
+author:
+- Ansible Cloud Team (@ansible-collections)
+version_added: 2.2.0
+requirements:
+- vSphere 7.0.2 or greater
+- python >= 3.6
+- aiohttp
+notes:
+- Tested on vSphere 7.0.2
+"""
+
+EXAMPLES = r"""
+- name: Create a new local content library
+  vmware.vmware_rest.content_locallibrary:
+    name: local_library_001
+    description: automated
+    publish_info:
+      published: true
+      authentication_method: NONE
+    storage_backings:
+    - datastore_id: "{{ lookup('vmware.vmware_rest.datastore_moid', '/my_dc/datastore/rw_datastore') }}"
+      type: DATASTORE
+    state: present
+  register: ds_lib
+
+- name: Upload an ISO image
+  vmware.vmware_rest.content_library_item_upload:
+    library_id: '{{ ds_lib.id }}'
+    name: centos-8
+    type: iso
+    files:
+    - /srv/iso/CentOS-8-x86_64-dvd1.iso
+
+- name: Upload an OVF template
+  vmware.vmware_rest.content_library_item_upload:
+    library_id: '{{ ds_lib.id }}'
+    name: my_template
+    type: ovf
+    files:
+    - /srv/ovf/my_template.ovf
+    - /srv/ovf/my_template-disk1.vmdk
+    - /srv/ovf/my_template.mf
+"""
+
+RETURN = r"""
+id:
+  description: moid of the library item
+  returned: On success
+  sample: 6d8b6a4c-8a2b-4b1e-9d7e-7b1f3f1b3c22
+  type: str
+value:
+  description: The files of the library item
+  returned: On success
+  sample:
+  - cached: true
+    checksum_info:
+      algorithm: SHA256
+      checksum: 2f3c...
+    name: CentOS-8-x86_64-dvd1.iso
+    size: 9264168960
+    version: '1'
+  type: list
+"""
+
+import asyncio
+import os
+
+try:
+    from ansible_collections.cloud.common.plugins.module_utils.turbo.module import (
+        AnsibleTurboModule as AnsibleModule,
+    )
+
+    AnsibleModule.collection_name = "vmware.vmware_rest"
+except ImportError:
+    from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
+    file_checksum,
+    file_sender,
+    TransferError,
+    transfer_request,
+    session_timeout,
+    connection_argument_spec,
+    run_module,
+)
+
+
+def prepare_argument_spec():
+    argument_spec = connection_argument_spec()
+
+    argument_spec["chunk_size"] = {"type": "int", "default": 1048576}
+    argument_spec["description"] = {"type": "str"}
+    argument_spec["files"] = {"required": True, "type": "list", "elements": "path"}
+    argument_spec["library_id"] = {"required": True, "type": "str"}
+    argument_spec["library_item_id"] = {"type": "str"}
+    argument_spec["max_concurrent_uploads"] = {"type": "int", "default": 4}
+    argument_spec["name"] = {"type": "str"}
+    argument_spec["resume"] = {"type": "bool", "default": True}
+    argument_spec["type"] = {"type": "str"}
+
+    return argument_spec
+
+
+async def main():
+    required_if = list([])
+
+    await run_module(
+        AnsibleModule,
+        "content_library_item_upload",
+        prepare_argument_spec(),
+        entry_point,
+        required_if=required_if,
+        required_one_of=[["library_item_id", "name"]],
+    )
+
+
+def build_url(params):
+    return ("https://{vcenter_hostname}" "/api/content/library/item").format(**params)
+
+
+async def find_item(params, session):
+    if params["library_item_id"]:
+        return params["library_item_id"]
+    found = await transfer_request(
+        session,
+        "post",
+        build_url(params) + "?action=find",
+        params,
+        json={"library_id": params["library_id"], "name": params["name"]},
+    )
+    if found:
+        return found[0]
+
+
+async def create_item(params, session):
+    spec = {"library_id": params["library_id"], "name": params["name"]}
+    if params["type"]:
+        spec["type"] = params["type"]
+    if params["description"]:
+        spec["description"] = params["description"]
+    return await transfer_request(session, "post", build_url(params), params, json=spec)
+
+
+async def get_update_session(params, session, item_id):
+    url = build_url(params) + "/update-session"
+    if params["resume"]:
+        session_ids = await transfer_request(session, "get", url, params) or []
+        update_sessions = await asyncio.gather(
+            *[
+                transfer_request(session, "get", url + "/" + i, params)
+                for i in session_ids
+            ]
+        )
+        for session_id, info in zip(session_ids, update_sessions):
+            if info["library_item_id"] == item_id and info["state"] == "ACTIVE":
+                return session_id
+    return await transfer_request(
+        session, "post", url, params, json={"library_item_id": item_id}
+    )
+
+
+async def upload_file(params, session, session_id, local_file, semaphore):
+    url = build_url(params) + "/updatesession/file/" + session_id
+    async with semaphore:
+        async with session.get(
+            url + "/" + local_file["name"], **session_timeout(params)
+        ) as resp:
+            info = await resp.json() if resp.status == 200 else None
+        if isinstance(info, dict) and "value" in info:  # 7.0.2 <
+            info = info["value"]
+        if info and info["status"] == "READY":
+            return
+        if not info:
+            spec = {
+                "name": local_file["name"],
+                "source_type": "PUSH",
+                "size": local_file["size"],
+                "checksum_info": {
+                    "algorithm": "SHA256",
+                    "checksum": local_file["checksum"],
+                },
+            }
+            info = await transfer_request(
+                session, "post", url + "?action=add", params, json=spec
+            )
+        offset = info.get("bytes_transferred") or 0
+        headers = {
+            "Content-Type": "application/octet-stream",
+            "Content-Length": str(local_file["size"] - offset),
+        }
+        if offset:
+            headers["Content-Range"] = "bytes {0}-{1}/{2}".format(
+                offset, local_file["size"] - 1, local_file["size"]
+            )
+        await transfer_request(
+            session,
+            "put",
+            info["upload_endpoint"]["uri"],
+            params,
+            headers=headers,
+            data=file_sender(local_file["path"], offset, params["chunk_size"]),
+        )
+
+
+async def wait_for_session(params, session, session_id):
+    url = build_url(params) + "/update-session/" + session_id
+    while True:
+        session.invalidate(url)
+        info = await transfer_request(session, "get", url, params)
+        if info["state"] != "ACTIVE":
+            return info
+        await asyncio.sleep(1)
+
+
+async def upload(params, session, item_id, local_files):
+    session_id = await get_update_session(params, session, item_id)
+    semaphore = asyncio.Semaphore(params["max_concurrent_uploads"])
+    url = build_url(params) + "/updatesession/file/" + session_id
+    # On failure, the session stays active and the next run resumes it
+    await asyncio.gather(
+        *[upload_file(params, session, session_id, i, semaphore) for i in local_files]
+    )
+    validation = await transfer_request(
+        session, "post", url + "?action=validate", params
+    )
+    if validation and validation.get("has_errors"):
+        await transfer_request(
+            session,
+            "post",
+            build_url(params) + "/update-session/" + session_id + "?action=fail",
+            params,
+            json={"client_error_message": "The validation of the files has failed"},
+        )
+        return validation
+    await transfer_request(
+        session,
+        "post",
+        build_url(params) + "/update-session/" + session_id + "?action=complete",
+        params,
+    )
+    info = await wait_for_session(params, session, session_id)
+    if info["state"] != "DONE":
+        return info
+
+
+async def entry_point(module, session):
+    try:
+        return await synchronize(module, session)
+    except TransferError as e:
+        return {"failed": True, "changed": False, "msg": str(e)}
+
+
+async def synchronize(module, session):
+    params = module.params
+    loop = asyncio.get_event_loop()
+
+    local_files = []
+    for path in params["files"]:
+        if not os.path.isfile(path):
+            return {"failed": True, "changed": False, "msg": f"{path} is not a file"}
+        local_files.append(
+            {
+                "path": path,
+                "name": os.path.basename(path),
+                "size": os.stat(path).st_size,
+            }
+        )
+    checksums = await asyncio.gather(
+        *[loop.run_in_executor(None, file_checksum, i["path"]) for i in local_files]
+    )
+    for local_file, checksum in zip(local_files, checksums):
+        local_file["checksum"] = checksum
+
+    item_id = await find_item(params, session)
+    remote_files = {}
+    if not item_id:
+        if module.check_mode:
+            return {"id": None, "value": [], "changed": True}
+        item_id = await create_item(params, session)
+    else:
+        for i in await transfer_request(
+            session, "get", build_url(params) + "/" + item_id + "/file", params
+        ):
+            remote_files[i["name"]] = i
+    to_upload = [
+        i
+        for i in local_files
+        if not remote_files.get(i["name"])
+        or remote_files[i["name"]].get("size") != i["size"]
+        or (remote_files[i["name"]].get("checksum_info") or {}).get("checksum")
+        != i["checksum"]
+    ]
+    if not to_upload:
+        return {"id": item_id, "value": list(remote_files.values()), "changed": False}
+    if module.check_mode:
+        return {"id": item_id, "value": list(remote_files.values()), "changed": True}
+
+    error = await upload(params, session, item_id, to_upload)
+    if error:
+        return {"id": item_id, "value": error, "changed": True, "failed": True}
+    # The update session has changed the item behind our back
+    session.invalidate(build_url(params) + "/" + item_id)
+    files = await transfer_request(
+        session, "get", build_url(params) + "/" + item_id + "/file", params
+    )
+    return {"id": item_id, "value": files, "changed": True}
+
+
+if __name__ == "__main__":
+    current_loop = asyncio.get_event_loop_policy().get_event_loop()
+    current_loop.run_until_complete(main())
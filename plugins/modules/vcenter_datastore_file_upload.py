@@ -0,0 +1,310 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+
+DOCUMENTATION = r"""
+module: vcenter_datastore_file_upload
+short_description: Upload a local file to a datastore
+description:
+- Copy a local file (e.g an ISO image or a VMDK) to a datastore through the file transfer
+  endpoint of vCenter.
+- The file is streamed chunk by chunk, the transfer rate can be capped.
+- Nothing is uploaded if the remote file is already up to date, see I(compare_checksum).
+options:
+  bandwidth_limit:
+    default: 0
+    description:
+    - The maximal transfer rate in bytes per second. C(0) means no limit.
+    type: int
+  chunk_size:
+    default: 1048576
+    description:
+    - The size in bytes of the chunks read from the local file.
+    type: int
+  compare_checksum:
+    default: false
+    description:
+    - By default, the remote file is up to date when it has the size of the local file
+      and it was not modified before the local file.
+    - If C(true), a remote file of the expected size is read back to compare its SHA256
+      checksum with the local file, whatever its modification time. The whole file is
+      downloaded.
+    type: bool
+  datacenter:
+    description:
+    - The name of the datacenter, or its path if it's in a folder.
+    required: true
+    type: str
+  datastore:
+    description:
+    - The name of the datastore.
+    required: true
+    type: str
+  path:
+    description:
+    - The path of the file in the datastore, e.g C(isos/fedora.iso). The parent directory
+      must exist.
+    required: true
+    type: str
+  session_timeout:
+    description:
+    - 'Timeout settings for client session. '
+    - 'The maximal number of seconds for the whole operation including connection
+      establishment, request sending and response. '
+    - The default value is 300s.
+    type: float
+  src:
+    description:
+    - The local file to upload.
+    required: true
+    type: path
+  vcenter_hostname:
+    description:
+    - The hostname or IP address of the vSphere vCenter
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_HOST) will be used instead.
+    required: true
+    type: str
+  vcenter_password:
+    description:
+    - The vSphere vCenter password
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_PASSWORD) will be used instead.
+    required: true
+    type: str
+  vcenter_rest_log_file:
+    description:
+    - 'You can use this optional parameter to set the location of a log file. '
+    - 'This file will be used to record the HTTP REST interaction. '
+    - 'The file will be stored on the host that run the module. '
+    - 'If the value is not specified in the task, the value of '
+    - environment variable C(VMWARE_REST_LOG_FILE) will be used instead.
+    - If the file name ends with C(.jsonl), each request is recorded as a JSON document with its answer and its timing.
+    type: str
+  vcenter_username:
+    description:
+    - The vSphere vCenter username
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_USER) will be used instead.
+    required: true
+    type: str
+  vcenter_validate_certs:
+    default: true
+    description:
+    - Allows connection when SSL certificates are not valid. Set to C(false) when
+      certificates are not trusted.
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_VALIDATE_CERTS) will be used instead.
+    type: bool
+author:
+- Ansible Cloud Team (@ansible-collections)
+version_added: 2.2.0
+requirements:
+- vSphere 7.0.2 or greater
+- python >= 3.6
+- aiohttp
+notes:
+- Tested on vSphere 7.0.2
+"""
+
+EXAMPLES = r"""
+- name: Upload an ISO image on the datastore
+  vmware.vmware_rest.vcenter_datastore_file_upload:
+    src: /srv/iso/fedora.iso
+    datacenter: my_dc
+    datastore: rw_datastore
+    path: fedora.iso
+    bandwidth_limit: 52428800
+
+- name: Attach the ISO image to the VM
+  vmware.vmware_rest.vcenter_vm_hardware_cdrom:
+    vm: '{{ test_vm1_info.id }}'
+    type: SATA
+    start_connected: true
+    backing:
+      iso_file: '[rw_datastore] fedora.iso'
+      type: ISO_FILE
+"""
+
+RETURN = r"""
+value:
+  description: The remote file, the checksum is only computed with I(compare_checksum)
+  returned: On success
+  sample:
+    checksum: 7b1f3f1b3c22...
+    datastore_path: '[rw_datastore] fedora.iso'
+    size: 2147483648
+  type: dict
+"""
+
+import asyncio
+import base64
+import email.utils
+import hashlib
+import os
+import urllib.parse
+
+try:
+    from ansible_collections.cloud.common.plugins.module_utils.turbo.module import (
+        AnsibleTurboModule as AnsibleModule,
+    )
+
+    AnsibleModule.collection_name = "vmware.vmware_rest"
+except ImportError:
+    from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
+    file_checksum,
+    file_sender,
+    session_timeout,
+    throttle,
+    TransferError,
+    connection_argument_spec,
+    run_module,
+)
+
+
+def prepare_argument_spec():
+    argument_spec = connection_argument_spec()
+
+    argument_spec["bandwidth_limit"] = {"type": "int", "default": 0}
+    argument_spec["chunk_size"] = {"type": "int", "default": 1048576}
+    argument_spec["compare_checksum"] = {"type": "bool", "default": False}
+    argument_spec["datacenter"] = {"required": True, "type": "str"}
+    argument_spec["datastore"] = {"required": True, "type": "str"}
+    argument_spec["path"] = {"required": True, "type": "str"}
+    argument_spec["src"] = {"required": True, "type": "path"}
+
+    return argument_spec
+
+
+async def main():
+    required_if = list([])
+
+    await run_module(
+        AnsibleModule,
+        "vcenter_datastore_file_upload",
+        prepare_argument_spec(),
+        entry_point,
+        required_if=required_if,
+    )
+
+
+def build_url(params):
+    query = urllib.parse.urlencode(
+        {"dcPath": params["datacenter"], "dsName": params["datastore"]}
+    )
+    return (
+        "https://{vcenter_hostname}/folder/".format(**params)
+        + urllib.parse.quote(params["path"].lstrip("/"))
+        + "?"
+        + query
+    )
+
+
+def basic_auth(params):
+    # The file transfer endpoint doesn't know the REST API session
+    credentials = "{vcenter_username}:{vcenter_password}".format(**params)
+    return {"Authorization": "Basic " + base64.b64encode(credentials.encode()).decode()}
+
+
+async def get_remote_stat(params, session):
+    """The size and the modification time of the remote file, None if it
+    doesn't exist."""
+    async with session.head(
+        build_url(params), headers=basic_auth(params), **session_timeout(params)
+    ) as resp:
+        if resp.status == 404:
+            return None
+        if resp.status >= 400:
+            raise TransferError(
+                f"Request has failed: HEAD {build_url(params)}, status={resp.status}"
+            )
+        mtime = None
+        if resp.headers.get("Last-Modified"):
+            mtime = email.utils.parsedate_to_datetime(
+                resp.headers["Last-Modified"]
+            ).timestamp()
+        return resp.content_length, mtime
+
+
+async def get_remote_checksum(params, session):
+    m = hashlib.sha256()
+    async with session.get(
+        build_url(params), headers=basic_auth(params), **session_timeout(params)
+    ) as resp:
+        if resp.status >= 400:
+            raise TransferError(
+                f"Request has failed: GET {build_url(params)}, status={resp.status}"
+            )
+        async for chunk in resp.content.iter_chunked(params["chunk_size"]):
+            m.update(chunk)
+    return m.hexdigest()
+
+
+async def upload(params, session, size):
+    chunks = file_sender(params["src"], chunk_size=params["chunk_size"])
+    if params["bandwidth_limit"]:
+        chunks = throttle(chunks, params["bandwidth_limit"])
+    headers = basic_auth(params)
+    headers["Content-Type"] = "application/octet-stream"
+    headers["Content-Length"] = str(size)
+    async with session.put(
+        build_url(params), headers=headers, data=chunks, **session_timeout(params)
+    ) as resp:
+        if resp.status >= 400:
+            raise TransferError(
+                f"Request has failed: PUT {build_url(params)}, status={resp.status}, {await resp.text()}"
+            )
+
+
+async def entry_point(module, session):
+    try:
+        return await synchronize(module, session)
+    except TransferError as e:
+        return {"failed": True, "changed": False, "msg": str(e)}
+
+
+async def synchronize(module, session):
+    params = module.params
+    loop = asyncio.get_event_loop()
+
+    if not os.path.isfile(params["src"]):
+        return {
+            "failed": True,
+            "changed": False,
+            "msg": f"{params['src']} is not a file",
+        }
+    size = os.stat(params["src"]).st_size
+    value = {
+        "datastore_path": "[{datastore}] {path}".format(**params),
+        "size": size,
+    }
+
+    remote_stat = await get_remote_stat(params, session)
+    up_to_date = bool(remote_stat) and remote_stat[0] == size
+    if up_to_date and not params["compare_checksum"]:
+        # Without a modification time, the size is enough
+        remote_mtime = remote_stat[1]
+        local_mtime = int(os.stat(params["src"]).st_mtime)
+        up_to_date = remote_mtime is None or remote_mtime >= local_mtime
+    elif up_to_date:
+        value["checksum"], remote_checksum = await asyncio.gather(
+            loop.run_in_executor(None, file_checksum, params["src"]),
+            get_remote_checksum(params, session),
+        )
+        up_to_date = value["checksum"] == remote_checksum
+    if up_to_date or module.check_mode:
+        return {"value": value, "changed": not up_to_date}
+
+    await upload(params, session, size)
+    return {"value": value, "changed": True}
+
+
+if __name__ == "__main__":
+    current_loop = asyncio.get_event_loop_policy().get_event_loop()
+    current_loop.run_until_complete(main())
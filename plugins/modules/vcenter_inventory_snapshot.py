@@ -0,0 +1,359 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+
+DOCUMENTATION = r"""
+module: vcenter_inventory_snapshot
+short_description: Collect the vCenter inventory as a graph of objects
+description:
+- Collect the datacenters, folders, clusters, hosts, datastores, networks, resource
+  pools and virtual machines of a vCenter, indexed by their identifier.
+- Each object has the fields of its list summary, and the identifiers of the objects
+  it belongs to, e.g. C(datacenter) or C(cluster). A virtual machine has its C(host),
+  C(cluster), C(datacenter) and C(resource_pool).
+- The relationships come from the lists filtered by parent, e.g. the virtual machines
+  of each host. All the lists are sent concurrently, in two rounds. The first one lists
+  the datacenters, clusters, hosts and resource pools, the second one the other objects
+  by datacenter and the children of each cluster, host and resource pool.
+- With several datacenters, the clusters, hosts and resource pools are listed again
+  by datacenter, to know the datacenter of each one.
+options:
+  datacenters:
+    description:
+    - The identifiers of the datacenters to collect. All the datacenters by default.
+    elements: str
+    type: list
+  session_timeout:
+    description:
+    - 'Timeout settings for client session. '
+    - 'The maximal number of seconds for the whole operation including connection
+      establishment, request sending and response. '
+    - The default value is 300s.
+    type: float
+  vcenter_hostname:
+    description:
+    - The hostname or IP address of the vSphere vCenter
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_HOST) will be used instead.
+    required: true
+    type: str
+  vcenter_password:
+    description:
+    - The vSphere vCenter password
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_PASSWORD) will be used instead.
+    required: true
+    type: str
+  vcenter_rest_log_file:
+    description:
+    - 'You can use this optional parameter to set the location of a log file. '
+    - 'This file will be used to record the HTTP REST interaction. '
+    - 'The file will be stored on the host that run the module. '
+    - 'If the value is not specified in the task, the value of '
+    - environment variable C(VMWARE_REST_LOG_FILE) will be used instead.
+    - If the file name ends with C(.jsonl), each request is recorded as a JSON document with its answer and its timing.
+    type: str
+  vcenter_username:
+    description:
+    - The vSphere vCenter username
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_USER) will be used instead.
+    required: true
+    type: str
+  vcenter_validate_certs:
+    default: true
+    description:
+    - Allows connection when SSL certificates are not valid. Set to C(false) when
+      certificates are not trusted.
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_VALIDATE_CERTS) will be used instead.
+    type: bool
+  vm_datastores:
+    default: false
+    description:
+    - Also add the C(datastores) of the disks of each virtual machine. The VM list
+      can't be filtered by datastore, this costs a request per virtual machine.
+    type: bool
+author:
+- Ansible Cloud Team (@ansible-collections)
+version_added: 2.2.0
+requirements:
+- vSphere 7.0.2 or greater
+- python >= 3.6
+- aiohttp
+notes:
+- Tested on vSphere 7.0.2
+"""
+
+EXAMPLES = r"""
+- name: Collect the inventory of my_dc
+  vmware.vmware_rest.vcenter_inventory_snapshot:
+    datacenters:
+    - "{{ lookup('vmware.vmware_rest.datacenter_moid', '/my_dc') }}"
+  register: snapshot
+
+- name: List the names of the virtual machines of each host
+  ansible.builtin.debug:
+    msg: "{{ snapshot.value.hosts[item.value.host].name }}: {{ item.value.name }}"
+  loop: "{{ snapshot.value.vms | dict2items }}"
+"""
+
+RETURN = r"""
+value:
+  description: The objects of each type, by identifier
+  returned: On success
+  sample:
+    clusters:
+      domain-c1006:
+        datacenter: datacenter-1001
+        drs_enabled: true
+        ha_enabled: false
+        name: my_cluster
+    datacenters:
+      datacenter-1001:
+        name: my_dc
+    datastores:
+      datastore-1011:
+        capacity: 1099511627776
+        datacenter: datacenter-1001
+        free_space: 549755813888
+        name: datastore0
+        type: VMFS
+    folders:
+      group-v1002:
+        datacenter: datacenter-1001
+        name: vm
+        type: VIRTUAL_MACHINE
+    hosts:
+      host-1009:
+        cluster: domain-c1006
+        connection_state: CONNECTED
+        datacenter: datacenter-1001
+        name: esxi1.test
+        power_state: POWERED_ON
+    networks:
+      network-1012:
+        datacenter: datacenter-1001
+        name: VM Network
+        type: STANDARD_PORTGROUP
+    resource_pools:
+      resgroup-1007:
+        cluster: domain-c1006
+        datacenter: datacenter-1001
+        name: Resources
+    vms:
+      vm-1013:
+        cluster: domain-c1006
+        cpu_count: 1
+        datacenter: datacenter-1001
+        host: host-1009
+        memory_size_MiB: 1024
+        name: test_vm1
+        power_state: POWERED_OFF
+        resource_pool: resgroup-1007
+  type: dict
+"""
+
+import asyncio
+import collections
+import re
+import urllib.parse
+
+try:
+    from ansible_collections.cloud.common.plugins.module_utils.turbo.module import (
+        AnsibleTurboModule as AnsibleModule,
+    )
+
+    AnsibleModule.collection_name = "vmware.vmware_rest"
+except ImportError:
+    from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
+    gather_bounded,
+    get_vm_sub_resource,
+    list_sharded,
+    session_timeout,
+    connection_argument_spec,
+    run_module,
+    DETAIL_CONCURRENCY,
+)
+
+
+# The object types, as the keys of the result: their list end-point under
+# /api/vcenter, the ID key of their summary and the filter of the lists that
+# match them
+OBJECT_TYPES = {
+    "datacenters": ("datacenter", "datacenter", "datacenters"),
+    "folders": ("folder", "folder", "folders"),
+    "clusters": ("cluster", "cluster", "clusters"),
+    "hosts": ("host", "host", "hosts"),
+    "datastores": ("datastore", "datastore", "datastores"),
+    "networks": ("network", "network", "networks"),
+    "resource_pools": ("resource-pool", "resource_pool", "resource_pools"),
+    "vms": ("vm", "vm", "vms"),
+}
+
+# The object types listed by datacenter, to know their datacenter
+BY_DATACENTER = (
+    "folders",
+    "clusters",
+    "hosts",
+    "datastores",
+    "networks",
+    "resource_pools",
+)
+
+# The lists filtered by parent, after the first round: the type of the
+# parents, the type of the children and the key of the children that gets
+# the ID of the parent. The VMs are listed by host, every VM runs on one.
+BY_PARENT = (
+    ("clusters", "hosts", "cluster"),
+    ("clusters", "resource_pools", "cluster"),
+    ("hosts", "vms", "host"),
+    ("resource_pools", "vms", "resource_pool"),
+)
+
+# e.g: [datastore1] my_vm/my_vm.vmdk
+DATASTORE_PATH = re.compile(r"^\[([^\]]+)\]")
+
+
+def prepare_argument_spec():
+    argument_spec = connection_argument_spec()
+
+    argument_spec["datacenters"] = {"type": "list", "elements": "str"}
+    argument_spec["vm_datastores"] = {"type": "bool", "default": False}
+
+    return argument_spec
+
+
+async def main():
+    required_if = list([])
+
+    await run_module(
+        AnsibleModule,
+        "vcenter_inventory_snapshot",
+        prepare_argument_spec(),
+        entry_point,
+        required_if=required_if,
+    )
+
+
+class SnapshotError(Exception):
+    """A failure of the snapshot, entry_point() returns it as the error of the
+    module."""
+
+
+def build_url(params, object_type, **filters):
+    url = "https://{vcenter_hostname}/api/vcenter/".format(**params)
+    url += OBJECT_TYPES[object_type][0]
+    query = urllib.parse.urlencode({k: v for k, v in filters.items() if v}, doseq=True)
+    return f"{url}?{query}" if query else url
+
+
+async def list_objects(params, session, object_type, **filters):
+    """The summaries of the objects of a type, by ID."""
+    _, id_key, _ = OBJECT_TYPES[object_type]
+    url = build_url(params, object_type, **filters)
+    status, answer = await list_sharded(
+        session, url, id_key, None, **session_timeout(params)
+    )
+    if status != 200:
+        messages = answer.get("messages", []) if isinstance(answer, dict) else []
+        raise SnapshotError(
+            "Request has failed: GET {0}, status={1}, {2}".format(
+                url, status, " ".join(i.get("default_message", "") for i in messages)
+            )
+        )
+    return {i[id_key]: {k: v for k, v in i.items() if k != id_key} for i in answer}
+
+
+def vm_datastores(detail, datastores):
+    """The IDs of the datastores of the disks of a VM, datastores maps the
+    names to the IDs."""
+    ids = []
+    for disk in ((detail or {}).get("disks") or {}).values():
+        match = DATASTORE_PATH.match((disk.get("backing") or {}).get("vmdk_file") or "")
+        _id = datastores.get(match.group(1)) if match else None
+        if _id and _id not in ids:
+            ids.append(_id)
+    return ids
+
+
+async def entry_point(module, session):
+    try:
+        return await snapshot(module, session)
+    except SnapshotError as e:
+        return {"failed": True, "changed": False, "msg": str(e)}
+
+
+async def snapshot(module, session):
+    params = module.params
+    datacenters = params.get("datacenters")
+    graph = {}
+    # the first round, the datacenters and the parents of the second round
+    first = ["datacenters", "clusters", "hosts", "resource_pools"]
+    results = await asyncio.gather(
+        *(list_objects(params, session, i, datacenters=datacenters) for i in first)
+    )
+    graph.update(zip(first, results))
+
+    # the second round, the lists by datacenter then by parent. The objects
+    # of the first round are listed again by datacenter only when there are
+    # several, with a single one they all belong to it.
+    by_datacenter = BY_DATACENTER
+    if len(graph["datacenters"]) == 1:
+        by_datacenter = [i for i in BY_DATACENTER if i not in first]
+        for object_type in first[1:]:
+            for summary in graph[object_type].values():
+                summary["datacenter"] = next(iter(graph["datacenters"]))
+    jobs = [
+        (object_type, "datacenter", dc, {"datacenters": [dc]})
+        for dc in graph["datacenters"]
+        for object_type in by_datacenter
+    ]
+    jobs += [
+        (children, key, parent_id, {OBJECT_TYPES[parents][2]: [parent_id]})
+        for parents, children, key in BY_PARENT
+        for parent_id in graph[parents]
+    ]
+    results = await gather_bounded(
+        (list_objects(params, session, i, **filters) for i, _, _, filters in jobs),
+        DETAIL_CONCURRENCY,
+    )
+
+    for object_type in OBJECT_TYPES:
+        graph.setdefault(object_type, {})
+    for (object_type, key, parent_id, _), objects in zip(jobs, results):
+        for _id, summary in objects.items():
+            graph[object_type].setdefault(_id, dict(summary))[key] = parent_id
+
+    for vm in graph["vms"].values():
+        host = graph["hosts"].get(vm.get("host")) or {}
+        vm["cluster"] = host.get("cluster")
+        vm["datacenter"] = host.get("datacenter")
+        vm.setdefault("resource_pool", None)
+    for host in graph["hosts"].values():
+        host.setdefault("cluster", None)
+
+    if params["vm_datastores"]:
+        by_datacenter = collections.defaultdict(dict)
+        for _id, datastore in graph["datastores"].items():
+            by_datacenter[datastore["datacenter"]][datastore["name"]] = _id
+        url = "https://{vcenter_hostname}/api/vcenter/vm".format(**params)
+        details = await gather_bounded(
+            (get_vm_sub_resource(session, url, i) for i in graph["vms"]),
+            DETAIL_CONCURRENCY,
+        )
+        for vm, detail in zip(graph["vms"].values(), details):
+            vm["datastores"] = vm_datastores(detail, by_datacenter[vm["datacenter"]])
+
+    return {"value": graph, "changed": False}
+
+
+if __name__ == "__main__":
+    current_loop = asyncio.get_event_loop_policy().get_event_loop()
+    current_loop.run_until_complete(main())
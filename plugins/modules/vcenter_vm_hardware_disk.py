@@ -33,6 +33,21 @@ options:
     description:
     - Virtual disk identifier. Required with I(state=['absent', 'present'])
     type: str
+  disks:
+    description:
+    - Create, update or remove several disks at once, each entry takes the same keys
+      as the module (C(disk), C(label), C(type), C(ide), C(sata), C(scsi), C(backing),
+      C(new_vmdk)).
+    - Each entry must designate a single disk, by its C(disk) ID, its C(label) or a
+      complete C(ide), C(sata) or C(scsi) address.
+    - The virtual hardware is listed once, with I(state=present) the entries that
+      don't match an existing disk are created on their address and the others are
+      updated, with I(state=absent) the matching disks are removed. The calls are
+      sent concurrently.
+    - Mutually exclusive with the options of a single disk.
+    elements: dict
+    type: list
+    version_added: 2.2.0
   ide:
     description:
     - Address for attaching the device to a virtual IDE adapter.
@@ -124,6 +139,7 @@ options:
     - 'The file will be stored on the host that run the module. '
     - 'If the value is not specified in the task, the value of '
     - environment variable C(VMWARE_REST_LOG_FILE) will be used instead.
+    - If the file name ends with C(.jsonl), each request is recorded as a JSON document with its answer and its timing.
     type: str
   vcenter_username:
     description:
@@ -230,7 +246,6 @@ PAYLOAD_FORMAT = {
 
 import json
 import socket
-from ansible.module_utils.basic import env_fallback
 
 try:
     from ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions import (
@@ -244,53 +259,26 @@ try:
 except ImportError:
     from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
-    build_full_device_list,
+    batch_devices,
     exists,
     gen_args,
     get_device_info,
     get_subdevice_type,
-    list_devices,
-    open_session,
     prepare_payload,
     update_changed_flag,
     session_timeout,
+    connection_argument_spec,
+    run_module,
+    run_state,
 )
 
 
 def prepare_argument_spec():
-    argument_spec = {
-        "vcenter_hostname": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_HOST"]),
-        ),
-        "vcenter_username": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_USER"]),
-        ),
-        "vcenter_password": dict(
-            type="str",
-            required=True,
-            no_log=True,
-            fallback=(env_fallback, ["VMWARE_PASSWORD"]),
-        ),
-        "vcenter_validate_certs": dict(
-            type="bool",
-            required=False,
-            default=True,
-            fallback=(env_fallback, ["VMWARE_VALIDATE_CERTS"]),
-        ),
-        "vcenter_rest_log_file": dict(
-            type="str",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_REST_LOG_FILE"]),
-        ),
-        "session_timeout": dict(
-            type="float",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_SESSION_TIMEOUT"]),
-        ),
-    }
+    argument_spec = connection_argument_spec()
 
     argument_spec["backing"] = {"type": "dict"}
     argument_spec["disk"] = {"type": "str"}
+    argument_spec["disks"] = {"type": "list", "elements": "dict"}
     argument_spec["ide"] = {"type": "dict"}
     argument_spec["label"] = {"type": "str"}
     argument_spec["new_vmdk"] = {"type": "dict"}
@@ -309,29 +297,25 @@ def prepare_argument_spec():
 
 async def main():
     required_if = list([])
-
-    module_args = prepare_argument_spec()
-    module = AnsibleModule(
-        argument_spec=module_args, required_if=required_if, supports_check_mode=True
+    mutually_exclusive = [
+        ["disks", "backing"],
+        ["disks", "disk"],
+        ["disks", "ide"],
+        ["disks", "label"],
+        ["disks", "new_vmdk"],
+        ["disks", "sata"],
+        ["disks", "scsi"],
+        ["disks", "type"],
+    ]
+
+    await run_module(
+        AnsibleModule,
+        "vcenter_vm_hardware_disk",
+        prepare_argument_spec(),
+        entry_point,
+        required_if=required_if,
+        mutually_exclusive=mutually_exclusive,
     )
-    if not module.params["vcenter_hostname"]:
-        module.fail_json("vcenter_hostname cannot be empty")
-    if not module.params["vcenter_username"]:
-        module.fail_json("vcenter_username cannot be empty")
-    if not module.params["vcenter_password"]:
-        module.fail_json("vcenter_password cannot be empty")
-    try:
-        session = await open_session(
-            vcenter_hostname=module.params["vcenter_hostname"],
-            vcenter_username=module.params["vcenter_username"],
-            vcenter_password=module.params["vcenter_password"],
-            validate_certs=module.params["vcenter_validate_certs"],
-            log_file=module.params["vcenter_rest_log_file"],
-        )
-    except EmbeddedModuleFailure as err:
-        module.fail_json(err.get_message())
-    result = await entry_point(module, session)
-    module.exit_json(**result)
 
 
 # template: default_module.j2
@@ -342,20 +326,11 @@ def build_url(params):
 
 
 async def entry_point(module, session):
-
-    if module.params["state"] == "present":
-        if "_create" in globals():
-            operation = "create"
-        else:
-            operation = "update"
-    elif module.params["state"] == "absent":
-        operation = "delete"
-    else:
-        operation = module.params["state"]
-
-    func = globals()["_" + operation]
-
-    return await func(module.params, session)
+    if module.params["disks"]:
+        return await batch_devices(
+            module, session, build_url(module.params), "disks", PAYLOAD_FORMAT
+        )
+    return await run_state(module, session, globals())
 
 
 async def _create(params, session):
@@ -66,6 +66,20 @@ options:
     - Virtual Ethernet adapter identifier. Required with I(state=['absent', 'connect',
       'disconnect', 'present'])
     type: str
+  nics:
+    description:
+    - Create, update or remove several virtual Ethernet adapters at once, each entry
+      takes the same keys as the module (C(nic), C(label), C(mac_address), C(pci_slot_number),
+      C(backing), C(type)...).
+    - Each entry must designate a single adapter, by its C(nic) ID, its C(label),
+      its C(mac_address) or its C(pci_slot_number).
+    - The virtual hardware is listed once, with I(state=present) the entries that
+      don't match an existing adapter are created and the others are updated, with
+      I(state=absent) the matching adapters are removed. The calls are sent concurrently.
+    - Mutually exclusive with the options of a single adapter.
+    elements: dict
+    type: list
+    version_added: 2.2.0
   pci_slot_number:
     description:
     - Address of the virtual Ethernet adapter on the PCI bus.  If the PCI address
@@ -134,6 +148,7 @@ options:
     - 'The file will be stored on the host that run the module. '
     - 'If the value is not specified in the task, the value of '
     - environment variable C(VMWARE_REST_LOG_FILE) will be used instead.
+    - If the file name ends with C(.jsonl), each request is recorded as a JSON document with its answer and its timing.
     type: str
   vcenter_username:
     description:
@@ -309,7 +324,6 @@ PAYLOAD_FORMAT = {
 
 import json
 import socket
-from ansible.module_utils.basic import env_fallback
 
 try:
     from ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions import (
@@ -323,50 +337,22 @@ try:
 except ImportError:
     from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
-    build_full_device_list,
+    batch_devices,
     exists,
     gen_args,
     get_device_info,
     get_subdevice_type,
-    list_devices,
-    open_session,
     prepare_payload,
     update_changed_flag,
     session_timeout,
+    connection_argument_spec,
+    run_module,
+    run_state,
 )
 
 
 def prepare_argument_spec():
-    argument_spec = {
-        "vcenter_hostname": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_HOST"]),
-        ),
-        "vcenter_username": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_USER"]),
-        ),
-        "vcenter_password": dict(
-            type="str",
-            required=True,
-            no_log=True,
-            fallback=(env_fallback, ["VMWARE_PASSWORD"]),
-        ),
-        "vcenter_validate_certs": dict(
-            type="bool",
-            required=False,
-            default=True,
-            fallback=(env_fallback, ["VMWARE_VALIDATE_CERTS"]),
-        ),
-        "vcenter_rest_log_file": dict(
-            type="str",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_REST_LOG_FILE"]),
-        ),
-        "session_timeout": dict(
-            type="float",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_SESSION_TIMEOUT"]),
-        ),
-    }
+    argument_spec = connection_argument_spec()
 
     argument_spec["allow_guest_control"] = {"type": "bool"}
     argument_spec["backing"] = {"type": "dict"}
@@ -377,6 +363,7 @@ def prepare_argument_spec():
         "choices": ["ASSIGNED", "GENERATED", "MANUAL"],
     }
     argument_spec["nic"] = {"type": "str"}
+    argument_spec["nics"] = {"type": "list", "elements": "dict"}
     argument_spec["pci_slot_number"] = {"type": "int"}
     argument_spec["start_connected"] = {"type": "bool"}
     argument_spec["state"] = {
@@ -397,29 +384,28 @@ def prepare_argument_spec():
 
 async def main():
     required_if = list([])
-
-    module_args = prepare_argument_spec()
-    module = AnsibleModule(
-        argument_spec=module_args, required_if=required_if, supports_check_mode=True
+    mutually_exclusive = [
+        ["nics", "allow_guest_control"],
+        ["nics", "backing"],
+        ["nics", "label"],
+        ["nics", "mac_address"],
+        ["nics", "mac_type"],
+        ["nics", "nic"],
+        ["nics", "pci_slot_number"],
+        ["nics", "start_connected"],
+        ["nics", "type"],
+        ["nics", "upt_compatibility_enabled"],
+        ["nics", "wake_on_lan_enabled"],
+    ]
+
+    await run_module(
+        AnsibleModule,
+        "vcenter_vm_hardware_ethernet",
+        prepare_argument_spec(),
+        entry_point,
+        required_if=required_if,
+        mutually_exclusive=mutually_exclusive,
     )
-    if not module.params["vcenter_hostname"]:
-        module.fail_json("vcenter_hostname cannot be empty")
-    if not module.params["vcenter_username"]:
-        module.fail_json("vcenter_username cannot be empty")
-    if not module.params["vcenter_password"]:
-        module.fail_json("vcenter_password cannot be empty")
-    try:
-        session = await open_session(
-            vcenter_hostname=module.params["vcenter_hostname"],
-            vcenter_username=module.params["vcenter_username"],
-            vcenter_password=module.params["vcenter_password"],
-            validate_certs=module.params["vcenter_validate_certs"],
-            log_file=module.params["vcenter_rest_log_file"],
-        )
-    except EmbeddedModuleFailure as err:
-        module.fail_json(err.get_message())
-    result = await entry_point(module, session)
-    module.exit_json(**result)
 
 
 # template: default_module.j2
@@ -430,20 +416,11 @@ def build_url(params):
 
 
 async def entry_point(module, session):
-
-    if module.params["state"] == "present":
-        if "_create" in globals():
-            operation = "create"
-        else:
-            operation = "update"
-    elif module.params["state"] == "absent":
-        operation = "delete"
-    else:
-        operation = module.params["state"]
-
-    func = globals()["_" + operation]
-
-    return await func(module.params, session)
+    if module.params["nics"]:
+        return await batch_devices(
+            module, session, build_url(module.params), "nics", PAYLOAD_FORMAT
+        )
+    return await run_state(module, session, globals())
 
 
 async def _connect(params, session):
@@ -0,0 +1,595 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+
+DOCUMENTATION = r"""
+module: vcenter_vm_hardware_profile
+short_description: Bring the virtual hardware of a virtual machine to a declared profile
+description:
+- Fetch the hardware of the virtual machine, compare it with the declared profile and
+  apply the minimal set of creations, updates and deletions.
+- The adapters are created before the disks and the CD-ROMs, the devices are removed
+  before their adapter. The other changes are sent concurrently.
+- Each device of the profile must designate a single device, by its identifier, its
+  C(label) or its complete address (e.g C(scsi.bus) and C(scsi.unit)), it is matched
+  with the existing device it designates. The devices that don't match anything are
+  created.
+- The disks and the CD-ROMs created without a complete address, i.e. designated by
+  their C(label), get a free slot of their adapter, e.g. the next C(scsi.unit) of
+  the bus.
+options:
+  cdroms:
+    description:
+    - The CD-ROM devices of the virtual machine.
+    - 'Valid attributes are:'
+    - ' - C(cdrom) (str): Virtual CD-ROM device identifier.'
+    - ' - C(label) (str): Device label.'
+    - ' - C(type) (str): The C(host_bus_adapter_type) used to attach the device.'
+    - ' - C(ide) (dict): Address of the device on a virtual IDE adapter (C(primary), C(master)).'
+    - ' - C(sata) (dict): Address of the device on a virtual SATA adapter (C(bus), C(unit)).'
+    - ' - C(backing) (dict): Physical resource backing for the virtual CD-ROM device.'
+    - ' - C(start_connected) (bool): Flag indicating whether the virtual device should
+      be connected whenever the virtual machine is powered on.'
+    - ' - C(allow_guest_control) (bool): Flag indicating whether the guest can connect
+      and disconnect the device.'
+    elements: dict
+    type: list
+  cpu:
+    description:
+    - The CPU-related settings of the virtual machine.
+    - 'Valid attributes are:'
+    - ' - C(count) (int): New number of CPU cores.'
+    - ' - C(cores_per_socket) (int): New number of CPU cores per socket.'
+    - ' - C(hot_add_enabled) (bool): Flag indicating whether adding CPUs while the
+      virtual machine is running is enabled.'
+    - ' - C(hot_remove_enabled) (bool): Flag indicating whether removing CPUs while
+      the virtual machine is running is enabled.'
+    type: dict
+  disks:
+    description:
+    - The virtual disks of the virtual machine.
+    - 'Valid attributes are:'
+    - ' - C(disk) (str): Virtual disk identifier.'
+    - ' - C(label) (str): Device label.'
+    - ' - C(type) (str): The C(host_bus_adapter_type) used to attach the disk.'
+    - ' - C(ide) (dict): Address of the disk on a virtual IDE adapter (C(primary), C(master)).'
+    - ' - C(sata) (dict): Address of the disk on a virtual SATA adapter (C(bus), C(unit)).'
+    - ' - C(scsi) (dict): Address of the disk on a virtual SCSI adapter (C(bus), C(unit)).'
+    - ' - C(backing) (dict): Existing physical resource backing for the virtual disk.'
+    - ' - C(new_vmdk) (dict): Specification for creating a new VMDK backing for the
+      virtual disk.'
+    elements: dict
+    type: list
+  memory:
+    description:
+    - The memory-related settings of the virtual machine.
+    - 'Valid attributes are:'
+    - ' - C(size_MiB) (int): New memory size in mebibytes.'
+    - ' - C(hot_add_enabled) (bool): Flag indicating whether adding memory while the
+      virtual machine is running should be enabled.'
+    type: dict
+  nics:
+    description:
+    - The virtual Ethernet adapters of the virtual machine.
+    - 'Valid attributes are:'
+    - ' - C(nic) (str): Virtual Ethernet adapter identifier.'
+    - ' - C(label) (str): Device label.'
+    - ' - C(type) (str): Ethernet adapter emulation type.'
+    - ' - C(pci_slot_number) (int): Address of the virtual Ethernet adapter on the
+      PCI bus.'
+    - ' - C(backing) (dict): Physical resource backing for the virtual Ethernet adapter.'
+    - ' - C(mac_type) (str): MAC address type.'
+    - ' - C(mac_address) (str): MAC address.'
+    - ' - C(start_connected) (bool): Flag indicating whether the virtual device should
+      be connected whenever the virtual machine is powered on.'
+    - ' - C(allow_guest_control) (bool): Flag indicating whether the guest can connect
+      and disconnect the device.'
+    - ' - C(wake_on_lan_enabled) (bool): Flag indicating whether wake-on-LAN shoud
+      be enabled on the virtual Ethernet adapter.'
+    - ' - C(upt_compatibility_enabled) (bool): Flag indicating whether Universal Pass-Through
+      (UPT) compatibility should be enabled on the virtual Ethernet adapter.'
+    elements: dict
+    type: list
+  purge:
+    default: false
+    description:
+    - Remove the devices that don't match any entry of the profile.
+    - Only the kinds of device listed in the profile are considered, e.g C(disks=[])
+      removes all the disks but the Ethernet adapters are left untouched if C(nics)
+      is not set.
+    type: bool
+  sata_adapters:
+    description:
+    - The virtual SATA adapters of the virtual machine.
+    - 'Valid attributes are:'
+    - ' - C(adapter) (str): Virtual SATA adapter identifier.'
+    - ' - C(label) (str): Device label.'
+    - ' - C(bus) (int): SATA bus number.'
+    - ' - C(type) (str): Adapter type.'
+    - ' - C(pci_slot_number) (int): Address of the SATA adapter on the PCI bus.'
+    elements: dict
+    type: list
+  scsi_adapters:
+    description:
+    - The virtual SCSI adapters of the virtual machine.
+    - 'Valid attributes are:'
+    - ' - C(adapter) (str): Virtual SCSI adapter identifier.'
+    - ' - C(label) (str): Device label.'
+    - ' - C(bus) (int): SCSI bus number.'
+    - ' - C(type) (str): Adapter type.'
+    - ' - C(sharing) (str): Bus sharing mode.'
+    - ' - C(pci_slot_number) (int): Address of the SCSI adapter on the PCI bus.'
+    elements: dict
+    type: list
+  session_timeout:
+    description:
+    - 'Timeout settings for client session. '
+    - 'The maximal number of seconds for the whole operation including connection
+      establishment, request sending and response. '
+    - The default value is 300s.
+    type: float
+  vcenter_hostname:
+    description:
+    - The hostname or IP address of the vSphere vCenter
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_HOST) will be used instead.
+    required: true
+    type: str
+  vcenter_password:
+    description:
+    - The vSphere vCenter password
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_PASSWORD) will be used instead.
+    required: true
+    type: str
+  vcenter_rest_log_file:
+    description:
+    - 'You can use this optional parameter to set the location of a log file. '
+    - 'This file will be used to record the HTTP REST interaction. '
+    - 'The file will be stored on the host that run the module. '
+    - 'If the value is not specified in the task, the value of '
+    - environment variable C(VMWARE_REST_LOG_FILE) will be used instead.
+    - If the file name ends with C(.jsonl), each request is recorded as a JSON document with its answer and its timing.
+    type: str
+  vcenter_username:
+    description:
+    - The vSphere vCenter username
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_USER) will be used instead.
+    required: true
+    type: str
+  vcenter_validate_certs:
+    default: true
+    description:
+    - Allows connection when SSL certificates are not valid. Set to C(false) when
+      certificates are not trusted.
+    - If the value is not specified in the task, the value of environment variable
+      C(VMWARE_VALIDATE_CERTS) will be used instead.
+    type: bool
+  vm:
+    description:
+    - Virtual machine identifier. This parameter is mandatory.
+    required: true
+    type: str
+author:
+- Ansible Cloud Team (@ansible-collections)
+version_added: 2.2.0
+requirements:
+- vSphere 7.0.2 or greater
+- python >= 3.6
+- aiohttp
+notes:
+- Tested on vSphere 7.0.2
+- Supports check mode, the planned changes are returned but not applied.
+"""
+
+EXAMPLES = r"""
+- name: Look up the VM called test_vm1 in the inventory
+  register: search_result
+  vmware.vmware_rest.vcenter_vm_info:
+    filter_names:
+    - test_vm1
+
+- name: Apply the database hardware profile
+  vmware.vmware_rest.vcenter_vm_hardware_profile:
+    vm: '{{ search_result.value[0].vm }}'
+    cpu:
+      count: 4
+      cores_per_socket: 2
+    memory:
+      size_MiB: 16384
+    scsi_adapters:
+    - bus: 1
+      type: PVSCSI
+    disks:
+    - type: SCSI
+      scsi:
+        bus: 1
+        unit: 0
+      new_vmdk:
+        capacity: 107374182400
+    - type: SCSI
+      scsi:
+        bus: 1
+        unit: 1
+      new_vmdk:
+        capacity: 107374182400
+    nics:
+    - label: Network adapter 1
+      start_connected: true
+  register: profile
+
+- name: Remove the CD-ROM drives
+  vmware.vmware_rest.vcenter_vm_hardware_profile:
+    vm: '{{ search_result.value[0].vm }}'
+    cdroms: []
+    purge: true
+"""
+
+RETURN = r"""
+changes:
+  description: The operations sent to vCenter, or planned in check mode
+  returned: always
+  sample:
+  - device: scsi_adapters
+    id: null
+    operation: create
+    payload:
+      bus: 1
+      type: PVSCSI
+  type: list
+value:
+  description: The virtual hardware of the virtual machine after the changes
+  returned: On success
+  sample:
+    cpu:
+      cores_per_socket: 2
+      count: 4
+      hot_add_enabled: false
+      hot_remove_enabled: false
+    memory:
+      hot_add_enabled: false
+      size_MiB: 16384
+  type: dict
+"""
+
+import asyncio
+
+try:
+    from ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions import (
+        EmbeddedModuleFailure,
+    )
+    from ansible_collections.cloud.common.plugins.module_utils.turbo.module import (
+        AnsibleTurboModule as AnsibleModule,
+    )
+
+    AnsibleModule.collection_name = "vmware.vmware_rest"
+except ImportError:
+    from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
+    designates_device,
+    find_device,
+    is_same,
+    plan_device_slots,
+    session_timeout,
+    connection_argument_spec,
+    run_module,
+)
+
+
+# The devices handled by the module, in the VM description: the end-point,
+# the identifier and the fields accepted by the create and update calls.
+DEVICES = {
+    "scsi_adapters": {
+        "path": "adapter/scsi",
+        "id": "adapter",
+        "create": ["bus", "pci_slot_number", "sharing", "type"],
+        "update": ["sharing"],
+    },
+    "sata_adapters": {
+        "path": "adapter/sata",
+        "id": "adapter",
+        "create": ["bus", "pci_slot_number", "type"],
+        "update": [],
+    },
+    "disks": {
+        "path": "disk",
+        "id": "disk",
+        "create": ["backing", "ide", "new_vmdk", "sata", "scsi", "type"],
+        "update": ["backing"],
+    },
+    "nics": {
+        "path": "ethernet",
+        "id": "nic",
+        "create": [
+            "allow_guest_control",
+            "backing",
+            "mac_address",
+            "mac_type",
+            "pci_slot_number",
+            "start_connected",
+            "type",
+            "upt_compatibility_enabled",
+            "wake_on_lan_enabled",
+        ],
+        "update": [
+            "allow_guest_control",
+            "backing",
+            "mac_address",
+            "mac_type",
+            "start_connected",
+            "upt_compatibility_enabled",
+            "wake_on_lan_enabled",
+        ],
+    },
+    "cdroms": {
+        "path": "cdrom",
+        "id": "cdrom",
+        "create": [
+            "allow_guest_control",
+            "backing",
+            "ide",
+            "sata",
+            "start_connected",
+            "type",
+        ],
+        "update": ["allow_guest_control", "backing", "start_connected"],
+    },
+}
+
+SETTINGS = {
+    "cpu": ["cores_per_socket", "count", "hot_add_enabled", "hot_remove_enabled"],
+    "memory": ["hot_add_enabled", "size_MiB"],
+}
+
+ADAPTERS = ["scsi_adapters", "sata_adapters"]
+
+
+def prepare_argument_spec():
+    argument_spec = connection_argument_spec()
+
+    argument_spec["cdroms"] = {"type": "list", "elements": "dict"}
+    argument_spec["cpu"] = {"type": "dict"}
+    argument_spec["disks"] = {"type": "list", "elements": "dict"}
+    argument_spec["memory"] = {"type": "dict"}
+    argument_spec["nics"] = {"type": "list", "elements": "dict"}
+    argument_spec["purge"] = {"type": "bool", "default": False}
+    argument_spec["sata_adapters"] = {"type": "list", "elements": "dict"}
+    argument_spec["scsi_adapters"] = {"type": "list", "elements": "dict"}
+    argument_spec["vm"] = {"required": True, "type": "str"}
+
+    return argument_spec
+
+
+async def main():
+    required_if = list([])
+
+    await run_module(
+        AnsibleModule,
+        "vcenter_vm_hardware_profile",
+        prepare_argument_spec(),
+        entry_point,
+        required_if=required_if,
+    )
+
+
+def build_url(params):
+    return ("https://{vcenter_hostname}" "/api/vcenter/vm/{vm}").format(**params)
+
+
+def check_profile(params):
+    """Return an error message if an entry of the profile doesn't designate
+    a single device, it would never match and be created on each run."""
+    for kind, definition in DEVICES.items():
+        for spec in params.get(kind) or []:
+            if not designates_device(spec, kind, definition["id"]):
+                return f"Each entry of {kind} needs a {definition['id']}, a label or a complete address: {spec}"
+
+
+def match_devices(params, hardware):
+    """The entries of each kind of device of the profile, with the ID of the
+    device they designate or None."""
+    matches = {}
+    for kind, definition in DEVICES.items():
+        if params.get(kind) is None:
+            continue
+        current = hardware.get(kind) or {}
+        claimed = set()
+        matches[kind] = []
+        for spec in params[kind]:
+            _id = find_device(spec, current, kind, definition["id"], claimed)
+            if _id is not None:
+                claimed.add(_id)
+            matches[kind].append((spec, _id))
+    return matches
+
+
+def plan_slots(params, hardware, matches):
+    """Give a free adapter slot to the disks and the CD-ROMs to create that
+    come without a complete address, the calls run concurrently and vCenter
+    would give them the same one.
+
+    The adapters of the profile are counted, and with purge, the slots of
+    the devices that go away are free."""
+    planned = {}
+    for kind in DEVICES:
+        current = dict(hardware.get(kind) or {})
+        if params["purge"] and kind in matches:
+            kept = {_id for _, _id in matches[kind]}
+            current = {k: v for k, v in current.items() if k in kept}
+        planned[kind] = current
+    for kind in ADAPTERS:
+        for index, (spec, _id) in enumerate(matches.get(kind, [])):
+            if _id is not None or spec.get("bus") is None:
+                continue
+            address = (
+                {"scsi": {"bus": spec["bus"]}} if kind == "scsi_adapters" else spec
+            )
+            planned[kind][f"new-{index}"] = address
+    entries = [
+        spec
+        for kind in ("disks", "cdroms")
+        for spec, _id in matches.get(kind, [])
+        if _id is None
+    ]
+    plan_device_slots(planned, entries)
+
+
+def plan_changes(params, hardware):
+    """Compare the profile with the current hardware.
+
+    Return two lists of operations, the second one must only start once
+    the first one is done.
+    """
+    first, second = [], []
+
+    for setting, fields in SETTINGS.items():
+        if not params.get(setting):
+            continue
+        current = hardware.get(setting) or {}
+        payload = {
+            k: params[setting][k]
+            for k in fields
+            if params[setting].get(k) is not None
+            and not is_same(params[setting][k], current.get(k))
+        }
+        if payload:
+            first.append(
+                {
+                    "operation": "update",
+                    "device": setting,
+                    "id": None,
+                    "payload": payload,
+                }
+            )
+
+    matches = match_devices(params, hardware)
+    plan_slots(params, hardware, matches)
+
+    for kind, definition in DEVICES.items():
+        if kind not in matches:
+            continue
+        current = hardware.get(kind) or {}
+        stage = first if kind in ADAPTERS else second
+        for spec, _id in matches[kind]:
+            if _id is None:
+                payload = {
+                    k: spec[k] for k in definition["create"] if spec.get(k) is not None
+                }
+                stage.append(
+                    {
+                        "operation": "create",
+                        "device": kind,
+                        "id": None,
+                        "payload": payload,
+                    }
+                )
+                continue
+            payload = {
+                k: spec[k]
+                for k in definition["update"]
+                if spec.get(k) is not None and not is_same(spec[k], current[_id].get(k))
+            }
+            if payload:
+                stage.append(
+                    {
+                        "operation": "update",
+                        "device": kind,
+                        "id": _id,
+                        "payload": payload,
+                    }
+                )
+        if not params["purge"]:
+            continue
+        # The devices go away before their adapter
+        stage = second if kind in ADAPTERS else first
+        claimed = {_id for _, _id in matches[kind]}
+        for _id in sorted(set(current) - claimed):
+            stage.append(
+                {"operation": "delete", "device": kind, "id": _id, "payload": {}}
+            )
+
+    return first, second
+
+
+def build_change_url(params, change):
+    url = build_url(params) + "/hardware/"
+    if change["device"] in SETTINGS:
+        return url + change["device"]
+    url += DEVICES[change["device"]]["path"]
+    if change["id"]:
+        url += "/" + change["id"]
+    return url
+
+
+async def apply_change(params, session, change):
+    method = {"create": "post", "update": "patch", "delete": "delete"}
+    func = getattr(session, method[change["operation"]])
+    _url = build_change_url(params, change)
+    kwargs = session_timeout(params)
+    if change["operation"] != "delete":
+        kwargs["json"] = change["payload"]
+    async with func(_url, **kwargs) as resp:
+        _json = {}
+        if resp.content_type == "application/json":
+            _json = await resp.json()
+        if change["operation"] == "create" and resp.status in [200, 201]:
+            if isinstance(_json, dict) and "value" in _json:
+                _json = _json["value"]
+            change["id"] = _json
+        elif resp.status >= 400:
+            return f"{change['operation']} {change['device']} {change['id'] or ''} has failed: status={resp.status}, {_json}"
+
+
+async def get_hardware(params, session):
+    async with session.get(build_url(params), **session_timeout(params)) as resp:
+        _json = await resp.json()
+        if "value" in _json:
+            _json = _json["value"]
+        if resp.status != 200:
+            return resp.status, _json
+        hardware = {k: _json.get(k) for k in list(SETTINGS) + list(DEVICES)}
+        return resp.status, hardware
+
+
+async def entry_point(module, session):
+    params = module.params
+    error = check_profile(params)
+    if error:
+        return {"failed": True, "changed": False, "msg": error}
+    status, hardware = await get_hardware(params, session)
+    if status != 200:
+        return {
+            "failed": True,
+            "changed": False,
+            "msg": f"Cannot fetch the virtual machine: status={status}, {hardware}",
+        }
+
+    stages = plan_changes(params, hardware)
+    changes = stages[0] + stages[1]
+    result = {"changed": bool(changes), "changes": changes, "value": hardware}
+    if module.check_mode or not changes:
+        return result
+
+    for stage in stages:
+        errors = await asyncio.gather(
+            *[apply_change(params, session, change) for change in stage]
+        )
+        errors = [e for e in errors if e]
+        if errors:
+            result["failed"] = True
+            result["msg"] = "\n".join(errors)
+            return result
+
+    _, result["value"] = await get_hardware(params, session)
+    return result
+
+
+if __name__ == "__main__":
+    current_loop = asyncio.get_event_loop_policy().get_event_loop()
+    current_loop.run_until_complete(main())
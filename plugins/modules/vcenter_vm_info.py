@@ -13,7 +13,10 @@ __metaclass__ = type
 DOCUMENTATION = r"""
 module: vcenter_vm_info
 short_description: Returns information about a virtual machine.
-description: Returns information about a virtual machine.
+description:
+- Returns information about a virtual machine.
+- When vCenter refuses to list that many virtual machines, the list is split
+  by datacenter, then by host, and the shards are listed concurrently.
 options:
   clusters:
     description:
@@ -29,6 +32,41 @@ options:
       match the filter.
     elements: str
     type: list
+  dest:
+    description:
+    - The path of a local file where the objects are written, one JSON document
+      per line, instead of being returned. The objects fetched one by one are
+      written as they arrive, in that order.
+    - The module then returns the path as C(dest) and the number of objects as
+      C(count). The I(fields) apply to each object, I(format) does not.
+    - The file is replaced once complete, if its content changes, the module is
+      then C(changed). In check mode, the file is not written and the objects
+      are returned.
+    type: path
+    version_added: 2.2.0
+  detail:
+    choices:
+    - auto
+    - full
+    - summary
+    default: auto
+    description:
+    - C(summary) returns the list as vCenter answers it, for some objects only
+      their IDs.
+    - C(full) also fetches the description of each object of the list, with a
+      bounded number of concurrent requests.
+    - C(auto) fetches the descriptions when the list only has the IDs of at most
+      200 objects, a larger list is returned as is, with a warning.
+    - Not used when a single object is requested.
+    type: str
+    version_added: 2.2.0
+  fields:
+    description:
+    - The dotted paths of the keys to keep in the result, for each object, e.g.
+      C(name) or C(hardware.version). The other keys are dropped by the module.
+    elements: str
+    type: list
+    version_added: 2.2.0
   folders:
     aliases:
     - filter_folders
@@ -37,12 +75,58 @@ options:
       the filter.
     elements: str
     type: list
+  format:
+    choices:
+    - columnar
+    - native
+    default: native
+    description:
+    - C(native) returns the objects as vCenter describes them.
+    - C(columnar) returns a list of objects as a list of C(columns), the I(fields)
+      or all the keys of the objects, and a list of C(rows), the values of each
+      object in the order of the columns.
+    type: str
+    version_added: 2.2.0
   hosts:
     description:
     - Hosts that must contain the virtual machine for the virtual machine to match
       the filter.
     elements: str
     type: list
+  include:
+    choices:
+    - boot
+    - boot_devices
+    - cdroms
+    - cpu
+    - disks
+    - floppies
+    - guest_OS
+    - guest_identity
+    - guest_interfaces
+    - guest_local_filesystem
+    - guest_networking
+    - guest_routes
+    - hardware
+    - identity
+    - memory
+    - nics
+    - parallel_ports
+    - sata_adapters
+    - scsi_adapters
+    - serial_ports
+    - storage_policy
+    - tools
+    description:
+    - The details to add to the description of each virtual machine, fetched
+      concurrently.
+    - The keys of the virtual machine description, like C(cpu), C(disks) or C(nics),
+      and its sub-resources, like C(tools), C(guest_identity) (C(guest/identity))
+      or C(guest_interfaces) (C(guest/networking/interfaces)).
+    - The guest details are C(null) when the VMware Tools are not running.
+    elements: str
+    type: list
+    version_added: 2.2.0
   names:
     aliases:
     - filter_names
@@ -70,6 +154,21 @@ options:
     - The default value is 300s.
     type: float
     version_added: 2.1.0
+  state_file:
+    description:
+    - The path of a local file that keeps a fingerprint of each object of the
+      list, a hash of the object, from one run to the next.
+    - Only the objects added or modified since the previous run are returned,
+      their IDs are returned as C(added) and C(modified), the IDs of the objects
+      that are gone as C(removed). The first run returns all the objects.
+    - The objects are compared as they are returned, a change of their
+      description, e.g. a new disk of a VM with I(detail=full), is seen. All
+      the descriptions are then fetched on each run.
+    - A state file that cannot be read is replaced, all the objects are then
+      returned with a warning.
+    - The file is not updated in check mode. Not used to get a single object.
+    type: path
+    version_added: 2.2.0
   vcenter_hostname:
     description:
     - The hostname or IP address of the vSphere vCenter
@@ -91,6 +190,7 @@ options:
     - 'The file will be stored on the host that run the module. '
     - 'If the value is not specified in the task, the value of '
     - environment variable C(VMWARE_REST_LOG_FILE) will be used instead.
+    - If the file name ends with C(.jsonl), each request is recorded as a JSON document with its answer and its timing.
     type: str
   vcenter_username:
     description:
@@ -116,6 +216,24 @@ options:
     - Identifiers of virtual machines that can match the filter.
     elements: str
     type: list
+  where:
+    description:
+    - The conditions that each virtual machine of the list must pass, evaluated
+      by the module, e.g. C(name matches ^web), C(memory_size_MiB > 16384) or
+      C(guest_OS startswith RHEL).
+    - A condition is the dotted path of a key, an operator and an operand. The
+      operators are C(==), C(!=), C(<), C(<=), C(>), C(>=), C(contains), C(endswith),
+      C(in), C(matches), a regular expression, and C(startswith). C(not) before the
+      path negates the condition. The operand is read as JSON if it can be, as a
+      string otherwise.
+    - The conditions on the fields of the list are checked before the details of
+      the virtual machines are fetched. The keys of the description or the
+      sub-resources used by the other ones are fetched like with I(include),
+      they are only returned if I(include) lists them.
+    - Not used to get a single virtual machine.
+    elements: str
+    type: list
+    version_added: 2.2.0
 author:
 - Ansible Cloud Team (@ansible-collections)
 version_added: 0.1.0
@@ -148,6 +266,24 @@ EXAMPLES = r"""
   register: existing_vms
   until: existing_vms is not failed
 
+- name: Collect the disks, the NICs and the guest network interfaces of the running VMs
+  vmware.vmware_rest.vcenter_vm_info:
+    power_states:
+    - POWERED_ON
+    include:
+    - disks
+    - nics
+    - guest_interfaces
+  register: running_vms
+
+- name: Collect the web servers with a RHEL guest and more than 16GiB of memory
+  vmware.vmware_rest.vcenter_vm_info:
+    where:
+    - name matches ^web
+    - memory_size_MiB > 16384
+    - guest_OS startswith RHEL
+  register: large_rhel_web_servers
+
 - name: Create a VM
   vmware.vmware_rest.vcenter_vm:
     placement:
@@ -354,7 +490,6 @@ PAYLOAD_FORMAT = {
 
 import json
 import socket
-from ansible.module_utils.basic import env_fallback
 
 try:
     from ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions import (
@@ -368,50 +503,21 @@ try:
 except ImportError:
     from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
-    build_full_device_list,
-    exists,
     gen_args,
-    get_device_info,
-    get_subdevice_type,
-    list_devices,
-    open_session,
-    prepare_payload,
-    update_changed_flag,
-    session_timeout,
+    connection_argument_spec,
+    list_or_get,
+    run_module,
+    VM_LIST_SHARDS,
+    include_vm_resources,
+    open_state_diff,
+    VM_DESCRIPTION_KEYS,
+    VM_SUB_RESOURCES,
+    Where,
 )
 
 
 def prepare_argument_spec():
-    argument_spec = {
-        "vcenter_hostname": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_HOST"]),
-        ),
-        "vcenter_username": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_USER"]),
-        ),
-        "vcenter_password": dict(
-            type="str",
-            required=True,
-            no_log=True,
-            fallback=(env_fallback, ["VMWARE_PASSWORD"]),
-        ),
-        "vcenter_validate_certs": dict(
-            type="bool",
-            required=False,
-            default=True,
-            fallback=(env_fallback, ["VMWARE_VALIDATE_CERTS"]),
-        ),
-        "vcenter_rest_log_file": dict(
-            type="str",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_REST_LOG_FILE"]),
-        ),
-        "session_timeout": dict(
-            type="float",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_SESSION_TIMEOUT"]),
-        ),
-    }
+    argument_spec = connection_argument_spec()
 
     argument_spec["clusters"] = {"type": "list", "elements": "str"}
     argument_spec["datacenters"] = {
@@ -419,12 +525,52 @@ def prepare_argument_spec():
         "type": "list",
         "elements": "str",
     }
+    argument_spec["dest"] = {"type": "path"}
+    argument_spec["detail"] = {
+        "choices": ["auto", "full", "summary"],
+        "default": "auto",
+        "type": "str",
+    }
+    argument_spec["fields"] = {"type": "list", "elements": "str"}
     argument_spec["folders"] = {
         "aliases": ["filter_folders"],
         "type": "list",
         "elements": "str",
     }
+    argument_spec["format"] = {
+        "choices": ["columnar", "native"],
+        "default": "native",
+        "type": "str",
+    }
     argument_spec["hosts"] = {"type": "list", "elements": "str"}
+    argument_spec["include"] = {
+        "choices": [
+            "boot",
+            "boot_devices",
+            "cdroms",
+            "cpu",
+            "disks",
+            "floppies",
+            "guest_OS",
+            "guest_identity",
+            "guest_interfaces",
+            "guest_local_filesystem",
+            "guest_networking",
+            "guest_routes",
+            "hardware",
+            "identity",
+            "memory",
+            "nics",
+            "parallel_ports",
+            "sata_adapters",
+            "scsi_adapters",
+            "serial_ports",
+            "storage_policy",
+            "tools",
+        ],
+        "type": "list",
+        "elements": "str",
+    }
     argument_spec["names"] = {
         "aliases": ["filter_names"],
         "type": "list",
@@ -432,8 +578,10 @@ def prepare_argument_spec():
     }
     argument_spec["power_states"] = {"type": "list", "elements": "str"}
     argument_spec["resource_pools"] = {"type": "list", "elements": "str"}
+    argument_spec["state_file"] = {"type": "path"}
     argument_spec["vm"] = {"type": "str"}
     argument_spec["vms"] = {"type": "list", "elements": "str"}
+    argument_spec["where"] = {"type": "list", "elements": "str"}
 
     return argument_spec
 
@@ -441,28 +589,14 @@ def prepare_argument_spec():
 async def main():
     required_if = list([])
 
-    module_args = prepare_argument_spec()
-    module = AnsibleModule(
-        argument_spec=module_args, required_if=required_if, supports_check_mode=True
+    await run_module(
+        AnsibleModule,
+        "vcenter_vm_info",
+        prepare_argument_spec(),
+        entry_point,
+        required_if=required_if,
+        json_lines=True,
     )
-    if not module.params["vcenter_hostname"]:
-        module.fail_json("vcenter_hostname cannot be empty")
-    if not module.params["vcenter_username"]:
-        module.fail_json("vcenter_username cannot be empty")
-    if not module.params["vcenter_password"]:
-        module.fail_json("vcenter_password cannot be empty")
-    try:
-        session = await open_session(
-            vcenter_hostname=module.params["vcenter_hostname"],
-            vcenter_username=module.params["vcenter_username"],
-            vcenter_password=module.params["vcenter_password"],
-            validate_certs=module.params["vcenter_validate_certs"],
-            log_file=module.params["vcenter_rest_log_file"],
-        )
-    except EmbeddedModuleFailure as err:
-        module.fail_json(err.get_message())
-    result = await entry_point(module, session)
-    module.exit_json(**result)
 
 
 # template: info_list_and_get_module.j2
@@ -480,28 +614,74 @@ def build_url(params):
     )
 
 
-async def entry_point(module, session):
-    url = build_url(module.params)
-    async with session.get(url, **session_timeout(module.params)) as resp:
-        _json = await resp.json()
+def without_keys(vm, keys):
+    """The VM without the keys only fetched for the where conditions."""
+    return {k: v for k, v in vm.items() if k not in keys}
+
+
+def write_without_keys(write, keys):
+    """The write() function, for the VMs without keys."""
 
-        if "value" not in _json:  # 7.0.2+
-            _json = {"value": _json}
+    def write_vm(vm):
+        write(without_keys(vm, keys))
 
+    return write_vm
+
+
+async def entry_point(module, session):
+    include = list(module.params.get("include") or [])
+    # the keys that are only included for the where conditions
+    where_keys = []
+    where = None
+    if module.params.get("where") and not module.params.get("vm"):
+        try:
+            where = Where(module.params["where"])
+        except ValueError as e:
+            return {"failed": True, "changed": False, "msg": str(e)}
+        # the keys of the conditions that the VM summary does not have
+        for key in where.keys():
+            if key in include:
+                continue
+            if key in VM_SUB_RESOURCES or (
+                key in VM_DESCRIPTION_KEYS and module.params.get("detail") != "full"
+            ):
+                include.append(key)
+                where_keys.append(key)
+    # with include, the VMs are only written to dest, checked against the
+    # where conditions and compared with the state_file once complete
+    state = open_state_diff(module, "vm") if include else None
+    result = await list_or_get(
+        module,
+        session,
+        build_url(module.params),
+        id_key="vm",
+        shards=VM_LIST_SHARDS,
+        stream=not include,
+        where=where,
+    )
+    if include and not result.get("failed"):
         if module.params.get("vm"):
-            _json["id"] = module.params.get("vm")
-        elif module.params.get("label"):  # TODO extend the list of filter
-            _json = await exists(module.params, session, url)
-        elif (
-            isinstance(_json["value"], list)
-            and len(_json["value"]) > 0
-            and isinstance(_json["value"][0], str)
-        ):
-            # this is a list of id, we fetch the details
-            full_device_list = await build_full_device_list(session, url, _json)
-            _json = {"value": [i["value"] for i in full_device_list]}
-
-        return await update_changed_flag(_json, resp.status, "get")
+            vms = {module.params["vm"]: result["value"]}
+        else:
+            vms = {i["vm"]: i for i in result["value"]}
+        url = "https://{vcenter_hostname}/api/vcenter/vm".format(**module.params)
+        writer = getattr(module, "result_writer", None)
+        write = None
+        if writer:
+            del result["value"]
+            write = state.filter(writer.write) if state else writer.write
+            write = write_without_keys(write, where_keys) if where_keys else write
+            write = where.filter(write) if where else write
+        await include_vm_resources(session, url, vms, include, write)
+        if where and not writer:
+            result["value"] = [
+                without_keys(i, where_keys) for i in where.select(result["value"])
+            ]
+        if state and writer:
+            state.finish(result, module.check_mode)
+        elif state:
+            state.select(result, module.check_mode)
+    return result
 
 
 if __name__ == "__main__":
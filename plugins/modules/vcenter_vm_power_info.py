@@ -13,8 +13,98 @@ __metaclass__ = type
 DOCUMENTATION = r"""
 module: vcenter_vm_power_info
 short_description: Returns the power state information of a virtual machine.
-description: Returns the power state information of a virtual machine.
+description:
+- Returns the power state information of a virtual machine.
+- Without I(vm), returns the power state of each virtual machine that matches the
+  filters, by identifier, from the virtual machine list. vCenter answers once for
+  all of them, the list is split by datacenter, then by host, if vCenter refuses to
+  list that many virtual machines.
 options:
+  clusters:
+    description:
+    - Clusters that must contain the virtual machine for the virtual machine to match
+      the filter.
+    elements: str
+    type: list
+    version_added: 2.2.0
+  datacenters:
+    aliases:
+    - filter_datacenters
+    description:
+    - Datacenters that must contain the virtual machine for the virtual machine to
+      match the filter.
+    elements: str
+    type: list
+    version_added: 2.2.0
+  dest:
+    description:
+    - The path of a local file where the objects are written, one JSON document
+      per line, instead of being returned. The objects fetched one by one are
+      written as they arrive, in that order.
+    - The module then returns the path as C(dest) and the number of objects as
+      C(count). The I(fields) apply to each object, I(format) does not.
+    - The file is replaced once complete, if its content changes, the module is
+      then C(changed). In check mode, the file is not written and the objects
+      are returned.
+    type: path
+    version_added: 2.2.0
+  fields:
+    description:
+    - The dotted paths of the keys to keep in the result, for each object, e.g.
+      C(name) or C(hardware.version). The other keys are dropped by the module.
+    elements: str
+    type: list
+    version_added: 2.2.0
+  folders:
+    aliases:
+    - filter_folders
+    description:
+    - Folders that must contain the virtual machine for the virtual machine to match
+      the filter.
+    elements: str
+    type: list
+    version_added: 2.2.0
+  format:
+    choices:
+    - columnar
+    - native
+    default: native
+    description:
+    - C(native) returns the objects as vCenter describes them.
+    - C(columnar) returns a list of objects as a list of C(columns), the I(fields)
+      or all the keys of the objects, and a list of C(rows), the values of each
+      object in the order of the columns.
+    type: str
+    version_added: 2.2.0
+  hosts:
+    description:
+    - Hosts that must contain the virtual machine for the virtual machine to match
+      the filter.
+    elements: str
+    type: list
+    version_added: 2.2.0
+  names:
+    aliases:
+    - filter_names
+    description:
+    - Names that virtual machines must have to match the filter (see {@link Info#name}).
+    elements: str
+    type: list
+    version_added: 2.2.0
+  power_states:
+    description:
+    - Power states that a virtual machine must be in to match the filter (see {@link
+      I(info)#state}.
+    elements: str
+    type: list
+    version_added: 2.2.0
+  resource_pools:
+    description:
+    - Resource pools that must contain the virtual machine for the virtual machine
+      to match the filter.
+    elements: str
+    type: list
+    version_added: 2.2.0
   session_timeout:
     description:
     - 'Timeout settings for client session. '
@@ -44,6 +134,7 @@ options:
     - 'The file will be stored on the host that run the module. '
     - 'If the value is not specified in the task, the value of '
     - environment variable C(VMWARE_REST_LOG_FILE) will be used instead.
+    - If the file name ends with C(.jsonl), each request is recorded as a JSON document with its answer and its timing.
     type: str
   vcenter_username:
     description:
@@ -64,6 +155,12 @@ options:
     description:
     - Virtual machine identifier. Required with I(state=['get'])
     type: str
+  vms:
+    description:
+    - Identifiers of virtual machines that can match the filter.
+    elements: str
+    type: list
+    version_added: 2.2.0
 author:
 - Ansible Cloud Team (@ansible-collections)
 version_added: 0.1.0
@@ -90,12 +187,19 @@ EXAMPLES = r"""
 - name: Get guest power information
   vmware.vmware_rest.vcenter_vm_power_info:
     vm: '{{ test_vm1_info.id }}'
+
+- name: Get the power state of the VMs of a host
+  vmware.vmware_rest.vcenter_vm_power_info:
+    hosts:
+    - '{{ my_host.host }}'
+  register: power_states
 """
 
 RETURN = r"""
 # content generated by the update_return_section callback# task: Get guest power information
 value:
-  description: Get guest power information
+  description: Get guest power information, or without I(vm) the power state of
+    each virtual machine by identifier, C(null) for the I(vms) that don't exist
   returned: On success
   sample:
     state: POWERED_ON
@@ -104,12 +208,25 @@ value:
 
 # This structure describes the format of the data expected by the end-points
 PAYLOAD_FORMAT = {
-    "get": {"query": {}, "body": {}, "path": {"vm": "vm"}}
+    "get": {"query": {}, "body": {}, "path": {"vm": "vm"}},
+    "list": {
+        "query": {
+            "clusters": "clusters",
+            "datacenters": "datacenters",
+            "folders": "folders",
+            "hosts": "hosts",
+            "names": "names",
+            "power_states": "power_states",
+            "resource_pools": "resource_pools",
+            "vms": "vms",
+        },
+        "body": {},
+        "path": {},
+    },
 }  # pylint: disable=line-too-long
 
 import json
 import socket
-from ansible.module_utils.basic import env_fallback
 
 try:
     from ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions import (
@@ -123,52 +240,48 @@ try:
 except ImportError:
     from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
-    build_full_device_list,
-    exists,
     gen_args,
-    get_device_info,
-    get_subdevice_type,
-    list_devices,
-    open_session,
-    prepare_payload,
     update_changed_flag,
     session_timeout,
+    connection_argument_spec,
+    get_info,
+    list_sharded,
+    run_module,
+    VM_LIST_SHARDS,
 )
 
 
 def prepare_argument_spec():
-    argument_spec = {
-        "vcenter_hostname": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_HOST"]),
-        ),
-        "vcenter_username": dict(
-            type="str", required=True, fallback=(env_fallback, ["VMWARE_USER"]),
-        ),
-        "vcenter_password": dict(
-            type="str",
-            required=True,
-            no_log=True,
-            fallback=(env_fallback, ["VMWARE_PASSWORD"]),
-        ),
-        "vcenter_validate_certs": dict(
-            type="bool",
-            required=False,
-            default=True,
-            fallback=(env_fallback, ["VMWARE_VALIDATE_CERTS"]),
-        ),
-        "vcenter_rest_log_file": dict(
-            type="str",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_REST_LOG_FILE"]),
-        ),
-        "session_timeout": dict(
-            type="float",
-            required=False,
-            fallback=(env_fallback, ["VMWARE_SESSION_TIMEOUT"]),
-        ),
-    }
+    argument_spec = connection_argument_spec()
 
+    argument_spec["clusters"] = {"type": "list", "elements": "str"}
+    argument_spec["datacenters"] = {
+        "aliases": ["filter_datacenters"],
+        "type": "list",
+        "elements": "str",
+    }
+    argument_spec["dest"] = {"type": "path"}
+    argument_spec["fields"] = {"type": "list", "elements": "str"}
+    argument_spec["folders"] = {
+        "aliases": ["filter_folders"],
+        "type": "list",
+        "elements": "str",
+    }
+    argument_spec["format"] = {
+        "choices": ["columnar", "native"],
+        "default": "native",
+        "type": "str",
+    }
+    argument_spec["hosts"] = {"type": "list", "elements": "str"}
+    argument_spec["names"] = {
+        "aliases": ["filter_names"],
+        "type": "list",
+        "elements": "str",
+    }
+    argument_spec["power_states"] = {"type": "list", "elements": "str"}
+    argument_spec["resource_pools"] = {"type": "list", "elements": "str"}
     argument_spec["vm"] = {"type": "str"}
+    argument_spec["vms"] = {"type": "list", "elements": "str"}
 
     return argument_spec
 
@@ -176,28 +289,14 @@ def prepare_argument_spec():
 async def main():
     required_if = list([])
 
-    module_args = prepare_argument_spec()
-    module = AnsibleModule(
-        argument_spec=module_args, required_if=required_if, supports_check_mode=True
+    await run_module(
+        AnsibleModule,
+        "vcenter_vm_power_info",
+        prepare_argument_spec(),
+        entry_point,
+        required_if=required_if,
+        json_lines=True,
     )
-    if not module.params["vcenter_hostname"]:
-        module.fail_json("vcenter_hostname cannot be empty")
-    if not module.params["vcenter_username"]:
-        module.fail_json("vcenter_username cannot be empty")
-    if not module.params["vcenter_password"]:
-        module.fail_json("vcenter_password cannot be empty")
-    try:
-        session = await open_session(
-            vcenter_hostname=module.params["vcenter_hostname"],
-            vcenter_username=module.params["vcenter_username"],
-            vcenter_password=module.params["vcenter_password"],
-            validate_certs=module.params["vcenter_validate_certs"],
-            log_file=module.params["vcenter_rest_log_file"],
-        )
-    except EmbeddedModuleFailure as err:
-        module.fail_json(err.get_message())
-    result = await entry_point(module, session)
-    module.exit_json(**result)
 
 
 # template: info_no_list_module.j2
@@ -205,23 +304,31 @@ def build_url(params):
     return ("https://{vcenter_hostname}" "/api/vcenter/vm/{vm}/power").format(**params)
 
 
+def build_list_url(params):
+    _in_query_parameters = PAYLOAD_FORMAT["list"]["query"].keys()
+    return ("https://{vcenter_hostname}" "/api/vcenter/vm").format(**params) + gen_args(
+        params, _in_query_parameters
+    )
+
+
 async def entry_point(module, session):
-    return await _info(module.params, session)
-
-
-async def _info(params, session):
-    payload_format = list(PAYLOAD_FORMAT.values())[0]
-    _in_query_parameters = payload_format["query"].keys()
-    _url = ("https://{vcenter_hostname}" "/api/vcenter/vm/{vm}/power").format(
-        **params
-    ) + gen_args(params, _in_query_parameters)
-    async with session.get(_url, **session_timeout(params)) as resp:
-        try:
-            if resp.headers["Content-Type"] == "application/json":
-                _json = await resp.json()
-        except KeyError:
-            _json = {}
-        return await update_changed_flag(_json, resp.status, "get")
+    if module.params.get("vm"):
+        return await get_info(
+            module.params, session, build_url(module.params), PAYLOAD_FORMAT
+        )
+    # the power state of each VM comes with the list
+    status, answer = await list_sharded(
+        session,
+        build_list_url(module.params),
+        "vm",
+        VM_LIST_SHARDS,
+        **session_timeout(module.params),
+    )
+    if status != 200:
+        return await update_changed_flag(answer, status, "get")
+    value = dict.fromkeys(module.params.get("vms") or [])
+    value.update({i["vm"]: i["power_state"] for i in answer})
+    return await update_changed_flag({"value": value}, status, "get")
 
 
 if __name__ == "__main__":
@@ -19,6 +19,7 @@ from ansible_collections.cloud.common.plugins.module_utils.turbo.exceptions impo
 from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
     open_session,
     gen_args,
+    profile,
 )
 
 
@@ -140,6 +141,12 @@ class Lookup:
 
     @classmethod
     async def entry_point(cls, terms, options):
+        return await profile(
+            f"{options.get('object_type')}_moid", cls._entry_point(terms, options)
+        )
+
+    @classmethod
+    async def _entry_point(cls, terms, options):
         session = None
 
         if not options.get("vcenter_hostname"):
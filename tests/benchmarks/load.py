@@ -0,0 +1,263 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Drive concurrent module invocations against the simulator.
+
+Like in the turbo daemon, the invocations run on one event loop and share the
+pooled session. For each concurrency level, the workers pick a module of the mix
+at random until the duration is over. The script reports the throughput, the
+latency percentiles, the errors and the number of sessions and sockets, on the
+client side and on the simulator side:
+
+    python tests/benchmarks/load.py --concurrency 1,8,32,128 --duration 10
+    python tests/benchmarks/load.py --concurrency 32 --latency '*=0.01' \\
+        --spike 0.01:2 --unavailable 0.005:5 --reset 0.002
+
+The faults are injected by the simulator, see FAULTS in tests/simulator/vcenter.py.
+Like ansible-test, it must run from a checkout located in
+ansible_collections/vmware/vmware_rest, with cloud.common installed.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "simulator"))
+
+import vcenter as simulator  # noqa: E402
+from client import run_module as run_entry_point  # noqa: E402
+from run import INVENTORY, SimulatorProcess  # noqa: E402
+
+from ansible_collections.vmware.vmware_rest.plugins.module_utils import (  # noqa: E402
+    vmware_rest,
+)
+from ansible_collections.vmware.vmware_rest.plugins.modules import (  # noqa: E402
+    vcenter_vm_info,
+    vcenter_vm_power,
+    vcenter_vm_power_info,
+)
+
+# The relative weights of the operations of the default mix
+MIX = {
+    "vcenter_vm_info:names": 4,
+    "vcenter_vm_info:vm": 3,
+    "vcenter_vm_power_info": 2,
+    "vcenter_vm_power": 1,
+}
+
+
+async def run_module(module, hostname, **params):
+    return await run_entry_point(module, vcenter_hostname=hostname, **params)
+
+
+def operations(hostname, inventory):
+    vms = list(inventory.objects["vm"].values())
+    return {
+        "vcenter_vm_info:names": lambda rng: run_module(
+            vcenter_vm_info, hostname, names=[rng.choice(vms)["name"]]
+        ),
+        "vcenter_vm_info:vm": lambda rng: run_module(
+            vcenter_vm_info, hostname, vm=rng.choice(vms)["id"]
+        ),
+        "vcenter_vm_power_info": lambda rng: run_module(
+            vcenter_vm_power_info, hostname, vm=rng.choice(vms)["id"]
+        ),
+        "vcenter_vm_power": lambda rng: run_module(
+            vcenter_vm_power,
+            hostname,
+            vm=rng.choice(vms)["id"],
+            state=rng.choice(["start", "stop"]),
+        ),
+    }
+
+
+def open_sockets():
+    """The number of sockets of this process, None if it can't be known."""
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return None
+    count = 0
+    for fd in fds:
+        try:
+            if os.readlink(f"/proc/self/fd/{fd}").startswith("socket:"):
+                count += 1
+        except OSError:
+            pass
+    return count
+
+
+async def worker(ops, mix, deadline, rng, latencies, errors):
+    names = list(mix)
+    weights = list(mix.values())
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            result = await ops[name](rng)
+        except Exception as e:  # pylint: disable=broad-except
+            errors[type(e).__name__] += 1
+        else:
+            if result.get("failed"):
+                errors[f"failed {result.get('value', {}).get('error_type')}"] += 1
+        latencies[name].append(time.perf_counter() - started)
+
+
+async def sample_sockets(peaks):
+    while True:
+        peaks.append(open_sockets() or 0)
+        await asyncio.sleep(0.1)
+
+
+async def load(ops, mix, concurrency, duration, seed):
+    latencies = collections.defaultdict(list)
+    errors = collections.Counter()
+    peaks = []
+    sampler = asyncio.ensure_future(sample_sockets(peaks))
+    deadline = asyncio.get_running_loop().time() + duration
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            worker(ops, mix, deadline, random.Random(seed + i), latencies, errors)
+            for i in range(concurrency)
+        )
+    )
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    return latencies, errors, max(peaks), elapsed
+
+
+def percentile(values, p):
+    if len(values) < 2:
+        return values[0] if values else 0
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+def report(concurrency, latencies, errors, peak_sockets, elapsed, stats):
+    every = [i for values in latencies.values() for i in values]
+    result = {
+        "concurrency": concurrency,
+        "operations": len(every),
+        "throughput": round(len(every) / elapsed, 1),
+        "p50_ms": round(percentile(every, 50) * 1e3, 1),
+        "p95_ms": round(percentile(every, 95) * 1e3, 1),
+        "p99_ms": round(percentile(every, 99) * 1e3, 1),
+        "max_ms": round(max(every, default=0) * 1e3, 1),
+        "errors": dict(errors),
+        "pooled_sessions": len(vmware_rest.open_session._pool),
+        "client_peak_sockets": peak_sockets,
+        "server": stats,
+    }
+    print(
+        "{concurrency:>11} {operations:>10} {throughput:>10}/s {p50_ms:>9}ms "
+        "{p95_ms:>9}ms {p99_ms:>9}ms {max_ms:>9}ms {errors_count:>7} "
+        "{pooled_sessions:>8} {client_peak_sockets:>8} {server_peak:>8}".format(
+            errors_count=sum(errors.values()),
+            server_peak=stats.get("peak_connections", 0),
+            **result,
+        )
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--concurrency",
+        default="1,8,32",
+        help="the numbers of concurrent invocations, one run per level",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10, help="the duration of each run"
+    )
+    parser.add_argument("--vms", type=int, default=1000)
+    parser.add_argument(
+        "--mix",
+        type=json.loads,
+        default=MIX,
+        help="the weights of the operations, as JSON, e.g: '%s'" % json.dumps(MIX),
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--latency",
+        action="append",
+        default=[],
+        metavar="'METHOD /path/pattern=SECONDS'",
+        help="the delay of the matching requests, see tests/simulator/vcenter.py",
+    )
+    parser.add_argument("--json", help="also write the results in this file")
+    simulator.add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    extra_args = [f"--seed={args.seed}"]
+    extra_args += [f"--latency={i}" for i in args.latency]
+    for name in simulator.FAULTS:
+        if getattr(args, name):
+            extra_args.append(f"--{name}={getattr(args, name)}")
+
+    inventory = simulator.Inventory(vms=args.vms, seed=args.seed, **INVENTORY)
+    process = SimulatorProcess(args.vms, extra_args)
+    loop = asyncio.new_event_loop()
+    ops = operations(process.hostname, inventory)
+    results = []
+    print(
+        "{0:>11} {1:>10} {2:>12} {3:>11} {4:>11} {5:>11} {6:>11} {7:>7} "
+        "{8:>8} {9:>8} {10:>8}".format(
+            "concurrency",
+            "operations",
+            "throughput",
+            "p50",
+            "p95",
+            "p99",
+            "max",
+            "errors",
+            "sessions",
+            "sockets",
+            "server",
+        )
+    )
+    try:
+        for concurrency in [int(i) for i in args.concurrency.split(",")]:
+            process.reset_stats()
+            latencies, errors, peak_sockets, elapsed = loop.run_until_complete(
+                load(ops, args.mix, concurrency, args.duration, args.seed)
+            )
+            results.append(
+                report(
+                    concurrency,
+                    latencies,
+                    errors,
+                    peak_sockets,
+                    elapsed,
+                    process.stats(),
+                )
+            )
+    finally:
+        process.stop()
+        for session in vmware_rest.open_session._pool.values():
+            connector = session.connector
+            loop.run_until_complete(session.close())
+            loop.run_until_complete(connector.close())
+        vmware_rest.open_session._pool.clear()
+        loop.close()
+    if args.json:
+        with open(args.json, "w") as fd:
+            json.dump(results, fd, indent=2)
+            fd.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
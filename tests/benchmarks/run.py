@@ -0,0 +1,389 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Benchmarks of the module_utils hot paths and of the lookup resolution.
+
+The micro-benchmarks time the pure functions of module_utils. The macro-benchmarks
+run lookups and modules against the local simulator (tests/simulator/vcenter.py)
+at several inventory sizes and report the wall time, the number of HTTP requests
+and the peak memory of the client side.
+
+The results are compared with baseline.json, a wall time or a peak memory more
+than --tolerance above the baseline, or any additional request, is reported as a
+regression and the script exits with 1. The wall times depend on the machine,
+refresh the baseline with --save on the reference machine before comparing:
+
+    python tests/benchmarks/run.py
+    python tests/benchmarks/run.py --sizes 100 --filter lookup
+    python tests/benchmarks/run.py --save
+
+Like ansible-test, it must run from a checkout located in
+ansible_collections/vmware/vmware_rest, with cloud.common installed.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+import ssl
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "simulator"))
+
+import vcenter as simulator  # noqa: E402
+from client import CREDENTIALS, FakeModule  # noqa: E402
+from client import run_module as run_entry_point  # noqa: E402
+
+from ansible_collections.vmware.vmware_rest.plugins.module_utils import (  # noqa: E402
+    vmware_rest,
+)
+from ansible_collections.vmware.vmware_rest.plugins.modules import (  # noqa: E402
+    content_library_item_info,
+    vcenter_vm,
+    vcenter_vm_hardware_disk,
+    vcenter_vm_hardware_disk_info,
+    vcenter_vm_info,
+)
+from ansible_collections.vmware.vmware_rest.plugins.plugin_utils.lookup import (  # noqa: E402
+    Lookup,
+)
+
+BASELINE = os.path.join(HERE, "baseline.json")
+SIZES = [100, 1000, 10000]
+# The shape of the seeded inventories
+INVENTORY = {
+    "clusters": 2,
+    "hosts_per_cluster": 4,
+    "resource_pools": 2,
+    "folder_depth": 4,
+    "folder_fanout": 3,
+    "items_per_library": 20,
+}
+
+
+def micro(func, *args, repeat=5, min_time=0.2):
+    """The best time per call, in seconds."""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func(*args)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number *= 2
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            func(*args)
+        timings.append((time.perf_counter() - started) / number)
+    return min(timings)
+
+
+def micro_async(coroutine_function, *args, **kwargs):
+    loop = asyncio.new_event_loop()
+    try:
+        return micro(
+            lambda: loop.run_until_complete(coroutine_function(*args)), **kwargs
+        )
+    finally:
+        loop.close()
+
+
+def micro_benchmarks():
+    params = FakeModule(
+        vcenter_vm,
+        vcenter_hostname="vcenter.test",
+        names=["vm00001", "vm00002", "vm00003"],
+        folders=["group-v1"],
+        hosts=None,
+        power_states=["POWERED_ON"],
+        placement={"folder": "group-v1", "host": "host-1", "datastore": "ds-1"},
+        name="my_vm",
+        guest_OS="RHEL_7_64",
+        cpu={"count": 2, "cores_per_socket": 1},
+        memory={"size_MiB": 2048, "hot_add_enabled": True},
+        disks=[{"type": "SATA", "new_vmdk": {"capacity": 1 << 30}}],
+    ).params
+    list_query = vcenter_vm_info.PAYLOAD_FORMAT["list"]["query"].keys()
+    create_format = vcenter_vm.PAYLOAD_FORMAT["create"]
+
+    def set_subkeys():
+        root = {}
+        for path in create_format["body"].values():
+            vmware_rest.set_subkey(root, path, 1)
+
+    async def update_changed_flag():
+        for status, operation in ((200, "get"), (201, "create"), (404, "delete")):
+            await vmware_rest.update_changed_flag(
+                {"value": {"name": "my_vm", "power_state": "POWERED_ON"}},
+                status,
+                operation,
+            )
+
+    return {
+        "gen_args": micro(vmware_rest.gen_args, params, list_query),
+        "prepare_payload": micro(vmware_rest.prepare_payload, params, create_format),
+        "set_subkey": micro(set_subkeys),
+        "update_changed_flag": micro_async(update_changed_flag),
+        "get_device_ids": micro(
+            vmware_rest.get_device_ids, [{"disk": str(i)} for i in range(2000, 2016)]
+        ),
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class SimulatorProcess:
+    """The simulator, in its own process to keep it out of the measures."""
+
+    def __init__(self, vms, extra_args=()):
+        self.port = free_port()
+        self.hostname = f"127.0.0.1:{self.port}"
+        args = [sys.executable, os.path.join(HERE, "..", "simulator", "vcenter.py")]
+        args += ["--port", str(self.port), "--vms", str(vms), "--record"]
+        for k, v in INVENTORY.items():
+            args += ["--" + k.replace("_", "-"), str(v)]
+        args += list(extra_args)
+        self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL)
+        self.context = ssl.create_default_context()
+        self.context.check_hostname = False
+        self.context.verify_mode = ssl.CERT_NONE
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                self.requests()
+                break
+            except OSError:
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    self.stop()
+                    raise
+                time.sleep(0.1)
+
+    def _call(self, method, path="/simulator/requests"):
+        request = urllib.request.Request(
+            f"https://{self.hostname}{path}", method=method
+        )
+        with urllib.request.urlopen(request, context=self.context) as resp:
+            return json.loads(resp.read() or "null")
+
+    def requests(self):
+        return self._call("GET")
+
+    def reset(self):
+        self._call("DELETE")
+
+    def stats(self):
+        return self._call("GET", "/simulator/stats")
+
+    def reset_stats(self):
+        self._call("DELETE", "/simulator/stats")
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+async def run_module(module, **params):
+    result = await run_entry_point(module, **params)
+    if result.get("failed"):
+        raise RuntimeError(f"{module.__name__} has failed: {result}")
+    return result
+
+
+async def run_lookup(hostname, object_type, path):
+    options = dict(CREDENTIALS, vcenter_hostname=hostname, object_type=object_type)
+    result = await Lookup.entry_point([path], options)
+    if not result:
+        raise RuntimeError(f"Lookup of {object_type} {path} has failed")
+    return result
+
+
+def macro_scenarios(hostname, inventory):
+    vms = list(inventory.objects["vm"].values())
+    vm = vms[len(vms) // 2]
+    leaf = vm["parent"]
+    pool = next(
+        i
+        for i in inventory.objects["resource-pool"].values()
+        if i["name"] != "Resources"
+    )
+    host = next(iter(inventory.objects["host"].values()))
+    return {
+        "lookup:vm": lambda: run_lookup(hostname, "vm", inventory.path("vm", vm["id"])),
+        "lookup:folder": lambda: run_lookup(
+            hostname, "folder", inventory.path("folder", leaf)
+        ),
+        "lookup:host": lambda: run_lookup(
+            hostname, "host", inventory.path("host", host["id"])
+        ),
+        "lookup:resource_pool": lambda: run_lookup(
+            hostname, "resource_pool", inventory.path("resource-pool", pool["id"])
+        ),
+        "content_library_item_info:list": lambda: run_module(
+            content_library_item_info,
+            vcenter_hostname=hostname,
+            library_id=next(iter(inventory.libraries)),
+        ),
+        "vcenter_vm_info:names": lambda: run_module(
+            vcenter_vm_info, vcenter_hostname=hostname, names=[vm["name"]]
+        ),
+        "vcenter_vm_info:folders": lambda: run_module(
+            vcenter_vm_info, vcenter_hostname=hostname, folders=[leaf]
+        ),
+        "vcenter_vm_info:vm": lambda: run_module(
+            vcenter_vm_info, vcenter_hostname=hostname, vm=vm["id"]
+        ),
+        "vcenter_vm_hardware_disk_info:list": lambda: run_module(
+            vcenter_vm_hardware_disk_info, vcenter_hostname=hostname, vm=vm["id"]
+        ),
+        "vcenter_vm_hardware_disk:present": lambda: run_module(
+            vcenter_vm_hardware_disk,
+            vcenter_hostname=hostname,
+            vm=vm["id"],
+            label="Hard disk 1",
+            state="present",
+        ),
+    }
+
+
+def macro_benchmarks(size, name_filter, repeat):
+    inventory = simulator.Inventory(vms=size, **INVENTORY)
+    process = SimulatorProcess(size)
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        for name, scenario in macro_scenarios(process.hostname, inventory).items():
+            if name_filter not in name:
+                continue
+            # Warm up, e.g: the authentication of the pooled session
+            loop.run_until_complete(scenario())
+
+            process.reset()
+            tracemalloc.start()
+            loop.run_until_complete(scenario())
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            requests = len(process.requests())
+
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                loop.run_until_complete(scenario())
+                timings.append(time.perf_counter() - started)
+            results[f"{name}@{size}"] = {
+                "wall": statistics.median(timings),
+                "requests": requests,
+                "peak_kib": round(peak / 1024, 1),
+            }
+    finally:
+        process.stop()
+        for session in vmware_rest.open_session._pool.values():
+            connector = session.connector
+            loop.run_until_complete(session.close())
+            loop.run_until_complete(connector.close())
+        vmware_rest.open_session._pool.clear()
+        loop.close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        notes = []
+        if base:
+            if result["wall"] > base["wall"] * (1 + tolerance):
+                notes.append("wall {0:+.0%}".format(result["wall"] / base["wall"] - 1))
+            if result.get("requests", 0) > base.get("requests", 0):
+                notes.append(
+                    "requests {0} > {1}".format(result["requests"], base["requests"])
+                )
+            if result.get("peak_kib", 0) > base.get("peak_kib", 0) * (1 + tolerance):
+                notes.append(
+                    "peak {0} KiB > {1} KiB".format(
+                        result["peak_kib"], base["peak_kib"]
+                    )
+                )
+        if notes:
+            regressions.append(name)
+        print(
+            "{0:45} {1:>12} {2:>9} {3:>11}  {4}".format(
+                name,
+                "{0:.1f}µs".format(result["wall"] * 1e6)
+                if result["wall"] < 1e-3
+                else "{0:.1f}ms".format(result["wall"] * 1e3),
+                result.get("requests", ""),
+                "{0}KiB".format(result["peak_kib"]) if "peak_kib" in result else "",
+                "REGRESSION: " + ", ".join(notes)
+                if notes
+                else ("" if base else "no baseline"),
+            )
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(i) for i in SIZES),
+        help="the numbers of VMs of the simulated inventories",
+    )
+    parser.add_argument("--filter", default="", help="only run the matching benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="the accepted relative increase of the wall time and the peak memory",
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="store the results in baseline.json"
+    )
+    parser.add_argument("--skip-macro", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    for name, wall in micro_benchmarks().items():
+        if args.filter in name:
+            results[name] = {"wall": wall}
+    if not args.skip_macro:
+        for size in [int(i) for i in args.sizes.split(",")]:
+            results.update(macro_benchmarks(size, args.filter, args.repeat))
+
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as fd:
+            baseline = json.load(fd)
+    print("{0:45} {1:>12} {2:>9} {3:>11}".format("", "wall", "requests", "peak"))
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save:
+        for name, result in results.items():
+            result["wall"] = float("{0:.4g}".format(result["wall"]))
+            baseline[name] = result
+        with open(BASELINE, "w") as fd:
+            json.dump(baseline, fd, indent=2, sort_keys=True)
+            fd.write("\n")
+        return 0
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Run the entry_point() of a module against the simulator, without Ansible.
+
+Shared by the unit tests and the benchmarks (tests/benchmarks/).
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import asyncio
+import contextlib
+
+from ansible_collections.vmware.vmware_rest.plugins.module_utils import vmware_rest
+from ansible_collections.vmware.vmware_rest.tests.simulator import vcenter
+
+CREDENTIALS = {
+    "vcenter_username": "administrator@vsphere.local",
+    "vcenter_password": "password",
+    "vcenter_validate_certs": False,
+}
+
+
+class FakeModule:
+    """The options of module with their default value, the credentials of the
+    simulator and params."""
+
+    def __init__(self, module, check_mode=False, **params):
+        self.check_mode = check_mode
+        self.params = {}
+        for k, v in module.prepare_argument_spec().items():
+            self.params[k] = v.get("default")
+        self.params.update(CREDENTIALS)
+        self.params.update(params)
+
+
+async def run_module(module, check_mode=False, **params):
+    """Open a session and return the result of the entry_point() of module,
+    params must include vcenter_hostname."""
+    fake = FakeModule(module, check_mode=check_mode, **params)
+    session = await vmware_rest.open_session(
+        vcenter_hostname=fake.params["vcenter_hostname"],
+        vcenter_username=fake.params["vcenter_username"],
+        vcenter_password=fake.params["vcenter_password"],
+        validate_certs=False,
+    )
+    return await module.entry_point(fake, session)
+
+
+class ModuleExit(Exception):
+    """Raised by exit_json() and fail_json() of the AnsibleModule of run_main()."""
+
+    def __init__(self, result):
+        super(ModuleExit, self).__init__(result)
+        self.result = result
+
+
+async def run_main(module, check_mode=False, **params):
+    """Run the main() of module, with run_module(), and return the result it
+    exits with. params must include vcenter_hostname."""
+
+    class AnsibleModule:
+        def __init__(self, argument_spec, supports_check_mode=False, **kwargs):
+            fake = FakeModule(module, check_mode=check_mode, **params)
+            self.check_mode = fake.check_mode
+            self.params = fake.params
+
+        def exit_json(self, **result):
+            raise ModuleExit(result)
+
+        def fail_json(self, msg, **result):
+            raise ModuleExit(dict(result, failed=True, msg=msg))
+
+    original = module.AnsibleModule
+    module.AnsibleModule = AnsibleModule
+    try:
+        await module.main()
+    except ModuleExit as e:
+        return e.result
+    finally:
+        module.AnsibleModule = original
+
+
+async def close_sessions():
+    """Close the sessions pooled by open_session()."""
+    for session in vmware_rest.open_session._pool.values():
+        connector = session.connector
+        await session.close()
+        await connector.close()
+    vmware_rest.open_session._pool.clear()
+    vmware_rest.open_session._renewals.clear()
+
+
+@contextlib.contextmanager
+def running(inventory):
+    """Serve inventory with a simulator on a new event loop, and yield the
+    loop, the Simulator and its hostname. The pooled sessions are closed with
+    the simulator."""
+    simulator = vcenter.Simulator(inventory)
+    loop = asyncio.new_event_loop()
+    runner, port = loop.run_until_complete(vcenter.start(simulator))
+    try:
+        yield loop, simulator, f"127.0.0.1:{port}"
+    finally:
+        loop.run_until_complete(close_sessions())
+        loop.run_until_complete(runner.cleanup())
+        loop.close()
@@ -0,0 +1,153 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Serve a recorded REST interaction again, with its original latencies.
+
+The recording comes from a module or a lookup run with a ``vcenter_rest_log_file``
+ending with ``.jsonl``. Each request gets the recorded answer of the same method
+and path, in the recorded order, after the recorded delay:
+
+    VMWARE_REST_LOG_FILE=/tmp/slow.jsonl ansible-playbook slow.yaml
+    python tests/simulator/replay.py /tmp/slow.jsonl --port 8443
+
+Then run the same playbook against ``vcenter_hostname: localhost:8443`` with
+``vcenter_validate_certs: false``, e.g: under a profiler. The answers which
+were not recorded, like the binary streams, are served as zeroes of the
+recorded size.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import argparse
+import asyncio
+import base64
+import collections
+import json
+import urllib.parse
+
+from aiohttp import web
+
+try:
+    from . import vcenter
+except ImportError:
+    import vcenter
+
+# aiohttp sets them for the served body
+SKIPPED_HEADERS = {
+    "connection",
+    "content-encoding",
+    "content-length",
+    "date",
+    "keep-alive",
+    "server",
+    "transfer-encoding",
+}
+
+
+def load(path):
+    with open(path, encoding="utf-8") as fd:
+        return [json.loads(line) for line in fd if line.strip()]
+
+
+def request_key(method, url):
+    """The method and the path, with the query string in a stable order."""
+    parsed = urllib.parse.urlsplit(url)
+    query = sorted(urllib.parse.parse_qsl(parsed.query, keep_blank_values=True))
+    return method.upper(), parsed.path, urllib.parse.urlencode(query)
+
+
+def decode_body(body):
+    if "text" in body:
+        return body["text"].encode("utf-8")
+    if "base64" in body:
+        return base64.b64decode(body["base64"])
+    return b"\0" * (body.get("size") or 0)
+
+
+class Replay:
+    """The aiohttp application serving a recording.
+
+    The answers of each method and path are served in the recorded order, the
+    last one is repeated once they are exhausted. speed divides the recorded
+    delays. The served requests are listed in requests, and the ones without a
+    recorded answer in misses.
+    """
+
+    def __init__(self, records, speed=1.0):
+        self.speed = speed
+        self.answers = collections.defaultdict(list)
+        for record in sorted(records, key=lambda r: r["time"]):
+            self.answers[request_key(record["method"], record["url"])].append(record)
+        self.cursors = collections.Counter()
+        self.requests = []
+        self.misses = []
+
+    def app(self):
+        app = web.Application(client_max_size=1 << 30)
+        app.router.add_route("*", "/{tail:.*}", self.handle)
+        return app
+
+    def next_answer(self, key):
+        answers = self.answers.get(key)
+        if not answers:
+            return
+        index = min(self.cursors[key], len(answers) - 1)
+        self.cursors[key] += 1
+        return answers[index]
+
+    async def handle(self, request):
+        # Consume the body, like vCenter would before answering
+        await request.read()
+        key = request_key(request.method, str(request.rel_url))
+        self.requests.append((request.method, str(request.rel_url)))
+        record = self.next_answer(key)
+        if not record:
+            self.misses.append((request.method, str(request.rel_url)))
+            return vcenter.error(
+                404,
+                "NOT_FOUND",
+                f"No recorded answer for {request.method} {request.rel_url}.",
+            )
+        if self.speed:
+            await asyncio.sleep(record["elapsed"] / self.speed)
+        headers = [
+            (k, v)
+            for k, v in record["response"]["headers"]
+            if k.lower() not in SKIPPED_HEADERS
+        ]
+        return web.Response(
+            status=record["status"],
+            headers=headers,
+            body=decode_body(record["response"]["body"]),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("recording", help="a .jsonl file of vcenter_rest_log_file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--no-tls", action="store_true")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="divide the recorded delays, 0 serves the answers without delay",
+    )
+    args = parser.parse_args()
+
+    records = load(args.recording)
+    replay = Replay(records, speed=args.speed)
+    print(f"{len(records)} answers for {len(replay.answers)} requests")
+    web.run_app(
+        replay.app(),
+        host=args.host,
+        port=args.port,
+        ssl_context=None if args.no_tls else vcenter.ssl_context(),
+        access_log=None,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1665 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""A local stand-in for the vCenter REST API.
+
+The simulator serves the endpoints used by the modules and the lookup plugins
+from a seeded in-memory inventory, so they can run unchanged against
+``vcenter_hostname: localhost:PORT`` without a real vCenter:
+
+    python tests/simulator/vcenter.py --port 8443 --vms 10000 --folder-depth 5 \\
+        --latency 'GET /api/vcenter/vm=0.05' --latency '*=0.002'
+
+The modules must use ``vcenter_validate_certs: false``, the certificate is
+self-signed.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import argparse
+import asyncio
+import base64
+import collections
+import copy
+import email.utils
+import fnmatch
+import hashlib
+import json
+import os
+import random
+import ssl
+import subprocess
+import tempfile
+import time
+import uuid
+
+from aiohttp import web
+
+# The answer of vCenter when a VM list would be larger than this
+MAX_LIST_SIZE = 4000
+
+# The faults the simulator can inject, and their parameters
+FAULTS = {
+    # (probability, seconds), delay a request
+    "spike": "PROBABILITY:SECONDS",
+    # (probability, count), answer 503 to count requests in a row
+    "unavailable": "PROBABILITY:COUNT",
+    # probability, close the connection without an answer
+    "reset": "PROBABILITY",
+}
+
+# The query filters of each list endpoint, and the object key they match.
+# "id" is the identifier of the object itself.
+LIST_FILTERS = {
+    "datacenter": {"datacenters": "id", "folders": "parent", "names": "name"},
+    "folder": {
+        "datacenters": "datacenter",
+        "folders": "id",
+        "names": "name",
+        "parent_folders": "parent",
+        "type": "type",
+    },
+    "cluster": {
+        "clusters": "id",
+        "datacenters": "datacenter",
+        "folders": "parent",
+        "names": "name",
+    },
+    "host": {
+        "clusters": "cluster",
+        "connection_states": "connection_state",
+        "datacenters": "datacenter",
+        "folders": "parent",
+        "hosts": "id",
+        "names": "name",
+    },
+    "datastore": {
+        "datacenters": "datacenter",
+        "datastores": "id",
+        "folders": "parent",
+        "names": "name",
+        "types": "type",
+    },
+    "network": {
+        "datacenters": "datacenter",
+        "folders": "parent",
+        "names": "name",
+        "networks": "id",
+        "types": "type",
+    },
+    "resource-pool": {
+        "clusters": "cluster",
+        "datacenters": "datacenter",
+        "hosts": "host",
+        "names": "name",
+        "parent_resource_pools": "parent",
+        "resource_pools": "id",
+    },
+    "vm": {
+        "clusters": "cluster",
+        "datacenters": "datacenter",
+        "folders": "parent",
+        "hosts": "host",
+        "names": "name",
+        "power_states": "power_state",
+        "resource_pools": "resource_pool",
+        "vms": "id",
+    },
+}
+
+# The keys returned by the list endpoints, besides the identifier
+SUMMARY_KEYS = {
+    "datacenter": ["name"],
+    "folder": ["name", "type"],
+    "cluster": ["name", "ha_enabled", "drs_enabled"],
+    "host": ["name", "connection_state", "power_state"],
+    "datastore": ["name", "type", "free_space", "capacity"],
+    "network": ["name", "type"],
+    "resource-pool": ["name"],
+    "vm": ["name", "power_state", "cpu_count", "memory_size_MiB"],
+}
+
+# path under /hardware: (key in the VM description, id key in the lists, first id)
+DEVICES = {
+    "adapter/sata": ("sata_adapters", "adapter", 15000),
+    "adapter/scsi": ("scsi_adapters", "adapter", 1000),
+    "cdrom": ("cdroms", "cdrom", 16000),
+    "disk": ("disks", "disk", 2000),
+    "ethernet": ("nics", "nic", 4000),
+    "floppy": ("floppies", "floppy", 8000),
+    "parallel": ("parallel_ports", "port", 10000),
+    "serial": ("serial_ports", "port", 9000),
+}
+
+DEVICE_LABELS = {
+    "adapter/sata": "SATA controller",
+    "adapter/scsi": "SCSI controller",
+    "cdrom": "CD/DVD drive",
+    "disk": "Hard disk",
+    "ethernet": "Network adapter",
+    "floppy": "Floppy drive",
+    "parallel": "Parallel port",
+    "serial": "Serial port",
+}
+
+# path under /hardware: key in the VM description
+SETTINGS = {"": "hardware", "boot": "boot", "cpu": "cpu", "memory": "memory"}
+
+APPLIANCE = {
+    "access/consolecli": True,
+    "access/dcui": True,
+    "access/shell": {"enabled": False, "timeout": 0},
+    "access/ssh": True,
+    "health/applmgmt": "green",
+    "health/database": "green",
+    "health/database-storage": "green",
+    "health/load": "green",
+    "health/mem": "green",
+    "health/softwarepackages": "green",
+    "health/storage": "green",
+    "health/swap": "green",
+    "health/system": "green",
+    "networking": {
+        "dns": {"hostname": "vcenter.test", "mode": "DHCP", "servers": []},
+        "interfaces": {},
+        "vcenter_base_url": "https://vcenter.test:443",
+    },
+    "networking/dns/domains": [],
+    "networking/dns/hostname": "vcenter.test",
+    "networking/dns/servers": {"mode": "dhcp", "servers": []},
+    "networking/noproxy": ["localhost", "127.0.0.1"],
+    "networking/proxy": {},
+    "networking/proxy/http": {"enabled": False, "port": -1, "server": ""},
+    "ntp": [],
+    "shutdown": {"action": "", "reason": "", "shutdown_time": None},
+    "system/global-fips": {"enabled": False},
+    "system/time": {
+        "date": "Mon 01-01-2021",
+        "seconds_since_epoch": 1609459200.0,
+        "time": "00:00:00 AM",
+        "timezone": "UTC",
+    },
+    "system/time/timezone": "UTC",
+    "system/uptime": 3600.0,
+    "system/version": {
+        "build": "17958471",
+        "install_time": "2021-01-01T00:00:00.000Z",
+        "product": "VMware vCenter Server",
+        "releasedate": "May 25, 2021",
+        "summary": "Patch for VMware vCenter Server 7.0",
+        "type": "vCenter Server with an embedded Platform Services Controller",
+        "version": "7.0.2.00200",
+    },
+    "timesync": "DISABLED",
+    "update": {"state": "UP_TO_DATE", "version": "7.0.2.00200"},
+}
+
+
+def json_response(data, status=200):
+    # Like vCenter, don't add a charset to the Content-Type header
+    return web.Response(
+        body=json.dumps(data).encode(), status=status, content_type="application/json"
+    )
+
+
+def error(status, error_type, message):
+    return json_response(
+        {
+            "error_type": error_type,
+            "messages": [
+                {
+                    "args": [],
+                    "default_message": message,
+                    "id": "com.vmware.api.vcenter." + error_type.lower(),
+                }
+            ],
+        },
+        status=status,
+    )
+
+
+def not_found(what):
+    return error(404, "NOT_FOUND", f"{what} doesn't exist.")
+
+
+def deep_update(target, spec):
+    for k, v in spec.items():
+        if isinstance(v, dict) and isinstance(target.get(k), dict):
+            deep_update(target[k], v)
+        else:
+            target[k] = v
+
+
+class Inventory:
+    """A seeded vCenter inventory.
+
+    The VM descriptions are only built when they are first read, an inventory of
+    a few tens of thousands VMs stays cheap to create.
+    """
+
+    def __init__(
+        self,
+        vms=100,
+        datacenters=1,
+        clusters=2,
+        hosts_per_cluster=2,
+        resource_pools=1,
+        datastores=2,
+        networks=2,
+        folder_depth=2,
+        folder_fanout=2,
+        libraries=1,
+        items_per_library=2,
+        seed=0,
+    ):
+        self._random = random.Random(seed)
+        self._next_id = 0
+        self.objects = {k: {} for k in LIST_FILTERS}
+        self.libraries = {}
+        self.items = {}
+        self.files = {}
+        self.file_contents = {}
+        self.datastore_files = {}
+        self.datastore_mtimes = {}
+        self.hosts = []
+        self.datastores = []
+        self.networks = []
+        self.appliance = copy.deepcopy(APPLIANCE)
+
+        self.root_folder = self.add(
+            "folder", "group-d", name="Datacenters", type="DATACENTER", parent=None
+        )
+        placements = []
+        for dc_index in range(datacenters):
+            dc = self.add(
+                "datacenter",
+                "datacenter-",
+                name="my_dc" if dc_index == 0 else f"my_dc{dc_index}",
+                parent=self.root_folder,
+            )
+            self.objects["datacenter"][dc]["datacenter"] = dc
+            root = {}
+            for name, folder_type, prefix in (
+                ("vm", "VIRTUAL_MACHINE", "group-v"),
+                ("host", "HOST", "group-h"),
+                ("datastore", "DATASTORE", "group-s"),
+                ("network", "NETWORK", "group-n"),
+            ):
+                root[name] = self.add(
+                    "folder",
+                    prefix,
+                    name=name,
+                    type=folder_type,
+                    parent=dc,
+                    datacenter=dc,
+                )
+            leaves = self._add_folders(
+                dc, root["vm"], folder_depth, folder_fanout, "folder"
+            )
+            hosts = []
+            for c in range(clusters):
+                cluster = self.add(
+                    "cluster",
+                    "domain-c",
+                    name=f"my_cluster{c}"
+                    if dc_index == 0
+                    else f"cluster{dc_index}_{c}",
+                    parent=root["host"],
+                    datacenter=dc,
+                    ha_enabled=False,
+                    drs_enabled=True,
+                )
+                root_pool = self.add(
+                    "resource-pool",
+                    "resgroup-",
+                    name="Resources",
+                    parent=cluster,
+                    cluster=cluster,
+                    datacenter=dc,
+                )
+                pools = [root_pool]
+                for p in range(resource_pools):
+                    pools.append(
+                        self.add(
+                            "resource-pool",
+                            "resgroup-",
+                            name=f"my_pool{p}",
+                            parent=root_pool,
+                            cluster=cluster,
+                            datacenter=dc,
+                        )
+                    )
+                for h in range(hosts_per_cluster):
+                    hosts.append(
+                        (
+                            self.add(
+                                "host",
+                                "host-",
+                                name=f"esxi{dc_index}-{c}-{h}.test",
+                                parent=cluster,
+                                cluster=cluster,
+                                datacenter=dc,
+                                connection_state="CONNECTED",
+                                power_state="POWERED_ON",
+                            ),
+                            cluster,
+                            pools,
+                        )
+                    )
+            placements.append((leaves or [root["vm"]], hosts))
+            self.hosts += hosts
+            self.datastores += [
+                self.add(
+                    "datastore",
+                    "datastore-",
+                    name=f"datastore{d}"
+                    if dc_index == 0
+                    else f"datastore{dc_index}_{d}",
+                    parent=root["datastore"],
+                    datacenter=dc,
+                    type="VMFS",
+                    capacity=1 << 40,
+                    free_space=1 << 39,
+                )
+                for d in range(datastores)
+            ]
+            self.networks += [
+                self.add(
+                    "network",
+                    "network-",
+                    name="VM Network" if n == 0 else f"my_portgroup{n}",
+                    parent=root["network"],
+                    datacenter=dc,
+                    type="STANDARD_PORTGROUP",
+                )
+                for n in range(networks)
+            ]
+
+        for i in range(vms):
+            folders, hosts = placements[i % len(placements)]
+            n = i // len(placements)
+            host, cluster, pools = hosts[n % len(hosts)] if hosts else (None, None, [])
+            folder = folders[n % len(folders)]
+            self.add(
+                "vm",
+                "vm-",
+                name=f"vm{i:05d}",
+                parent=folder,
+                datacenter=self.objects["folder"][folder]["datacenter"],
+                host=host,
+                cluster=cluster,
+                resource_pool=pools[n % len(pools)] if pools else None,
+                power_state=self._random.choice(["POWERED_ON", "POWERED_OFF"]),
+                cpu_count=self._random.choice([1, 2, 4]),
+                memory_size_MiB=self._random.choice([1024, 2048, 4096]),
+            )
+
+        for lib_index in range(libraries):
+            library_id = str(uuid.UUID(int=self._random.getrandbits(128)))
+            self.libraries[library_id] = {
+                "id": library_id,
+                "name": f"my_library{lib_index}",
+                "type": "LOCAL",
+                "description": "",
+                "version": "1",
+                "storage_backings": [
+                    {"datastore_id": self.datastores[0], "type": "DATASTORE"}
+                ]
+                if datastores
+                else [],
+                "publish_info": {"published": False, "authentication_method": "NONE"},
+            }
+            for item_index in range(items_per_library):
+                self.add_item(library_id, f"my_item{item_index}", "ovf")
+
+    def add(self, kind, prefix, **attrs):
+        self._next_id += 1
+        moid = f"{prefix}{self._next_id}"
+        attrs["id"] = moid
+        self.objects[kind][moid] = attrs
+        return moid
+
+    def _add_folders(self, dc, parent, depth, fanout, prefix):
+        if depth <= 0:
+            return []
+        leaves = []
+        for i in range(fanout):
+            name = f"{prefix}_{i}"
+            folder = self.add(
+                "folder",
+                "group-v",
+                name=name,
+                type="VIRTUAL_MACHINE",
+                parent=parent,
+                datacenter=dc,
+            )
+            leaves += self._add_folders(dc, folder, depth - 1, fanout, name) or [folder]
+        return leaves
+
+    def add_item(self, library_id, name, item_type=None, description=""):
+        item_id = str(uuid.UUID(int=self._random.getrandbits(128)))
+        self.items[item_id] = {
+            "id": item_id,
+            "library_id": library_id,
+            "name": name,
+            "type": item_type or "",
+            "description": description,
+            "cached": True,
+            "content_version": "1",
+            "metadata_version": "1",
+            "size": 0,
+            "version": "1",
+        }
+        self.files[item_id] = []
+        return item_id
+
+    def add_file(self, item_id, name, data):
+        """Store the content of a file of a library item, with its checksum."""
+        self.files[item_id] = [i for i in self.files[item_id] if i["name"] != name]
+        self.files[item_id].append(
+            {
+                "name": name,
+                "size": len(data),
+                "cached": True,
+                "version": "1",
+                "checksum_info": {
+                    "algorithm": "SHA256",
+                    "checksum": hashlib.sha256(data).hexdigest(),
+                },
+            }
+        )
+        self.file_contents[(item_id, name)] = data
+        self.items[item_id]["size"] = sum(i["size"] for i in self.files[item_id])
+
+    def path(self, kind, moid):
+        """The inventory path of an object, as expected by the lookup plugins."""
+        names = []
+        while kind != "datacenter":
+            obj = self.objects[kind][moid]
+            names.insert(0, obj["name"])
+            moid = obj["parent"]
+            kind = next(k for k in self.objects if moid in self.objects[k])
+        names.insert(0, self.objects["datacenter"][moid]["name"])
+        return "/" + "/".join(names)
+
+    def select(self, kind, query):
+        """The objects of kind matching the query filters."""
+        filters = LIST_FILTERS[kind]
+        criteria = [
+            (filters[k], set(query.getall(k))) for k in set(query) if k in filters
+        ]
+        objects = self.objects[kind]
+        id_filter = dict(criteria).get("id")
+        candidates = (
+            [objects[i] for i in id_filter if i in objects]
+            if id_filter is not None
+            else objects.values()
+        )
+        return [
+            obj
+            for obj in candidates
+            if all(obj.get(attr) in values for attr, values in criteria)
+        ]
+
+    def summary(self, kind, obj):
+        key = kind.replace("-", "_")
+        result = {key: obj["id"]}
+        for k in SUMMARY_KEYS[kind]:
+            result[k] = obj[k]
+        return result
+
+    def vm_detail(self, moid):
+        vm = self.objects["vm"][moid]
+        if "detail" not in vm:
+            vm["detail"] = self._build_vm_detail(vm)
+        detail = vm["detail"]
+        detail["name"] = vm["name"]
+        detail["power_state"] = vm["power_state"]
+        return detail
+
+    def _build_vm_detail(self, vm):
+        datastore = (
+            self.objects["datastore"][self.datastores[0]]["name"]
+            if self.datastores
+            else "datastore"
+        )
+        network = self.networks[0] if self.networks else None
+        index = int(vm["id"].split("-")[1])
+        return {
+            "boot": {
+                "delay": 0,
+                "enter_setup_mode": False,
+                "retry": False,
+                "retry_delay": 10000,
+                "type": "BIOS",
+            },
+            "boot_devices": [],
+            "cdroms": {},
+            "cpu": {
+                "cores_per_socket": 1,
+                "count": vm["cpu_count"],
+                "hot_add_enabled": False,
+                "hot_remove_enabled": False,
+            },
+            "disks": {
+                "2000": {
+                    "backing": {
+                        "type": "VMDK_FILE",
+                        "vmdk_file": f"[{datastore}] {vm['name']}/{vm['name']}.vmdk",
+                    },
+                    "capacity": 16 << 30,
+                    "label": "Hard disk 1",
+                    "scsi": {"bus": 0, "unit": 0},
+                    "type": "SCSI",
+                }
+            },
+            "floppies": {},
+            "guest_OS": "RHEL_7_64",
+            "hardware": {
+                "upgrade_policy": "NEVER",
+                "upgrade_status": "NONE",
+                "version": "VMX_13",
+            },
+            "identity": {
+                "bios_uuid": str(uuid.UUID(int=index)),
+                "instance_uuid": str(uuid.UUID(int=index << 64)),
+                "name": vm["name"],
+            },
+            "instant_clone_frozen": False,
+            "memory": {"hot_add_enabled": False, "size_MiB": vm["memory_size_MiB"]},
+            "nics": {
+                "4000": {
+                    "allow_guest_control": False,
+                    "backing": {"network": network, "type": "STANDARD_PORTGROUP"},
+                    "label": "Network adapter 1",
+                    "mac_address": "00:50:56:{0:02x}:{1:02x}:{2:02x}".format(
+                        (index >> 16) & 0xFF, (index >> 8) & 0xFF, index & 0xFF
+                    ),
+                    "mac_type": "ASSIGNED",
+                    "pci_slot_number": 160,
+                    "start_connected": True,
+                    "state": "CONNECTED"
+                    if vm["power_state"] == "POWERED_ON"
+                    else "NOT_CONNECTED",
+                    "type": "VMXNET3",
+                    "upt_compatibility_enabled": False,
+                    "wake_on_lan_enabled": False,
+                }
+            }
+            if network
+            else {},
+            "parallel_ports": {},
+            "sata_adapters": {},
+            "scsi_adapters": {
+                "1000": {
+                    "label": "SCSI controller 0",
+                    "pci_slot_number": 16,
+                    "scsi": {"bus": 0, "unit": 7},
+                    "sharing": "NONE",
+                    "type": "PVSCSI",
+                }
+            },
+            "serial_ports": {},
+        }
+
+
+class Simulator:
+    """The aiohttp application serving an Inventory.
+
+    latency maps "METHOD /path" fnmatch patterns to a delay in seconds, the first
+    matching pattern wins. Each served request is appended to requests as a
+    (method, path with query string) tuple when record is set, the list is also
+    served (GET) and reset (DELETE) on /simulator/requests.
+
+    faults injects some failures at random, see FAULTS. The counters of the
+    served requests, of the faults and of the connections are served (GET) and
+    reset (DELETE) on /simulator/stats.
+    """
+
+    def __init__(
+        self,
+        inventory=None,
+        latency=None,
+        username=None,
+        password=None,
+        record=True,
+        faults=None,
+        seed=0,
+    ):
+        self.inventory = inventory or Inventory()
+        self.latency = list((latency or {}).items())
+        self.username = username
+        self.password = password
+        self.record = record
+        self.requests = []
+        self.sessions = set()
+        self.download_sessions = {}
+        self.update_sessions = {}
+        self.faults = faults or {}
+        self._random = random.Random(seed)
+        self._burst = 0
+        self.stats = collections.Counter()
+        self.transports = set()
+
+    def app(self):
+        app = web.Application(
+            middlewares=[
+                self.fault_middleware,
+                self.latency_middleware,
+                self.auth_middleware,
+            ],
+            client_max_size=1 << 30,
+        )
+        r = app.router
+        r.add_get("/simulator/requests", self.get_requests)
+        r.add_delete("/simulator/requests", self.reset_requests)
+        r.add_get("/simulator/stats", self.get_stats)
+        r.add_delete("/simulator/stats", self.reset_stats)
+        r.add_post("/rest/com/vmware/cis/session", self.create_session)
+        r.add_post("/api/session", self.create_session)
+        r.add_get("/api/session", self.get_session)
+        r.add_delete("/api/session", self.delete_session)
+        r.add_delete("/rest/com/vmware/cis/session", self.delete_session)
+
+        r.add_route("*", "/api/appliance/{path:.+}", self.appliance)
+        r.add_route("*", "/folder/{path:.*}", self.datastore_file)
+
+        for kind in LIST_FILTERS:
+            r.add_get(f"/api/vcenter/{kind}", self.list_objects)
+            r.add_get(f"/api/vcenter/{kind}/{{moid}}", self.get_object)
+        r.add_post("/api/vcenter/vm", self.create_vm)
+        r.add_delete("/api/vcenter/vm/{moid}", self.delete_vm)
+        r.add_get("/api/vcenter/vm/{moid}/power", self.get_power)
+        r.add_post("/api/vcenter/vm/{moid}/power", self.set_power)
+        r.add_get("/api/vcenter/vm/{moid}/guest/identity", self.guest_identity)
+        r.add_get(
+            "/api/vcenter/vm/{moid}/guest/networking/interfaces", self.guest_interfaces,
+        )
+        r.add_get("/api/vcenter/vm/{moid}/tools", self.tools)
+        r.add_get("/api/vcenter/vm/{moid}/hardware/boot/device", self.boot_devices)
+        r.add_put("/api/vcenter/vm/{moid}/hardware/boot/device", self.boot_devices)
+        for path in SETTINGS:
+            url = "/api/vcenter/vm/{moid}/hardware" + (f"/{path}" if path else "")
+            r.add_get(url, self.vm_setting)
+            r.add_patch(url, self.vm_setting)
+        for path in DEVICES:
+            url = f"/api/vcenter/vm/{{moid}}/hardware/{path}"
+            r.add_get(url, self.list_devices)
+            r.add_post(url, self.create_device)
+            r.add_get(url + "/{device}", self.get_device)
+            r.add_patch(url + "/{device}", self.update_device)
+            r.add_delete(url + "/{device}", self.delete_device)
+
+        for kind in ("library", "local-library", "subscribed-library"):
+            r.add_get(f"/api/content/{kind}", self.list_libraries)
+            r.add_post(f"/api/content/{kind}", self.create_library)
+            r.add_get(f"/api/content/{kind}/{{library}}", self.get_library)
+            r.add_patch(f"/api/content/{kind}/{{library}}", self.update_library)
+            r.add_delete(f"/api/content/{kind}/{{library}}", self.delete_library)
+        # Before /api/content/library/item/{item}
+        url = "/api/content/library/item/download-session"
+        r.add_post(url, self.create_download_session)
+        r.add_get(url + "/{session}", self.get_download_session)
+        r.add_post(url + "/{session}", self.download_session_action)
+        r.add_delete(url + "/{session}", self.delete_download_session)
+        url = "/api/content/library/item/downloadsession/file/{session}"
+        r.add_get(url, self.get_download_file)
+        r.add_post(url, self.prepare_download_file)
+        r.add_get("/cls/data/{session}/{name}", self.download_data)
+        url = "/api/content/library/item/update-session"
+        r.add_get(url, self.list_update_sessions)
+        r.add_post(url, self.create_update_session)
+        r.add_get(url + "/{session}", self.get_update_session)
+        r.add_post(url + "/{session}", self.update_session_action)
+        r.add_delete(url + "/{session}", self.delete_update_session)
+        url = "/api/content/library/item/updatesession/file/{session}"
+        r.add_post(url, self.update_file_action)
+        r.add_get(url + "/{name}", self.get_update_file)
+        r.add_put("/cls/data/{session}/{name}", self.upload_data)
+        r.add_get("/api/content/library/item", self.list_items)
+        r.add_post("/api/content/library/item", self.create_item)
+        r.add_get("/api/content/library/item/{item}", self.get_item)
+        r.add_patch("/api/content/library/item/{item}", self.update_item)
+        r.add_delete("/api/content/library/item/{item}", self.delete_item)
+        r.add_get("/api/content/library/item/{item}/file", self.list_item_files)
+        return app
+
+    @web.middleware
+    async def fault_middleware(self, request, handler):
+        if request.path.startswith("/simulator/"):
+            return await handler(request)
+        self.stats["requests"] += 1
+        self.transports = {t for t in self.transports if not t.is_closing()}
+        self.transports.add(request.transport)
+        self.stats["peak_connections"] = max(
+            self.stats["peak_connections"], len(self.transports)
+        )
+        faults = self.faults
+        if (
+            not self._burst
+            and self._random.random() < faults.get("unavailable", (0,))[0]
+        ):
+            self._burst = faults["unavailable"][1]
+        if self._burst:
+            self._burst -= 1
+            self.stats["unavailable"] += 1
+            return error(503, "SERVICE_UNAVAILABLE", "The service is unavailable.")
+        if self._random.random() < faults.get("reset", 0):
+            self.stats["reset"] += 1
+            request.transport.abort()
+            return web.Response(status=500)
+        if self._random.random() < faults.get("spike", (0, 0))[0]:
+            self.stats["spike"] += 1
+            await asyncio.sleep(faults["spike"][1])
+        return await handler(request)
+
+    @web.middleware
+    async def latency_middleware(self, request, handler):
+        if request.path.startswith("/simulator/"):
+            return await handler(request)
+        if self.record:
+            self.requests.append((request.method, str(request.rel_url)))
+        key = f"{request.method} {request.path}"
+        for pattern, delay in self.latency:
+            if fnmatch.fnmatchcase(key, pattern):
+                if delay:
+                    await asyncio.sleep(delay)
+                break
+        return await handler(request)
+
+    @web.middleware
+    async def auth_middleware(self, request, handler):
+        if request.path.startswith("/simulator/"):
+            return await handler(request)
+        public = request.path.startswith("/folder/") or (
+            request.method == "POST"
+            and request.path in ("/api/session", "/rest/com/vmware/cis/session")
+        )
+        if public:
+            if not self.check_basic_auth(request):
+                return error(401, "UNAUTHENTICATED", "Authentication required.")
+        elif request.headers.get("vmware-api-session-id") not in self.sessions:
+            return error(401, "UNAUTHENTICATED", "Authentication required.")
+        return await handler(request)
+
+    async def get_requests(self, request):
+        return json_response(self.requests)
+
+    async def reset_requests(self, request):
+        self.requests.clear()
+        return web.Response(status=204)
+
+    async def get_stats(self, request):
+        self.transports = {t for t in self.transports if not t.is_closing()}
+        stats = dict(self.stats)
+        stats["open_connections"] = len(self.transports)
+        stats["sessions"] = len(self.sessions)
+        return json_response(stats)
+
+    async def reset_stats(self, request):
+        self.stats.clear()
+        return web.Response(status=204)
+
+    def check_basic_auth(self, request):
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Basic "):
+            return False
+        username, _, password = base64.b64decode(header[6:]).decode().partition(":")
+        if self.username is not None and username != self.username:
+            return False
+        if self.password is not None and password != self.password:
+            return False
+        return True
+
+    async def create_session(self, request):
+        session_id = uuid.uuid4().hex
+        self.sessions.add(session_id)
+        if request.path.startswith("/rest/"):
+            return json_response({"value": session_id})
+        return json_response(session_id, status=201)
+
+    async def get_session(self, request):
+        return json_response({"user": self.username or "administrator@vsphere.local"})
+
+    async def delete_session(self, request):
+        self.sessions.discard(request.headers.get("vmware-api-session-id"))
+        return web.Response(status=204)
+
+    async def appliance(self, request):
+        path = request.match_info["path"]
+        if path not in self.inventory.appliance:
+            return not_found(f"/api/appliance/{path}")
+        if request.method == "GET":
+            return json_response(self.inventory.appliance[path])
+        if request.method in ("PUT", "PATCH", "POST"):
+            body = await request.json() if request.can_read_body else {}
+            value = self.inventory.appliance[path]
+            if isinstance(value, dict) and isinstance(body, dict):
+                deep_update(value, body)
+            elif isinstance(body, dict) and len(body) == 1:
+                self.inventory.appliance[path] = next(iter(body.values()))
+            else:
+                self.inventory.appliance[path] = body
+            return web.Response(status=204)
+        return error(400, "OPERATION_NOT_FOUND", "Not supported.")
+
+    async def datastore_file(self, request):
+        key = (
+            request.query.get("dcPath"),
+            request.query.get("dsName"),
+            request.match_info["path"],
+        )
+        files = self.inventory.datastore_files
+        mtimes = self.inventory.datastore_mtimes
+        if request.method == "PUT":
+            created = key not in files
+            files[key] = await request.read()
+            mtimes[key] = time.time()
+            return web.Response(status=201 if created else 200)
+        if key not in files:
+            return web.Response(status=404)
+        last_modified = email.utils.formatdate(mtimes[key], usegmt=True)
+        if request.method == "HEAD":
+            return web.Response(
+                headers={
+                    "Content-Length": str(len(files[key])),
+                    "Last-Modified": last_modified,
+                }
+            )
+        if request.method == "GET":
+            return web.Response(
+                body=files[key], headers={"Last-Modified": last_modified}
+            )
+        if request.method == "DELETE":
+            del files[key]
+            del mtimes[key]
+            return web.Response(status=204)
+        return web.Response(status=405)
+
+    def kind(self, request):
+        return request.path.split("/")[3]
+
+    async def list_objects(self, request):
+        kind = self.kind(request)
+        found = self.inventory.select(kind, request.query)
+        if kind == "vm" and len(found) > MAX_LIST_SIZE:
+            return error(
+                400,
+                "UNABLE_TO_ALLOCATE_RESOURCE",
+                "Too many virtual machines. Add more filter criteria to reduce the number.",
+            )
+        return json_response([self.inventory.summary(kind, i) for i in found])
+
+    async def get_object(self, request):
+        kind = self.kind(request)
+        moid = request.match_info["moid"]
+        obj = self.inventory.objects[kind].get(moid)
+        if not obj:
+            return not_found(moid)
+        if kind == "vm":
+            return json_response(self.inventory.vm_detail(moid))
+        result = {k: v for k, v in obj.items() if k not in ("id", "parent")}
+        if kind == "folder":
+            result = {"name": obj["name"], "type": obj["type"]}
+        elif kind == "host":
+            result = self.inventory.summary(kind, obj)
+            del result["host"]
+        elif kind == "datacenter":
+            result = {
+                "name": obj["name"],
+                "datastore_folder": self._root_folder(moid, "DATASTORE"),
+                "host_folder": self._root_folder(moid, "HOST"),
+                "network_folder": self._root_folder(moid, "NETWORK"),
+                "vm_folder": self._root_folder(moid, "VIRTUAL_MACHINE"),
+            }
+        elif kind == "cluster":
+            pools = [
+                i["id"]
+                for i in self.inventory.objects["resource-pool"].values()
+                if i["parent"] == moid
+            ]
+            result = {"name": obj["name"], "resource_pool": pools[0] if pools else None}
+        elif kind == "resource-pool":
+            result = {
+                "name": obj["name"],
+                "resource_pools": [
+                    i["id"]
+                    for i in self.inventory.objects["resource-pool"].values()
+                    if i["parent"] == moid
+                ],
+            }
+        return json_response(result)
+
+    def _root_folder(self, dc, folder_type):
+        for folder in self.inventory.objects["folder"].values():
+            if folder["parent"] == dc and folder["type"] == folder_type:
+                return folder["id"]
+
+    def get_vm(self, request):
+        moid = request.match_info["moid"]
+        if moid not in self.inventory.objects["vm"]:
+            return None
+        return self.inventory.objects["vm"][moid]
+
+    async def create_vm(self, request):
+        spec = await request.json()
+        placement = spec.get("placement") or {}
+        inventory = self.inventory
+        folder = placement.get("folder")
+        if folder not in inventory.objects["folder"]:
+            return error(400, "INVALID_ARGUMENT", "A valid folder is required.")
+        host = placement.get("host")
+        cluster = placement.get("cluster")
+        if host in inventory.objects["host"]:
+            cluster = inventory.objects["host"][host]["cluster"]
+        moid = inventory.add(
+            "vm",
+            "vm-",
+            name=spec.get("name") or "Virtual machine",
+            parent=folder,
+            datacenter=inventory.objects["folder"][folder]["datacenter"],
+            host=host,
+            cluster=cluster,
+            resource_pool=placement.get("resource_pool"),
+            power_state="POWERED_OFF",
+            cpu_count=(spec.get("cpu") or {}).get("count", 1),
+            memory_size_MiB=(spec.get("memory") or {}).get("size_MiB", 1024),
+        )
+        detail = inventory.vm_detail(moid)
+        detail["guest_OS"] = spec.get("guest_OS", detail["guest_OS"])
+        detail["disks"] = {}
+        detail["nics"] = {}
+        return json_response(moid)
+
+    async def delete_vm(self, request):
+        vm = self.get_vm(request)
+        if not vm:
+            return not_found(request.match_info["moid"])
+        if vm["power_state"] == "POWERED_ON":
+            return error(400, "NOT_ALLOWED_IN_CURRENT_STATE", "The VM is powered on.")
+        del self.inventory.objects["vm"][vm["id"]]
+        return web.Response(status=204)
+
+    async def get_power(self, request):
+        vm = self.get_vm(request)
+        if not vm:
+            return not_found(request.match_info["moid"])
+        return json_response({"state": vm["power_state"]})
+
+    async def set_power(self, request):
+        vm = self.get_vm(request)
+        if not vm:
+            return not_found(request.match_info["moid"])
+        target = {
+            "reset": "POWERED_ON",
+            "start": "POWERED_ON",
+            "stop": "POWERED_OFF",
+            "suspend": "SUSPENDED",
+        }.get(request.query.get("action"))
+        if not target:
+            return error(400, "INVALID_ARGUMENT", "Unknown action.")
+        if request.query["action"] == "reset":
+            if vm["power_state"] != "POWERED_ON":
+                return error(
+                    400, "NOT_ALLOWED_IN_CURRENT_STATE", "The VM is not powered on."
+                )
+        elif vm["power_state"] == target:
+            return error(
+                400,
+                "ALREADY_IN_DESIRED_STATE",
+                "Virtual machine is already in the desired state.",
+            )
+        vm["power_state"] = target
+        return web.Response(status=204)
+
+    async def guest_identity(self, request):
+        vm = self.get_vm(request)
+        if not vm:
+            return not_found(request.match_info["moid"])
+        if vm["power_state"] != "POWERED_ON":
+            return error(503, "SERVICE_UNAVAILABLE", "VMware Tools is not running.")
+        return json_response(
+            {
+                "family": "LINUX",
+                "full_name": {
+                    "args": [],
+                    "default_message": "Red Hat Enterprise Linux 7 (64-bit)",
+                    "id": "vmsg.guestos.rhel7_64Guest.label",
+                },
+                "host_name": vm["name"],
+                "ip_address": "192.0.2.{0}".format(int(vm["id"][3:]) % 254 + 1),
+                "name": "RHEL_7_64",
+            }
+        )
+
+    async def guest_interfaces(self, request):
+        vm = self.get_vm(request)
+        if not vm:
+            return not_found(request.match_info["moid"])
+        if vm["power_state"] != "POWERED_ON":
+            return error(503, "SERVICE_UNAVAILABLE", "VMware Tools is not running.")
+        ip_address = "192.0.2.{0}".format(int(vm["id"][3:]) % 254 + 1)
+        return json_response(
+            [
+                {
+                    "ip": {
+                        "ip_addresses": [
+                            {
+                                "ip_address": ip_address,
+                                "prefix_length": 24,
+                                "state": "PREFERRED",
+                            }
+                        ]
+                    },
+                    "mac_address": nic["mac_address"],
+                    "nic": nic_id,
+                }
+                for nic_id, nic in self.inventory.vm_detail(vm["id"])["nics"].items()
+            ]
+        )
+
+    async def tools(self, request):
+        vm = self.get_vm(request)
+        if not vm:
+            return not_found(request.match_info["moid"])
+        running = vm["power_state"] == "POWERED_ON"
+        return json_response(
+            {
+                "auto_update_supported": False,
+                "install_attempt_count": 0,
+                "run_state": "RUNNING" if running else "NOT_RUNNING",
+                "upgrade_policy": "MANUAL",
+                "version_status": "UNMANAGED",
+            }
+        )
+
+    async def boot_devices(self, request):
+        vm = self.get_vm(request)
+        if not vm:
+            return not_found(request.match_info["moid"])
+        detail = self.inventory.vm_detail(vm["id"])
+        if request.method == "PUT":
+            detail["boot_devices"] = (await request.json()).get("devices", [])
+            return web.Response(status=204)
+        return json_response(detail["boot_devices"])
+
+    async def vm_setting(self, request):
+        vm = self.get_vm(request)
+        if not vm:
+            return not_found(request.match_info["moid"])
+        path = request.path.split("/hardware", 1)[1].lstrip("/")
+        detail = self.inventory.vm_detail(vm["id"])
+        setting = detail[SETTINGS[path]]
+        if request.method == "PATCH":
+            deep_update(setting, await request.json())
+            if path == "cpu":
+                vm["cpu_count"] = setting["count"]
+            elif path == "memory":
+                vm["memory_size_MiB"] = setting["size_MiB"]
+            return web.Response(status=204)
+        return json_response(setting)
+
+    def device_context(self, request):
+        vm = self.get_vm(request)
+        if not vm:
+            return None, None, None
+        path = request.path.split("/hardware/", 1)[1]
+        for device_path in DEVICES:
+            if path == device_path or path.startswith(device_path + "/"):
+                detail = self.inventory.vm_detail(vm["id"])
+                return vm, device_path, detail[DEVICES[device_path][0]]
+        return vm, None, None
+
+    async def list_devices(self, request):
+        vm, device_path, devices = self.device_context(request)
+        if not vm:
+            return not_found(request.match_info["moid"])
+        id_key = DEVICES[device_path][1]
+        return json_response([{id_key: i} for i in devices])
+
+    async def get_device(self, request):
+        vm, device_path, devices = self.device_context(request)
+        device = (devices or {}).get(request.match_info["device"])
+        if not device:
+            return not_found(request.match_info["device"])
+        return json_response(device)
+
+    async def create_device(self, request):
+        vm, device_path, devices = self.device_context(request)
+        if not vm:
+            return not_found(request.match_info["moid"])
+        spec = await request.json() if request.can_read_body else {}
+        first_id = DEVICES[device_path][2]
+        device_id = str(max([int(i) for i in devices] + [first_id - 1]) + 1)
+        device = {"label": f"{DEVICE_LABELS[device_path]} {len(devices) + 1}"}
+        if device_path == "disk":
+            device["type"] = spec.get("type", "SCSI")
+            if device["type"] == "SCSI" and "scsi" not in spec:
+                used = [d["scsi"]["unit"] for d in devices.values() if "scsi" in d]
+                unit = min(set(range(16)) - set(used) - {7})
+                device["scsi"] = {"bus": 0, "unit": unit}
+            new_vmdk = spec.pop("new_vmdk", None)
+            if new_vmdk is not None:
+                device["capacity"] = new_vmdk.get("capacity", 1 << 30)
+                spec.setdefault("backing", {"type": "VMDK_FILE"})
+                spec["backing"].setdefault(
+                    "vmdk_file",
+                    f"[datastore0] {vm['name']}/{vm['name']}_{device_id}.vmdk",
+                )
+        elif device_path in ("ethernet", "cdrom"):
+            device.update({"start_connected": False, "state": "NOT_CONNECTED"})
+            if device_path == "ethernet":
+                device["mac_address"] = "00:50:56:{0:02x}:{1:02x}:{2:02x}".format(
+                    self.inventory._random.randint(0, 255),
+                    self.inventory._random.randint(0, 255),
+                    self.inventory._random.randint(0, 255),
+                )
+                device["mac_type"] = "GENERATED"
+                device["pci_slot_number"] = 192 + len(devices)
+        deep_update(device, spec)
+        devices[device_id] = device
+        return json_response(device_id)
+
+    async def update_device(self, request):
+        vm, device_path, devices = self.device_context(request)
+        device = (devices or {}).get(request.match_info["device"])
+        if not device:
+            return not_found(request.match_info["device"])
+        deep_update(device, await request.json())
+        return web.Response(status=204)
+
+    async def delete_device(self, request):
+        vm, device_path, devices = self.device_context(request)
+        if request.match_info["device"] not in (devices or {}):
+            return not_found(request.match_info["device"])
+        del devices[request.match_info["device"]]
+        return web.Response(status=204)
+
+    def library_type(self, request):
+        kind = request.path.split("/")[3]
+        return {"local-library": "LOCAL", "subscribed-library": "SUBSCRIBED"}.get(kind)
+
+    async def list_libraries(self, request):
+        library_type = self.library_type(request)
+        return json_response(
+            [
+                i["id"]
+                for i in self.inventory.libraries.values()
+                if library_type in (None, i["type"])
+            ]
+        )
+
+    async def create_library(self, request):
+        spec = await request.json()
+        if request.query.get("action") == "find":
+            return json_response(
+                [
+                    i["id"]
+                    for i in self.inventory.libraries.values()
+                    if spec.get("name") in (None, i["name"])
+                    and spec.get("type") in (None, i["type"])
+                ]
+            )
+        library_id = str(uuid.uuid4())
+        library = {
+            "id": library_id,
+            "description": "",
+            "publish_info": {"published": False, "authentication_method": "NONE"},
+            "storage_backings": [],
+            "type": self.library_type(request) or "LOCAL",
+            "version": "1",
+        }
+        library.update(spec)
+        self.inventory.libraries[library_id] = library
+        return json_response(library_id, status=201)
+
+    async def get_library(self, request):
+        library = self.inventory.libraries.get(request.match_info["library"])
+        if not library or self.library_type(request) not in (None, library["type"]):
+            return not_found(request.match_info["library"])
+        return json_response(library)
+
+    async def update_library(self, request):
+        library = self.inventory.libraries.get(request.match_info["library"])
+        if not library:
+            return not_found(request.match_info["library"])
+        deep_update(library, await request.json())
+        return web.Response(status=204)
+
+    async def delete_library(self, request):
+        library_id = request.match_info["library"]
+        if library_id not in self.inventory.libraries:
+            return not_found(library_id)
+        del self.inventory.libraries[library_id]
+        for item_id in [
+            k for k, v in self.inventory.items.items() if v["library_id"] == library_id
+        ]:
+            del self.inventory.items[item_id]
+        return web.Response(status=204)
+
+    async def list_items(self, request):
+        library_id = request.query.get("library_id")
+        if library_id not in self.inventory.libraries:
+            return not_found(library_id)
+        return json_response(
+            [
+                k
+                for k, v in self.inventory.items.items()
+                if v["library_id"] == library_id
+            ]
+        )
+
+    async def create_item(self, request):
+        spec = await request.json()
+        if request.query.get("action") == "find":
+            return json_response(
+                [
+                    k
+                    for k, v in self.inventory.items.items()
+                    if spec.get("library_id") in (None, v["library_id"])
+                    and spec.get("name") in (None, v["name"])
+                    and spec.get("type") in (None, v["type"])
+                ]
+            )
+        if spec.get("library_id") not in self.inventory.libraries:
+            return not_found(spec.get("library_id"))
+        item_id = self.inventory.add_item(
+            spec["library_id"],
+            spec.get("name"),
+            spec.get("type"),
+            spec.get("description", ""),
+        )
+        return json_response(item_id, status=201)
+
+    async def get_item(self, request):
+        item = self.inventory.items.get(request.match_info["item"])
+        if not item:
+            return not_found(request.match_info["item"])
+        return json_response(item)
+
+    async def update_item(self, request):
+        item = self.inventory.items.get(request.match_info["item"])
+        if not item:
+            return not_found(request.match_info["item"])
+        deep_update(item, await request.json())
+        return web.Response(status=204)
+
+    async def delete_item(self, request):
+        if request.match_info["item"] not in self.inventory.items:
+            return not_found(request.match_info["item"])
+        del self.inventory.items[request.match_info["item"]]
+        return web.Response(status=204)
+
+    async def list_item_files(self, request):
+        item_id = request.match_info["item"]
+        if item_id not in self.inventory.items:
+            return not_found(item_id)
+        return json_response(self.inventory.files.get(item_id, []))
+
+    async def create_download_session(self, request):
+        spec = await request.json()
+        if spec.get("library_item_id") not in self.inventory.items:
+            return not_found(spec.get("library_item_id"))
+        session_id = str(uuid.uuid4())
+        self.download_sessions[session_id] = {
+            "id": session_id,
+            "library_item_id": spec["library_item_id"],
+            "state": "ACTIVE",
+            "files": {},
+        }
+        return json_response(session_id, status=201)
+
+    async def get_download_session(self, request):
+        download_session = self.download_sessions.get(request.match_info["session"])
+        if not download_session:
+            return not_found(request.match_info["session"])
+        return json_response(
+            {k: v for k, v in download_session.items() if k != "files"}
+        )
+
+    async def download_session_action(self, request):
+        download_session = self.download_sessions.get(request.match_info["session"])
+        if not download_session:
+            return not_found(request.match_info["session"])
+        action = request.query.get("action")
+        if action == "keep-alive":
+            return web.Response(status=204)
+        if action in ("cancel", "fail"):
+            download_session["state"] = "CANCELED" if action == "cancel" else "ERROR"
+            return web.Response(status=204)
+        return error(400, "INVALID_ARGUMENT", f"Unknown action {action}.")
+
+    async def delete_download_session(self, request):
+        if not self.download_sessions.pop(request.match_info["session"], None):
+            return not_found(request.match_info["session"])
+        return web.Response(status=204)
+
+    def download_file_info(self, request, download_session, name):
+        item_id = download_session["library_item_id"]
+        for remote_file in self.inventory.files.get(item_id, []):
+            if remote_file["name"] == name:
+                break
+        else:
+            return None
+        info = {
+            "name": name,
+            "size": remote_file["size"],
+            "checksum_info": remote_file["checksum_info"],
+            "bytes_transferred": 0,
+            "status": download_session["files"].get(name, "UNPREPARED"),
+        }
+        if info["status"] == "PREPARED":
+            uri = f"{request.scheme}://{request.host}/cls/data/{download_session['id']}/{name}"
+            info["download_endpoint"] = {"uri": uri}
+        return info
+
+    async def get_download_file(self, request):
+        download_session = self.download_sessions.get(request.match_info["session"])
+        if not download_session:
+            return not_found(request.match_info["session"])
+        name = request.query.get("file_name")
+        info = self.download_file_info(request, download_session, name)
+        if not info:
+            return not_found(name)
+        return json_response(info)
+
+    async def prepare_download_file(self, request):
+        download_session = self.download_sessions.get(request.match_info["session"])
+        if not download_session:
+            return not_found(request.match_info["session"])
+        if request.query.get("action") != "prepare":
+            return error(400, "INVALID_ARGUMENT", "Unknown action.")
+        name = (await request.json()).get("file_name")
+        if not self.download_file_info(request, download_session, name):
+            return not_found(name)
+        # The files are in memory, they are prepared at once
+        download_session["files"][name] = "PREPARED"
+        return json_response(self.download_file_info(request, download_session, name))
+
+    async def download_data(self, request):
+        download_session = self.download_sessions.get(request.match_info["session"])
+        name = request.match_info["name"]
+        if not download_session or download_session["files"].get(name) != "PREPARED":
+            return web.Response(status=404)
+        data = self.inventory.file_contents[(download_session["library_item_id"], name)]
+        if not request.http_range.start and request.http_range.stop is None:
+            return web.Response(body=data)
+        start, stop, _ = request.http_range.indices(len(data))
+        return web.Response(
+            status=206,
+            body=data[start:stop],
+            headers={"Content-Range": f"bytes {start}-{stop - 1}/{len(data)}"},
+        )
+
+    async def list_update_sessions(self, request):
+        return json_response(list(self.update_sessions))
+
+    async def create_update_session(self, request):
+        spec = await request.json()
+        if spec.get("library_item_id") not in self.inventory.items:
+            return not_found(spec.get("library_item_id"))
+        session_id = str(uuid.uuid4())
+        self.update_sessions[session_id] = {
+            "id": session_id,
+            "library_item_id": spec["library_item_id"],
+            "state": "ACTIVE",
+            "files": {},
+        }
+        return json_response(session_id, status=201)
+
+    async def get_update_session(self, request):
+        update_session = self.update_sessions.get(request.match_info["session"])
+        if not update_session:
+            return not_found(request.match_info["session"])
+        return json_response({k: v for k, v in update_session.items() if k != "files"})
+
+    async def update_session_action(self, request):
+        update_session = self.update_sessions.get(request.match_info["session"])
+        if not update_session:
+            return not_found(request.match_info["session"])
+        action = request.query.get("action")
+        if action == "keep-alive":
+            return web.Response(status=204)
+        if update_session["state"] != "ACTIVE":
+            return error(400, "NOT_ALLOWED_IN_CURRENT_STATE", "Not active.")
+        if action == "complete":
+            if self.validate_update_files(update_session)["has_errors"]:
+                return error(400, "NOT_ALLOWED_IN_CURRENT_STATE", "Invalid files.")
+            for name, upload in update_session["files"].items():
+                self.inventory.add_file(
+                    update_session["library_item_id"], name, bytes(upload["data"])
+                )
+            update_session["state"] = "DONE"
+        elif action in ("cancel", "fail"):
+            update_session["state"] = "CANCELED" if action == "cancel" else "ERROR"
+            if action == "fail":
+                body = await request.json() if request.can_read_body else {}
+                update_session["error_message"] = body.get("client_error_message")
+        else:
+            return error(400, "INVALID_ARGUMENT", f"Unknown action {action}.")
+        return web.Response(status=204)
+
+    async def delete_update_session(self, request):
+        if not self.update_sessions.pop(request.match_info["session"], None):
+            return not_found(request.match_info["session"])
+        return web.Response(status=204)
+
+    def update_file_info(self, request, update_session, name):
+        upload = update_session["files"][name]
+        uri = (
+            f"{request.scheme}://{request.host}/cls/data/{update_session['id']}/{name}"
+        )
+        return {
+            "name": name,
+            "source_type": "PUSH",
+            "size": upload["size"],
+            "checksum_info": upload["checksum_info"],
+            "bytes_transferred": len(upload["data"]),
+            "status": "READY"
+            if len(upload["data"]) == upload["size"]
+            else "WAITING_FOR_TRANSFER",
+            "upload_endpoint": {"uri": uri},
+        }
+
+    def validate_update_files(self, update_session):
+        invalid = []
+        for name, upload in update_session["files"].items():
+            if len(upload["data"]) != upload["size"]:
+                invalid.append({"name": name, "error_message": "Incomplete file."})
+            elif (
+                hashlib.sha256(upload["data"]).hexdigest()
+                != upload["checksum_info"]["checksum"]
+            ):
+                invalid.append({"name": name, "error_message": "Checksum mismatch."})
+        return {
+            "has_errors": bool(invalid),
+            "missing_files": [],
+            "invalid_files": invalid,
+        }
+
+    async def update_file_action(self, request):
+        update_session = self.update_sessions.get(request.match_info["session"])
+        if not update_session:
+            return not_found(request.match_info["session"])
+        action = request.query.get("action")
+        if action == "validate":
+            return json_response(self.validate_update_files(update_session))
+        if action != "add":
+            return error(400, "INVALID_ARGUMENT", f"Unknown action {action}.")
+        spec = await request.json()
+        update_session["files"][spec["name"]] = {
+            "size": spec["size"],
+            "checksum_info": spec.get("checksum_info"),
+            "data": bytearray(),
+        }
+        return json_response(
+            self.update_file_info(request, update_session, spec["name"])
+        )
+
+    async def get_update_file(self, request):
+        update_session = self.update_sessions.get(request.match_info["session"])
+        if not update_session:
+            return not_found(request.match_info["session"])
+        name = request.match_info["name"]
+        if name not in update_session["files"]:
+            return not_found(name)
+        return json_response(self.update_file_info(request, update_session, name))
+
+    async def upload_data(self, request):
+        update_session = self.update_sessions.get(request.match_info["session"])
+        name = request.match_info["name"]
+        if not update_session or name not in update_session["files"]:
+            return web.Response(status=404)
+        upload = update_session["files"][name]
+        offset = 0
+        content_range = request.headers.get("Content-Range")
+        if content_range:  # bytes START-END/SIZE
+            offset = int(content_range.split()[1].split("-")[0])
+        if offset != len(upload["data"]):
+            return web.Response(status=416)
+        upload["data"] += await request.read()
+        return web.Response(status=200)
+
+
+def ssl_context(cert_dir=None):
+    """A server context with a self-signed certificate made by openssl."""
+    cert_dir = cert_dir or tempfile.mkdtemp(prefix="vcenter-simulator-")
+    cert = os.path.join(cert_dir, "cert.pem")
+    key = os.path.join(cert_dir, "key.pem")
+    if not os.path.exists(cert):
+        subprocess.run(
+            [
+                "openssl",
+                "req",
+                "-x509",
+                "-newkey",
+                "rsa:2048",
+                "-nodes",
+                "-days",
+                "30",
+                "-subj",
+                "/CN=localhost",
+                "-keyout",
+                key,
+                "-out",
+                cert,
+            ],
+            check=True,
+            capture_output=True,
+        )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+async def start(simulator, host="127.0.0.1", port=0, tls=True):
+    """Start serving simulator, return the runner and the bound port."""
+    runner = web.AppRunner(simulator.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port, ssl_context=ssl_context() if tls else None)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, port
+
+
+def parse_latency(values):
+    latency = {}
+    for value in values or []:
+        pattern, _, delay = value.rpartition("=")
+        latency[pattern or "*"] = float(delay)
+    return latency
+
+
+def parse_faults(args):
+    faults = {}
+    if args.spike:
+        probability, _, seconds = args.spike.partition(":")
+        faults["spike"] = (float(probability), float(seconds))
+    if args.unavailable:
+        probability, _, count = args.unavailable.partition(":")
+        faults["unavailable"] = (float(probability), int(count or 1))
+    if args.reset:
+        faults["reset"] = float(args.reset)
+    return faults
+
+
+def add_fault_arguments(parser):
+    for name, metavar in FAULTS.items():
+        parser.add_argument(
+            f"--{name}", metavar=metavar, help=f"inject the {name} fault at random"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--no-tls", action="store_true")
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="record the requests, they are served on /simulator/requests",
+    )
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--vms", type=int, default=100)
+    parser.add_argument("--datacenters", type=int, default=1)
+    parser.add_argument("--clusters", type=int, default=2)
+    parser.add_argument("--hosts-per-cluster", type=int, default=2)
+    parser.add_argument("--resource-pools", type=int, default=1)
+    parser.add_argument("--datastores", type=int, default=2)
+    parser.add_argument("--networks", type=int, default=2)
+    parser.add_argument("--folder-depth", type=int, default=2)
+    parser.add_argument("--folder-fanout", type=int, default=2)
+    parser.add_argument("--libraries", type=int, default=1)
+    parser.add_argument("--items-per-library", type=int, default=2)
+    parser.add_argument(
+        "--latency",
+        action="append",
+        metavar="'METHOD /path/pattern=SECONDS'",
+        help="the delay of the matching requests, e.g: 'GET /api/vcenter/vm*=0.05'",
+    )
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    inventory = Inventory(
+        vms=args.vms,
+        datacenters=args.datacenters,
+        clusters=args.clusters,
+        hosts_per_cluster=args.hosts_per_cluster,
+        resource_pools=args.resource_pools,
+        datastores=args.datastores,
+        networks=args.networks,
+        folder_depth=args.folder_depth,
+        folder_fanout=args.folder_fanout,
+        libraries=args.libraries,
+        items_per_library=args.items_per_library,
+        seed=args.seed,
+    )
+    simulator = Simulator(
+        inventory,
+        latency=parse_latency(args.latency),
+        username=args.username,
+        password=args.password,
+        record=args.record,
+        faults=parse_faults(args),
+        seed=args.seed,
+    )
+    print(
+        json.dumps({k: len(v) for k, v in inventory.objects.items()}),
+        f"seeded in {time.monotonic() - started:.2f}s",
+    )
+    web.run_app(
+        simulator.app(),
+        host=args.host,
+        port=args.port,
+        ssl_context=None if args.no_tls else ssl_context(),
+        access_log=None,
+    )
+
+
+if __name__ == "__main__":
+    main()
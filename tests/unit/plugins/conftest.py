@@ -0,0 +1,20 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import contextlib
+
+import pytest
+
+from ansible_collections.vmware.vmware_rest.tests.simulator import client
+
+
+@pytest.fixture
+def start_simulator():
+    """A function that serves an Inventory with a simulator until the end of
+    the test, and returns the loop, the Simulator and its hostname."""
+    with contextlib.ExitStack() as stack:
+        yield lambda inventory: stack.enter_context(client.running(inventory))
@@ -0,0 +1,119 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""The vms inventory plugin, against the local simulator (tests/simulator/vcenter.py).
+
+The plugin runs its own event loop, the simulator runs in a thread.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import asyncio
+import threading
+
+import pytest
+
+from ansible import template
+from ansible.inventory.data import InventoryData
+from ansible.parsing.dataloader import DataLoader
+
+from ansible_collections.vmware.vmware_rest.plugins.inventory.vms import InventoryModule
+from ansible_collections.vmware.vmware_rest.tests.simulator import vcenter
+
+# ansible-core 2.19+ only evaluates the trusted templates
+trust = getattr(template, "trust_as_template", lambda i: i)
+
+
+@pytest.fixture(scope="module")
+def simulator():
+    simulator = vcenter.Simulator(vcenter.Inventory(vms=200))
+    loop = asyncio.new_event_loop()
+    runner, port = loop.run_until_complete(vcenter.start(simulator))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    simulator.hostname = f"127.0.0.1:{port}"
+    try:
+        yield simulator
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def plugin(simulator, **options):
+    inventory = InventoryModule()
+    inventory.loader = DataLoader()
+    inventory.inventory = InventoryData()
+    inventory._options = {
+        "vcenter_hostname": simulator.hostname,
+        "vcenter_username": "administrator@vsphere.local",
+        "vcenter_password": "password",
+        "vcenter_validate_certs": False,
+        "vcenter_rest_log_file": None,
+        "list_filters": {},
+        "properties": ["identity", "interfaces"],
+        "hostnames": ["vm_name"],
+        "filters": [],
+        "max_concurrent_requests": 4,
+        "strict": True,
+        "compose": {},
+        "groups": {},
+        "keyed_groups": [],
+        "use_extra_vars": False,
+    }
+    inventory._options.update(options)
+    return inventory
+
+
+def test_fetch_vms(simulator):
+    simulator.requests.clear()
+    vms = plugin(simulator).fetch_vms()
+    assert len(vms) == 200
+    powered_on = [i for i in vms if i["power_state"] == "POWERED_ON"]
+    assert powered_on
+    for vm in vms:
+        if vm["power_state"] == "POWERED_ON":
+            assert vm["guest_identity"]["host_name"] == vm["vm_name"]
+            assert vm["guest_interfaces"][0]["ip"]["ip_addresses"]
+        else:
+            assert vm["guest_identity"] is None
+            assert vm["guest_interfaces"] is None
+    # the authentication, the list, then two calls per powered on VM
+    assert len(simulator.requests) <= 2 + 2 * len(powered_on)
+
+
+def test_fetch_vms_list_filters(simulator):
+    vms = plugin(
+        simulator, list_filters={"power_states": "POWERED_OFF"}, properties=["detail"]
+    ).fetch_vms()
+    assert vms
+    for vm in vms:
+        assert vm["power_state"] == "POWERED_OFF"
+        assert vm["vm_detail"]["name"] == vm["vm_name"]
+        assert "guest_identity" not in vm
+
+
+def test_populate(simulator):
+    inventory = plugin(
+        simulator,
+        hostnames=["guest_identity.host_name", "vm"],
+        filters=[trust("vm_name.endswith('1')")],
+        keyed_groups=[{"key": trust("power_state"), "prefix": "power"}],
+    )
+    vms = inventory.fetch_vms()
+    inventory.populate(vms)
+
+    hosts = inventory.inventory.hosts
+    expected = [i for i in vms if i["vm_name"].endswith("1")]
+    assert len(hosts) == len(expected)
+    for vm in expected:
+        if vm["power_state"] == "POWERED_ON":
+            host = hosts[vm["vm_name"]]
+            assert host.vars["ansible_host"] == vm["guest_identity"]["ip_address"]
+            assert "power_POWERED_ON" in [g.name for g in host.groups]
+        else:
+            host = hosts[vm["vm"]]
+            assert "ansible_host" not in host.vars
+            assert "power_POWERED_OFF" in [g.name for g in host.groups]
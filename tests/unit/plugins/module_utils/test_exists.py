@@ -0,0 +1,89 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import asyncio
+import contextlib
+
+from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
+    exists,
+)
+
+URL = "https://vcenter.test/api/content/local-library"
+
+LIBRARIES = {
+    "lib-1": {"name": "a", "type": "LOCAL"},
+    "lib-2": {"name": "b", "type": "LOCAL"},
+    "lib-3": {"name": "c", "type": "LOCAL"},
+}
+
+
+class FakeResponse:
+    def __init__(self, body, status=200):
+        self.body = body
+        self.status = status
+
+    async def json(self):
+        return self.body
+
+
+class FakeSession:
+    """Answer the list at once and the description of each library after its
+    delay, record the requests that were cancelled."""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.requests = []
+        self.cancelled = []
+
+    @contextlib.asynccontextmanager
+    async def get(self, url):
+        self.requests.append(url)
+        _id = url[len(URL) + 1 :]
+        if not _id:
+            yield FakeResponse(list(LIBRARIES))
+            return
+        try:
+            await asyncio.sleep(self.delays[_id])
+        except asyncio.CancelledError:
+            self.cancelled.append(_id)
+            raise
+        yield FakeResponse(LIBRARIES[_id])
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_no_unicity_key():
+    session = FakeSession({})
+    assert run(exists({"name": None}, session, URL, ["library_id", "name"])) is None
+    assert session.requests == []
+
+
+def test_stop_at_first_match():
+    session = FakeSession({"lib-1": 60, "lib-2": 0, "lib-3": 60})
+    params = {"library_id": None, "name": "b"}
+
+    async def check():
+        device = await exists(params, session, URL, ["library_id", "name"])
+        return device, sorted(session.cancelled)
+
+    device, cancelled = run(check())
+    assert device == {"value": LIBRARIES["lib-2"], "id": "lib-2"}
+    # the pending requests are cancelled, and done, before exists() returns
+    assert cancelled == ["lib-1", "lib-3"]
+
+
+def test_no_match():
+    session = FakeSession({"lib-1": 0, "lib-2": 0, "lib-3": 0})
+    params = {"library_id": None, "name": "d"}
+    assert run(exists(params, session, URL, ["library_id", "name"])) is None
+    assert len(session.requests) == 1 + len(LIBRARIES)
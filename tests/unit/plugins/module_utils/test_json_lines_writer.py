@@ -0,0 +1,63 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+
+from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
+    JsonLinesWriter,
+)
+
+
+def read(path):
+    with open(path) as fd:
+        return [json.loads(i) for i in fd]
+
+
+def test_finish_list(tmp_path):
+    dest = str(tmp_path / "vms.jsonl")
+    writer = JsonLinesWriter(dest, ["vm", "hardware.version"])
+    writer.write({"vm": "vm-1", "name": "a", "hardware": {"version": "VMX_11"}})
+    result = writer.finish(
+        {"value": [{"vm": "vm-2", "name": "b"}], "changed": False, "failed": False}
+    )
+    writer.discard()
+    assert result == {"changed": True, "failed": False, "dest": dest, "count": 2}
+    assert read(dest) == [
+        {"vm": "vm-1", "hardware": {"version": "VMX_11"}},
+        {"vm": "vm-2", "hardware": {"version": None}},
+    ]
+
+
+def test_finish_object(tmp_path):
+    dest = str(tmp_path / "vm.jsonl")
+    writer = JsonLinesWriter(dest)
+    result = writer.finish({"value": {"name": "a"}, "id": "vm-1", "changed": False})
+    assert result == {"id": "vm-1", "changed": True, "dest": dest, "count": 1}
+    assert read(dest) == [{"name": "a"}]
+
+
+def test_unchanged(tmp_path):
+    dest = tmp_path / "vm.jsonl"
+    JsonLinesWriter(str(dest)).finish({"value": {"name": "a"}, "changed": False})
+    mtime = dest.stat().st_mtime_ns
+    writer = JsonLinesWriter(str(dest))
+    result = writer.finish({"value": {"name": "a"}, "changed": False})
+    assert not result["changed"]
+    assert dest.stat().st_mtime_ns == mtime
+    assert [i.name for i in tmp_path.iterdir()] == ["vm.jsonl"]
+
+
+def test_failed(tmp_path):
+    dest = tmp_path / "vms.jsonl"
+    dest.write_text("previous\n")
+    writer = JsonLinesWriter(str(dest))
+    writer.write({"vm": "vm-1"})
+    result = {"value": {"error_type": "NOT_FOUND"}, "failed": True}
+    assert writer.finish(result) is result
+    writer.discard()
+    assert dest.read_text() == "previous\n"
+    assert [i.name for i in tmp_path.iterdir()] == ["vms.jsonl"]
@@ -0,0 +1,78 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import stat
+
+import pytest
+
+from ansible_collections.vmware.vmware_rest.plugins.modules import (
+    appliance_networking_proxy,
+    vcenter_host,
+)
+from ansible_collections.vmware.vmware_rest.tests.simulator import (
+    client,
+    replay,
+    vcenter,
+)
+
+SECRETS = {
+    appliance_networking_proxy: {"username": "proxy-user", "password": "proxy-s3cret"},
+    vcenter_host: {"user_name": "esxi-user", "password": "esxi-s3cret"},
+}
+
+PARAMS = {
+    appliance_networking_proxy: {
+        "protocol": "http",
+        "server": "proxy.test",
+        "port": 3128,
+        "enabled": True,
+    },
+    vcenter_host: {"hostname": "esxi.test", "thumbprint_verification": "NONE"},
+}
+
+
+@pytest.fixture
+def env(start_simulator):
+    return start_simulator(vcenter.Inventory(vms=10))
+
+
+def run(loop, hostname, log_file):
+    for module, params in PARAMS.items():
+        loop.run_until_complete(
+            client.run_main(
+                module,
+                vcenter_hostname=hostname,
+                vcenter_rest_log_file=log_file,
+                **params,
+                **SECRETS[module],
+            )
+        )
+
+
+def test_round_trip(env, tmp_path):
+    loop, simulator, hostname = env
+    log_file = tmp_path / "rest.jsonl"
+    run(loop, hostname, str(log_file))
+
+    assert stat.S_IMODE(os.stat(log_file).st_mode) == 0o600
+    recording = log_file.read_text()
+    for secret in [v for i in SECRETS.values() for v in i.values()]:
+        assert secret not in recording
+    records = replay.load(str(log_file))
+    proxy = [i for i in records if i["url"].endswith("/networking/proxy/http")]
+    assert {i["method"] for i in proxy} >= {"GET", "PUT"}
+
+    # the recording is served again, the same requests get an answer
+    server = replay.Replay(records, speed=0)
+    runner, port = loop.run_until_complete(vcenter.start(server))
+    try:
+        run(loop, f"127.0.0.1:{port}", None)
+    finally:
+        loop.run_until_complete(runner.cleanup())
+    assert server.requests
+    assert not server.misses
@@ -0,0 +1,85 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import asyncio
+import json
+
+import pytest
+
+from ansible_collections.vmware.vmware_rest.plugins.modules import vcenter_vm_power_info
+from ansible_collections.vmware.vmware_rest.tests.simulator import client, vcenter
+
+LOGIN = ("POST", "/rest/com/vmware/cis/session")
+
+
+@pytest.fixture
+def env(start_simulator, tmp_path, monkeypatch):
+    monkeypatch.setenv("VMWARE_REST_SESSION_CACHE", str(tmp_path / "cache"))
+    loop, simulator, hostname = start_simulator(vcenter.Inventory(vms=10))
+    return loop, simulator, hostname, tmp_path / "cache"
+
+
+def task(env):
+    """Run a module like a new task: without the sessions of the pool."""
+    loop, simulator, hostname, _ = env
+    loop.run_until_complete(client.close_sessions())
+    simulator.requests.clear()
+    vm = next(iter(simulator.inventory.objects["vm"]))
+    result = loop.run_until_complete(
+        client.run_module(vcenter_vm_power_info, vcenter_hostname=hostname, vm=vm)
+    )
+    assert not result.get("failed"), result
+    return [(i[0], i[1].split("?")[0]) for i in simulator.requests]
+
+
+def cached_ids(cache_dir):
+    return [json.loads(i.read_text())["session_id"] for i in cache_dir.iterdir()]
+
+
+def test_reuse(env):
+    simulator, cache_dir = env[1], env[3]
+    assert task(env)[0] == LOGIN
+    assert cached_ids(cache_dir) == list(simulator.sessions)
+    # the cached ID is used as is, without a check
+    assert len(task(env)) == 1
+    assert len(simulator.sessions) == 1
+
+
+def test_renew(env):
+    simulator, cache_dir = env[1], env[3]
+    task(env)
+    # e.g: vCenter has been restarted
+    simulator.sessions.clear()
+    requests = task(env)
+    assert requests[1] == LOGIN
+    assert requests[0] == requests[2]
+    assert cached_ids(cache_dir) == list(simulator.sessions)
+    assert len(task(env)) == 1
+
+
+def test_renew_once(env):
+    loop, simulator, hostname = env[:3]
+    task(env)
+    simulator.sessions.clear()
+    loop.run_until_complete(client.close_sessions())
+    simulator.requests.clear()
+    vms = list(simulator.inventory.objects["vm"])
+
+    async def run():
+        return await asyncio.gather(
+            *(
+                client.run_module(
+                    vcenter_vm_power_info, vcenter_hostname=hostname, vm=vm
+                )
+                for vm in vms
+            )
+        )
+
+    results = loop.run_until_complete(run())
+    assert not any(i.get("failed") for i in results)
+    # the concurrent requests wait for the same new session
+    assert simulator.requests.count(LOGIN) == 1
@@ -0,0 +1,79 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import copy
+
+import pytest
+
+from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
+    shape_result,
+)
+
+VMS = {
+    "value": [
+        {
+            "vm": "vm-1",
+            "name": "a",
+            "power_state": "POWERED_ON",
+            "hardware": {"version": "VMX_11", "upgrade_policy": "NEVER"},
+        },
+        {"vm": "vm-2", "name": "b", "power_state": "POWERED_OFF"},
+    ],
+    "changed": False,
+}
+
+
+def shape(result, *args):
+    return shape_result(copy.deepcopy(result), *args)
+
+
+def test_native():
+    assert shape(VMS, None, "native") == VMS
+
+
+def test_fields():
+    result = shape(VMS, ["vm", "hardware.version"], "native")
+    assert result["value"] == [
+        {"vm": "vm-1", "hardware": {"version": "VMX_11"}},
+        {"vm": "vm-2", "hardware": {"version": None}},
+    ]
+
+
+def test_fields_single_object():
+    result = shape({"value": VMS["value"][0], "id": "vm-1"}, ["name"], "native")
+    assert result == {"value": {"name": "a"}, "id": "vm-1"}
+
+
+def test_columnar():
+    result = shape(VMS, None, "columnar")
+    assert result["value"] == {
+        "columns": ["vm", "name", "power_state", "hardware"],
+        "rows": [
+            ["vm-1", "a", "POWERED_ON", VMS["value"][0]["hardware"]],
+            ["vm-2", "b", "POWERED_OFF", None],
+        ],
+    }
+
+
+def test_columnar_fields():
+    result = shape(VMS, ["name", "hardware.version"], "columnar")
+    assert result["value"] == {
+        "columns": ["name", "hardware.version"],
+        "rows": [["a", "VMX_11"], ["b", None]],
+    }
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        {"value": ["library-1", "library-2"]},
+        {"value": "green"},
+        {"value": {"error_type": "NOT_FOUND"}, "failed": True},
+    ],
+)
+def test_unchanged(result):
+    assert shape(result, ["name"], "columnar") == result
@@ -0,0 +1,98 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
+    StateDiff,
+)
+
+VMS = [
+    {"vm": "vm-1", "name": "a", "power_state": "POWERED_ON"},
+    {"vm": "vm-2", "name": "b", "power_state": "POWERED_OFF"},
+    {"vm": "vm-3", "name": "c", "power_state": "POWERED_OFF"},
+]
+
+
+def select(path, objects, check_mode=False):
+    result = {"value": [dict(i) for i in objects], "changed": False}
+    return StateDiff(path, "vm").select(result, check_mode)
+
+
+def test_first_run(tmp_path):
+    result = select(str(tmp_path / "state.json"), VMS)
+    assert result["value"] == VMS
+    assert result["added"] == ["vm-1", "vm-2", "vm-3"]
+    assert result["modified"] == result["removed"] == []
+
+
+def test_diff(tmp_path):
+    path = str(tmp_path / "state.json")
+    select(path, VMS)
+    vms = [VMS[0], dict(VMS[1], power_state="POWERED_ON"), {"vm": "vm-4", "name": "d"}]
+    result = select(path, vms)
+    assert result["value"] == vms[1:]
+    assert result["added"] == ["vm-4"]
+    assert result["modified"] == ["vm-2"]
+    assert result["removed"] == ["vm-3"]
+
+    result = select(path, vms)
+    assert result["value"] == []
+    assert result["added"] == result["modified"] == result["removed"] == []
+
+
+def test_check_mode(tmp_path):
+    path = tmp_path / "state.json"
+    select(str(path), VMS, check_mode=True)
+    assert not path.exists()
+
+
+def test_failed(tmp_path):
+    path = tmp_path / "state.json"
+    result = {"value": {"error_type": "NOT_FOUND"}, "failed": True}
+    assert StateDiff(str(path), "vm").select(result) == result
+    assert not path.exists()
+
+
+def test_corrupt_file(tmp_path):
+    path = tmp_path / "state.json"
+    select(str(path), VMS)
+    # e.g: a run interrupted while the file was written by an older version
+    path.write_text(path.read_text()[:20])
+    result = select(str(path), VMS)
+    assert result["value"] == VMS
+    assert result["added"] == ["vm-1", "vm-2", "vm-3"]
+    assert result["warnings"][0].startswith(f"Cannot read the state file {path}")
+    # the file is replaced, the next run is a diff again
+    result = select(str(path), VMS)
+    assert result["value"] == []
+    assert "warnings" not in result
+
+
+def test_prefilter(tmp_path):
+    path = str(tmp_path / "state.json")
+    select(path, VMS)
+    state = StateDiff(path, "vm")
+    vms = [VMS[0], dict(VMS[1], power_state="POWERED_ON"), VMS[2]]
+    # the descriptions of the new and modified VMs only are then fetched
+    assert state.prefilter(vms) == [vms[1]]
+    written = []
+    state.filter(written.append)(dict(vms[1], memory={"size_MiB": 4096}))
+    result = state.finish({"changed": False})
+    assert written[0]["vm"] == "vm-2"
+    assert result["modified"] == ["vm-2"]
+    assert result["added"] == result["removed"] == []
+
+
+def test_prefilter_not_returned(tmp_path):
+    path = str(tmp_path / "state.json")
+    state = StateDiff(path, "vm")
+    state.prefilter(VMS)
+    # vm-3 is filtered out after the prefilter, e.g: by the where option
+    result = state.select({"value": VMS[:2], "changed": False})
+    assert result["added"] == ["vm-1", "vm-2"]
+    # and is new again on the next run
+    state = StateDiff(path, "vm")
+    assert state.prefilter(VMS) == [VMS[2]]
@@ -0,0 +1,50 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import pytest
+
+from ansible_collections.vmware.vmware_rest.plugins.module_utils.vmware_rest import (
+    Where,
+)
+
+VMS = [
+    {"vm": "vm-1", "name": "web-1", "memory_size_MiB": 32768},
+    {"vm": "vm-2", "name": "web-2", "memory_size_MiB": 4096},
+    {"vm": "vm-3", "name": "db-1", "memory_size_MiB": 65536},
+]
+
+
+@pytest.mark.parametrize(
+    "conditions,expected",
+    [
+        (["name matches ^web"], ["vm-1", "vm-2"]),
+        (["not name matches ^web"], ["vm-3"]),
+        (["memory_size_MiB > 16384"], ["vm-1", "vm-3"]),
+        (["name startswith web", "memory_size_MiB>=32768"], ["vm-1"]),
+        (['vm in ["vm-2", "vm-3"]'], ["vm-2", "vm-3"]),
+        (["name == 'db-1'"], ["vm-3"]),
+        (["name endswith 1", "name contains -"], ["vm-1", "vm-3"]),
+        (["guest_OS startswith RHEL"], []),
+        (["hardware.version == VMX_11"], []),
+    ],
+)
+def test_select(conditions, expected):
+    assert [i["vm"] for i in Where(conditions).select(VMS)] == expected
+
+
+def test_prefilter():
+    where = Where(["name matches ^web", "guest_OS startswith RHEL"])
+    entries = where.prefilter(VMS)
+    assert [i["vm"] for i in entries] == ["vm-1", "vm-2"]
+    assert where.remaining(entries).keys() == ["guest_OS"]
+    assert where.keys() == ["name", "guest_OS"]
+
+
+@pytest.mark.parametrize("condition", ["name", "name ~ web", "name matches ("])
+def test_invalid(condition):
+    with pytest.raises(ValueError):
+        Where([condition])
@@ -0,0 +1,133 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import os
+
+import pytest
+
+from ansible_collections.vmware.vmware_rest.plugins.modules import (
+    content_library_item_download,
+)
+from ansible_collections.vmware.vmware_rest.tests.simulator import client, vcenter
+
+OVF = b"<Envelope/>\n" * 100
+VMDK = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def env(start_simulator):
+    inventory = vcenter.Inventory(vms=10, items_per_library=1)
+    item_id = next(iter(inventory.items))
+    inventory.add_file(item_id, "my_template.ovf", OVF)
+    inventory.add_file(item_id, "my_template-disk1.vmdk", VMDK)
+    loop, simulator, hostname = start_simulator(inventory)
+    return loop, simulator, item_id, hostname
+
+
+def download(env, dest, **params):
+    loop, simulator, item_id, hostname = env
+    simulator.requests.clear()
+    return loop.run_until_complete(
+        client.run_module(
+            content_library_item_download,
+            vcenter_hostname=hostname,
+            library_item_id=item_id,
+            dest=str(dest),
+            part_size=1000,
+            **params,
+        )
+    )
+
+
+def ranges(simulator):
+    return [i for i in simulator.requests if i[1].startswith("/cls/data/")]
+
+
+def test_download(env, tmp_path):
+    simulator = env[1]
+    result = download(env, tmp_path)
+    assert result["changed"] and not result.get("failed"), result
+    assert (tmp_path / "my_template.ovf").read_bytes() == OVF
+    assert (tmp_path / "my_template-disk1.vmdk").read_bytes() == VMDK
+    assert sorted(os.listdir(tmp_path)) == [
+        "my_template-disk1.vmdk",
+        "my_template.ovf",
+    ]
+    # one range request per part
+    assert len(ranges(simulator)) == 2 + 11
+    assert not simulator.download_sessions
+
+
+def test_download_unchanged(env, tmp_path):
+    simulator = env[1]
+    download(env, tmp_path)
+    result = download(env, tmp_path)
+    assert not result["changed"]
+    # only the list of the files
+    assert len(simulator.requests) == 1
+
+
+def test_main(env, tmp_path):
+    # dest is a directory here, not the JSON Lines file of the info modules
+    loop, simulator, item_id, hostname = env
+    coroutine = client.run_main(
+        content_library_item_download,
+        vcenter_hostname=hostname,
+        library_item_id=item_id,
+        dest=str(tmp_path / "dest"),
+    )
+    result = loop.run_until_complete(coroutine)
+    assert result["changed"] and not result.get("failed"), result
+    assert len(result["value"]) == 2
+    assert os.listdir(tmp_path) == ["dest"]
+    assert (tmp_path / "dest" / "my_template.ovf").read_bytes() == OVF
+
+
+def test_download_check_mode(env, tmp_path):
+    result = download(env, tmp_path / "dest", check_mode=True)
+    assert result["changed"]
+    assert not os.path.exists(tmp_path / "dest")
+
+
+def test_download_checksum_mismatch(env, tmp_path):
+    simulator, item_id = env[1], env[2]
+    contents = simulator.inventory.file_contents
+    contents[(item_id, "my_template.ovf")] = OVF.upper()
+    result = download(env, tmp_path, files=["my_template.ovf"])
+    assert result["failed"]
+    assert result["msg"].startswith("Checksum mismatch for my_template.ovf")
+    # the corrupted file is not kept, the next run starts again
+    assert os.listdir(tmp_path) == []
+    assert not simulator.download_sessions
+
+
+def test_download_resume(env, tmp_path):
+    simulator = env[1]
+    download(env, tmp_path, files=["my_template-disk1.vmdk"])
+    path = tmp_path / "my_template-disk1.vmdk"
+    # an interrupted run has written the first 4 parts
+    os.rename(path, str(path) + ".part")
+    remote_file = simulator.inventory.files[env[2]][1]
+    progress = {
+        "size": len(VMDK),
+        "checksum_info": remote_file["checksum_info"],
+        "part_size": 1000,
+        "done": [0, 1, 2, 3],
+    }
+    with open(str(path) + ".part.json", "w") as fd:
+        json.dump(progress, fd)
+    result = download(env, tmp_path, files=["my_template-disk1.vmdk"])
+    assert result["changed"]
+    assert path.read_bytes() == VMDK
+    assert len(ranges(simulator)) == 11 - 4
+
+
+def test_unknown_file(env, tmp_path):
+    result = download(env, tmp_path, files=["foo.iso"])
+    assert result["failed"]
+    assert result["msg"] == "Unknown files: foo.iso"
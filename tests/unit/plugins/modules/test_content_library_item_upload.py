@@ -0,0 +1,103 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+
+import pytest
+
+from ansible_collections.vmware.vmware_rest.plugins.modules import (
+    content_library_item_upload,
+)
+from ansible_collections.vmware.vmware_rest.tests.simulator import client, vcenter
+
+OVF = b"<Envelope/>\n" * 100
+VMDK = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def env(start_simulator, tmp_path):
+    (tmp_path / "my_template.ovf").write_bytes(OVF)
+    (tmp_path / "my_template-disk1.vmdk").write_bytes(VMDK)
+    return start_simulator(vcenter.Inventory(vms=10, items_per_library=1))
+
+
+def upload(env, tmp_path, **params):
+    loop, simulator, hostname = env
+    simulator.requests.clear()
+    return loop.run_until_complete(
+        client.run_module(
+            content_library_item_upload,
+            vcenter_hostname=hostname,
+            library_id=next(iter(simulator.inventory.libraries)),
+            name="my_template",
+            files=[
+                str(tmp_path / "my_template.ovf"),
+                str(tmp_path / "my_template-disk1.vmdk"),
+            ],
+            **params,
+        )
+    )
+
+
+def uploads(simulator):
+    return [i[1] for i in simulator.requests if i[0] == "PUT"]
+
+
+def test_create(env, tmp_path):
+    simulator = env[1]
+    result = upload(env, tmp_path)
+    assert result["changed"] and not result.get("failed"), result
+    item = simulator.inventory.items[result["id"]]
+    assert item["name"] == "my_template"
+    contents = simulator.inventory.file_contents
+    assert contents[(result["id"], "my_template.ovf")] == OVF
+    assert contents[(result["id"], "my_template-disk1.vmdk")] == VMDK
+    assert sorted(i["name"] for i in result["value"]) == [
+        "my_template-disk1.vmdk",
+        "my_template.ovf",
+    ]
+    assert len(uploads(simulator)) == 2
+    assert [i["state"] for i in simulator.update_sessions.values()] == ["DONE"]
+
+
+def test_unchanged(env, tmp_path):
+    simulator = env[1]
+    item_id = upload(env, tmp_path)["id"]
+    result = upload(env, tmp_path)
+    assert not result["changed"]
+    assert result["id"] == item_id
+    # the search of the item and the list of its files
+    assert len(simulator.requests) == 2
+    assert len(simulator.update_sessions) == 1
+
+
+def test_check_mode(env, tmp_path):
+    simulator = env[1]
+    result = upload(env, tmp_path, check_mode=True)
+    assert result["changed"]
+    assert len(simulator.inventory.items) == 1
+    assert not simulator.update_sessions
+
+
+def test_checksum_mismatch(env, tmp_path):
+    simulator = env[1]
+    item_id = upload(env, tmp_path)["id"]
+    # same size, another content
+    (tmp_path / "my_template.ovf").write_bytes(OVF.upper())
+    result = upload(env, tmp_path)
+    assert result["changed"]
+    # only the modified file is sent again
+    assert len(uploads(simulator)) == 1
+    assert uploads(simulator)[0].endswith("/my_template.ovf")
+    assert simulator.inventory.file_contents[(item_id, "my_template.ovf")] == (
+        OVF.upper()
+    )
+
+
+def test_unknown_item(env, tmp_path):
+    result = upload(env, tmp_path, library_item_id="unknown")
+    assert result["failed"]
+    assert "status=404" in result["msg"]
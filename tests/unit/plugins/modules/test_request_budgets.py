@@ -0,0 +1,603 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""The number of HTTP requests sent by the modules and the lookups.
+
+Each scenario runs the entry_point() of a module against the local simulator
+(tests/simulator/vcenter.py) and asserts an upper bound of the requests it sends.
+The bounds do not depend on the size of the inventory or on the number of devices
+of the VM. The generated modules of the VM hardware are all covered, through
+the same scenarios, a change of the generator that adds some round-trips to
+them fails here. The other modules are covered one by one.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import importlib
+import json
+
+import pytest
+
+from ansible_collections.vmware.vmware_rest.plugins.module_utils import vmware_rest
+from ansible_collections.vmware.vmware_rest.plugins.modules import (
+    content_library_item_info,
+    vcenter_inventory_snapshot,
+    vcenter_vm_hardware_disk,
+    vcenter_vm_info,
+    vcenter_vm_power_info,
+)
+from ansible_collections.vmware.vmware_rest.plugins.plugin_utils.lookup import Lookup
+from ansible_collections.vmware.vmware_rest.tests.simulator import client, vcenter
+
+# The generated modules of the devices of a VM, and the label of the device of
+# the seeded VMs, if any
+DEVICE_MODULES = {
+    "vcenter_vm_hardware_adapter_sata": None,
+    "vcenter_vm_hardware_adapter_scsi": "SCSI controller 0",
+    "vcenter_vm_hardware_cdrom": None,
+    "vcenter_vm_hardware_disk": "Hard disk 1",
+    "vcenter_vm_hardware_ethernet": "Network adapter 1",
+    "vcenter_vm_hardware_floppy": None,
+    "vcenter_vm_hardware_parallel": None,
+    "vcenter_vm_hardware_serial": None,
+}
+# The generated modules of the settings of a VM
+SETTING_MODULES = [
+    "vcenter_vm_hardware",
+    "vcenter_vm_hardware_boot",
+    "vcenter_vm_hardware_cpu",
+    "vcenter_vm_hardware_memory",
+]
+
+
+def import_module(name):
+    return importlib.import_module(
+        "ansible_collections.vmware.vmware_rest.plugins.modules." + name
+    )
+
+
+class Environment:
+    def __init__(self, loop, simulator, hostname):
+        self.loop = loop
+        self.simulator = simulator
+        self.inventory = simulator.inventory
+        self.hostname = hostname
+
+    def vm(self, disks=1):
+        """A VM of the middle of the inventory, with the given number of disks."""
+        vms = list(self.inventory.objects["vm"])
+        moid = vms[len(vms) // 2 + disks]
+        detail = self.inventory.vm_detail(moid)
+        for i in range(len(detail["disks"]), disks):
+            detail["disks"][str(2000 + i)] = {
+                "backing": {"type": "VMDK_FILE", "vmdk_file": f"[datastore0] {i}.vmdk"},
+                "capacity": 1 << 30,
+                "label": f"Hard disk {i + 1}",
+                "scsi": {"bus": 0, "unit": i},
+                "type": "SCSI",
+            }
+        return self.inventory.objects["vm"][moid]
+
+    def count(self, coroutine):
+        """Run the coroutine and return the number of requests it has sent."""
+        self.simulator.requests.clear()
+        self.result = self.loop.run_until_complete(coroutine)
+        return len(self.simulator.requests)
+
+    async def module(self, module, **params):
+        result = await client.run_module(
+            module, vcenter_hostname=self.hostname, **params
+        )
+        assert not result.get("failed"), result
+        return result
+
+    async def lookup(self, object_type, path):
+        options = dict(
+            client.CREDENTIALS, vcenter_hostname=self.hostname, object_type=object_type
+        )
+        result = await Lookup.entry_point([path], options)
+        assert result
+        return result
+
+
+def depth(path):
+    return len([i for i in path.split("/") if i])
+
+
+@pytest.fixture(scope="module", params=[100, 5000], ids=lambda i: f"{i}vms")
+def env(request):
+    inventory = vcenter.Inventory(
+        vms=request.param, folder_depth=3, folder_fanout=3, items_per_library=10,
+    )
+    with client.running(inventory) as (loop, simulator, hostname):
+        environment = Environment(loop, simulator, hostname)
+        # The authentication is done once per session of the pool
+        first_vm = next(iter(inventory.objects["vm"]))
+        loop.run_until_complete(environment.module(vcenter_vm_power_info, vm=first_vm))
+        yield environment
+
+
+@pytest.fixture(params=[1, 12], ids=lambda i: f"{i}disks")
+def vm(request, env):
+    return env.vm(disks=request.param)
+
+
+def test_vm_info_by_name(env, vm):
+    assert env.count(env.module(vcenter_vm_info, names=[vm["name"]])) <= 1
+
+
+def test_vm_info_by_folder(env, vm):
+    assert env.count(env.module(vcenter_vm_info, folders=[vm["parent"]])) <= 1
+
+
+def test_vm_info_get(env, vm):
+    assert env.count(env.module(vcenter_vm_info, vm=vm["id"])) <= 1
+
+
+def test_vm_info_sharded(env):
+    count = env.count(env.module(vcenter_vm_info))
+    assert len(env.result["value"]) == len(env.inventory.objects["vm"])
+    if len(env.inventory.objects["vm"]) <= vcenter.MAX_LIST_SIZE:
+        assert count <= 1
+    else:
+        datacenters = env.inventory.objects["datacenter"]
+        hosts = env.inventory.objects["host"]
+        # the refused list, then for each level, the shards and their list
+        assert count <= 2 + 2 * len(datacenters) + len(hosts)
+
+
+def test_vm_info_sharded_full_dest(env, vm, tmp_path):
+    dest = str(tmp_path / "vms.jsonl")
+    memory_size = vm["memory_size_MiB"]
+    coroutine = client.run_main(
+        vcenter_vm_info,
+        vcenter_hostname=env.hostname,
+        detail="full",
+        where=[f"memory_size_MiB == {memory_size}"],
+        dest=dest,
+    )
+    count = env.count(coroutine)
+    vms = [
+        i
+        for i in env.inventory.objects["vm"].values()
+        if i["memory_size_MiB"] == memory_size
+    ]
+    # a sharded list is described and streamed like the others
+    assert env.result["count"] == len(vms)
+    with open(dest) as fd:
+        lines = [json.loads(i) for i in fd]
+    assert sorted(i["vm"] for i in lines) == sorted(i["id"] for i in vms)
+    assert all("hardware" in i for i in lines)
+    if len(env.inventory.objects["vm"]) > vcenter.MAX_LIST_SIZE:
+        datacenters = env.inventory.objects["datacenter"]
+        hosts = env.inventory.objects["host"]
+        assert count <= 2 + 2 * len(datacenters) + len(hosts) + len(vms)
+
+
+def test_inventory_snapshot(env):
+    objects = env.inventory.objects
+    count = env.count(env.module(vcenter_inventory_snapshot))
+    # the first round, then the lists by datacenter and by parent, the first
+    # round is reused with a single datacenter
+    assert len(objects["datacenter"]) == 1
+    assert count <= (
+        4
+        + 3
+        + 2 * len(objects["cluster"])
+        + len(objects["host"])
+        + len(objects["resource-pool"])
+    )
+    graph = env.result["value"]
+    assert set(graph["vms"]) == set(objects["vm"])
+    for moid, vm in objects["vm"].items():
+        assert graph["vms"][moid]["host"] == vm["host"]
+        assert graph["vms"][moid]["cluster"] == vm["cluster"]
+        assert graph["vms"][moid]["datacenter"] == vm["datacenter"]
+        assert graph["vms"][moid]["resource_pool"] == vm["resource_pool"]
+    for moid, host in objects["host"].items():
+        assert graph["hosts"][moid]["cluster"] == host["cluster"]
+        assert graph["clusters"][host["cluster"]]["datacenter"] == host["datacenter"]
+    for kind, key in (("datastore", "datastores"), ("network", "networks")):
+        assert set(graph[key]) == set(objects[kind])
+
+
+def test_inventory_snapshot_vm_datastores(env, vm):
+    datacenter = vm["datacenter"]
+    count = env.count(env.module(vcenter_inventory_snapshot, datacenters=[datacenter]))
+    coroutine = env.module(
+        vcenter_inventory_snapshot, datacenters=[datacenter], vm_datastores=True
+    )
+    vms = [
+        i for i in env.inventory.objects["vm"].values() if i["datacenter"] == datacenter
+    ]
+    # then one more request per VM
+    assert env.count(coroutine) <= count + len(vms)
+    graph = env.result["value"]
+    assert set(graph["datacenters"]) == {datacenter}
+    datastore = graph["datastores"][graph["vms"][vm["id"]]["datastores"][0]]
+    assert datastore["datacenter"] == datacenter
+
+
+def test_vm_power_info(env, vm):
+    assert env.count(env.module(vcenter_vm_power_info, vm=vm["id"])) <= 1
+
+
+def test_vm_power_info_map(env, vm):
+    vms = [
+        i for i in env.inventory.objects["vm"].values() if i["parent"] == vm["parent"]
+    ]
+    coroutine = env.module(vcenter_vm_power_info, vms=[i["id"] for i in vms] + ["vm-0"])
+    assert env.count(coroutine) <= 1
+    expected = {i["id"]: i["power_state"] for i in vms}
+    assert env.result["value"] == dict(expected, **{"vm-0": None})
+
+
+def test_vm_power_info_sharded(env):
+    count = env.count(env.module(vcenter_vm_power_info))
+    assert len(env.result["value"]) == len(env.inventory.objects["vm"])
+    if len(env.inventory.objects["vm"]) <= vcenter.MAX_LIST_SIZE:
+        assert count <= 1
+    else:
+        datacenters = env.inventory.objects["datacenter"]
+        hosts = env.inventory.objects["host"]
+        assert count <= 2 + 2 * len(datacenters) + len(hosts)
+
+
+@pytest.mark.parametrize("name", sorted(DEVICE_MODULES) + SETTING_MODULES)
+def test_hardware_info(env, vm, name):
+    module = import_module(name + "_info")
+    assert env.count(env.module(module, vm=vm["id"])) <= 1
+
+
+@pytest.mark.parametrize("name", [k for k, v in DEVICE_MODULES.items() if v])
+def test_device_present_unchanged(env, vm, name):
+    coroutine = env.module(
+        import_module(name), vm=vm["id"], label=DEVICE_MODULES[name], state="present"
+    )
+    # the VM with all its devices, then the update of the matching one
+    assert env.count(coroutine) <= 2
+
+
+@pytest.mark.parametrize("name", sorted(DEVICE_MODULES))
+def test_device_absent_unknown(env, vm, name):
+    coroutine = env.module(
+        import_module(name), vm=vm["id"], label="Unknown device", state="absent"
+    )
+    assert env.count(coroutine) <= 2
+    assert not env.result["changed"]
+
+
+def test_disk_present_new(env, vm):
+    coroutine = env.module(
+        vcenter_vm_hardware_disk,
+        vm=vm["id"],
+        type="SATA",
+        new_vmdk={"capacity": 1 << 30},
+        state="present",
+    )
+    # the creation and the read of the new disk
+    assert env.count(coroutine) <= 2
+
+
+def test_disks_batch(env, vm):
+    disks = [
+        {"label": "Hard disk 1"},
+        {"type": "SCSI", "scsi": {"bus": 0, "unit": 14}, "new_vmdk": {"capacity": 1}},
+        {"type": "SCSI", "scsi": {"bus": 0, "unit": 15}, "new_vmdk": {"capacity": 1}},
+    ]
+    module = vcenter_vm_hardware_disk
+    # the VM with all its disks, then the creation and the read of each new disk
+    assert env.count(env.module(module, vm=vm["id"], disks=disks)) <= 5
+    assert [i["changed"] for i in env.result["value"]] == [False, True, True]
+    new_ids = [i["id"] for i in env.result["value"][1:]]
+    assert env.count(env.module(module, vm=vm["id"], disks=disks)) <= 1
+    assert not env.result["changed"]
+
+    absent = [{"disk": i} for i in new_ids] + [{"label": "Hard disk 99"}]
+    coroutine = env.module(
+        module, vm=vm["id"], disks=absent, state="absent", check_mode=True
+    )
+    assert env.count(coroutine) <= 1
+    assert [i["changed"] for i in env.result["value"]] == [True, True, False]
+    coroutine = env.module(module, vm=vm["id"], disks=absent, state="absent")
+    # the VM, then the removal of each disk
+    assert env.count(coroutine) <= 3
+    assert [i["changed"] for i in env.result["value"]] == [True, True, False]
+    assert not set(new_ids) & set(env.inventory.vm_detail(vm["id"])["disks"])
+
+
+def test_library_item_list(env):
+    library_id = next(iter(env.inventory.libraries))
+    coroutine = env.module(content_library_item_info, library_id=library_id)
+    # the list of the IDs, then one call per item
+    items = [i for i in env.inventory.items.values() if i["library_id"] == library_id]
+    assert env.count(coroutine) <= 1 + len(items)
+
+
+def test_library_item_list_summary(env):
+    library_id = next(iter(env.inventory.libraries))
+    coroutine = env.module(
+        content_library_item_info, library_id=library_id, detail="summary"
+    )
+    assert env.count(coroutine) <= 1
+    assert all(isinstance(i, str) for i in env.result["value"])
+
+
+def test_library_item_list_auto_limit(env, monkeypatch):
+    library_id = next(iter(env.inventory.libraries))
+    monkeypatch.setattr(vmware_rest, "DETAIL_AUTO_LIMIT", 5)
+    coroutine = env.module(content_library_item_info, library_id=library_id)
+    # the list is too large for detail=auto, it is kept, with a warning
+    assert env.count(coroutine) <= 1
+    assert all(isinstance(i, str) for i in env.result["value"])
+    assert "detail=full" in env.result["warnings"][0]
+    coroutine = env.module(
+        content_library_item_info, library_id=library_id, detail="summary"
+    )
+    env.count(coroutine)
+    assert "warnings" not in env.result
+
+
+def test_vm_info_full(env, vm):
+    coroutine = env.module(vcenter_vm_info, folders=[vm["parent"]], detail="full")
+    # the list, then one call per VM
+    vms = [
+        i for i in env.inventory.objects["vm"].values() if i["parent"] == vm["parent"]
+    ]
+    assert env.count(coroutine) <= 1 + len(vms)
+    assert len(env.result["value"]) == len(vms)
+    assert all("hardware" in i for i in env.result["value"])
+
+
+def test_vm_info_full_dest(env, vm, tmp_path):
+    dest = str(tmp_path / "vms.jsonl")
+    fake = client.FakeModule(
+        vcenter_vm_info,
+        vcenter_hostname=env.hostname,
+        folders=[vm["parent"]],
+        detail="full",
+    )
+    fake.result_writer = vmware_rest.JsonLinesWriter(dest)
+
+    sessions = []
+
+    async def run():
+        session = await vmware_rest.open_session(
+            vcenter_hostname=env.hostname,
+            vcenter_username=fake.params["vcenter_username"],
+            vcenter_password=fake.params["vcenter_password"],
+            validate_certs=False,
+        )
+        sessions.append(session)
+        return await vcenter_vm_info.entry_point(fake, session)
+
+    vms = [
+        i for i in env.inventory.objects["vm"].values() if i["parent"] == vm["parent"]
+    ]
+    assert env.count(run()) <= 1 + len(vms)
+    # the descriptions are written as they arrive, the result only has the count
+    assert "value" not in env.result
+    assert fake.result_writer.count == len(vms)
+    # only the list answer is kept, not the descriptions
+    assert len(sessions[0]._flights) <= 1
+    result = fake.result_writer.finish(env.result)
+    assert result["count"] == len(vms)
+    with open(dest) as fd:
+        assert all("hardware" in json.loads(i) for i in fd)
+
+
+def test_vm_info_main_dest(env, vm, tmp_path):
+    dest = str(tmp_path / "vms.jsonl")
+    coroutine = client.run_main(
+        vcenter_vm_info,
+        vcenter_hostname=env.hostname,
+        folders=[vm["parent"]],
+        dest=dest,
+    )
+    vms = [
+        i for i in env.inventory.objects["vm"].values() if i["parent"] == vm["parent"]
+    ]
+    assert env.count(coroutine) <= 1
+    assert env.result == {
+        "changed": True,
+        "failed": False,
+        "dest": dest,
+        "count": len(vms),
+    }
+    with open(dest) as fd:
+        assert sorted(json.loads(i)["vm"] for i in fd) == sorted(i["id"] for i in vms)
+
+    # the same file again
+    coroutine = client.run_main(
+        vcenter_vm_info,
+        vcenter_hostname=env.hostname,
+        folders=[vm["parent"]],
+        dest=dest,
+    )
+    env.count(coroutine)
+    assert not env.result["changed"]
+
+
+def test_vm_info_main_dest_check_mode(env, vm, tmp_path):
+    dest = tmp_path / "vms.jsonl"
+    coroutine = client.run_main(
+        vcenter_vm_info,
+        check_mode=True,
+        vcenter_hostname=env.hostname,
+        folders=[vm["parent"]],
+        dest=str(dest),
+    )
+    env.count(coroutine)
+    assert env.result["changed"]
+    assert env.result["value"]
+    assert not list(tmp_path.iterdir())
+
+
+def test_vm_info_state_file(env, vm, tmp_path):
+    state_file = str(tmp_path / "state.json")
+    vms = [
+        i for i in env.inventory.objects["vm"].values() if i["parent"] == vm["parent"]
+    ]
+    coroutine = env.module(
+        vcenter_vm_info, folders=[vm["parent"]], state_file=state_file
+    )
+    # the summaries are compared without a request per VM
+    assert env.count(coroutine) <= 1
+    assert len(env.result["added"]) == len(env.result["value"]) == len(vms)
+
+    power_state = vms[0]["power_state"]
+    vms[0]["power_state"] = "SUSPENDED"
+    try:
+        coroutine = env.module(
+            vcenter_vm_info, folders=[vm["parent"]], state_file=state_file
+        )
+        assert env.count(coroutine) <= 1
+    finally:
+        vms[0]["power_state"] = power_state
+    assert [i["vm"] for i in env.result["value"]] == [vms[0]["id"]]
+    assert env.result["modified"] == [vms[0]["id"]]
+    assert env.result["added"] == env.result["removed"] == []
+
+
+def test_vm_info_state_file_full(env, vm, tmp_path):
+    state_file = str(tmp_path / "state.json")
+    vms = [
+        i for i in env.inventory.objects["vm"].values() if i["parent"] == vm["parent"]
+    ]
+    coroutine = env.module(
+        vcenter_vm_info, folders=[vm["parent"]], detail="full", state_file=state_file
+    )
+    assert env.count(coroutine) <= 1 + len(vms)
+    assert len(env.result["added"]) == len(vms)
+
+    # the descriptions are compared, a change of the summary is seen
+    coroutine = env.module(
+        vcenter_vm_info, folders=[vm["parent"]], detail="full", state_file=state_file
+    )
+    assert env.count(coroutine) <= 1 + len(vms)
+    assert env.result["value"] == []
+
+    power_state = vms[0]["power_state"]
+    vms[0]["power_state"] = "SUSPENDED"
+    try:
+        coroutine = env.module(
+            vcenter_vm_info,
+            folders=[vm["parent"]],
+            detail="full",
+            state_file=state_file,
+        )
+        assert env.count(coroutine) <= 1 + len(vms)
+    finally:
+        vms[0]["power_state"] = power_state
+    assert [i["vm"] for i in env.result["value"]] == [vms[0]["id"]]
+    assert "hardware" in env.result["value"][0]
+    assert env.result["modified"] == [vms[0]["id"]]
+
+
+def test_vm_info_state_file_detail_only(env, vm, tmp_path):
+    state_file = str(tmp_path / "state.json")
+    params = {"folders": [vm["parent"]], "detail": "full", "state_file": state_file}
+    disks = env.inventory.vm_detail(vm["id"])["disks"]
+    new_disk = dict(disks["2000"], label="Hard disk 99", scsi={"bus": 0, "unit": 15})
+    for include in ([], ["tools"]):
+        env.count(env.module(vcenter_vm_info, include=include, **params))
+        assert env.result["added"] or env.result["modified"]
+
+        # a new disk, the summary of the VM is the same
+        disks["2099"] = new_disk
+        try:
+            env.count(env.module(vcenter_vm_info, include=include, **params))
+        finally:
+            del disks["2099"]
+        assert [i["vm"] for i in env.result["value"]] == [vm["id"]]
+        assert env.result["modified"] == [vm["id"]]
+        assert env.result["added"] == env.result["removed"] == []
+
+
+def test_vm_info_where(env, vm):
+    memory_size = vm["memory_size_MiB"]
+    coroutine = env.module(
+        vcenter_vm_info,
+        folders=[vm["parent"]],
+        detail="full",
+        where=[f"memory_size_MiB == {memory_size}", "guest_OS startswith RHEL"],
+    )
+    vms = [
+        i
+        for i in env.inventory.objects["vm"].values()
+        if i["parent"] == vm["parent"] and i["memory_size_MiB"] == memory_size
+    ]
+    # the list, then only the descriptions of the VMs of that memory size
+    assert env.count(coroutine) <= 1 + len(vms)
+    assert sorted(i["vm"] for i in env.result["value"]) == sorted(i["id"] for i in vms)
+
+    coroutine = env.module(
+        vcenter_vm_info,
+        folders=[vm["parent"]],
+        where=[f"memory_size_MiB == {memory_size}", "guest_OS startswith WINDOWS"],
+    )
+    # guest_OS is not in the summary, it is fetched like with include
+    assert env.count(coroutine) <= 1 + len(vms)
+    assert env.result["value"] == []
+
+
+def test_vm_info_where_keys(env, vm, tmp_path):
+    params = {
+        "folders": [vm["parent"]],
+        "include": ["tools"],
+        "where": ["guest_OS startswith RHEL", "disks.2000.capacity > 0"],
+    }
+    coroutine = env.module(vcenter_vm_info, **params)
+    env.count(coroutine)
+    assert env.result["value"]
+    # guest_OS and disks are only fetched to check the conditions
+    for entry in env.result["value"]:
+        assert "tools" in entry
+        assert "guest_OS" not in entry and "disks" not in entry
+
+    dest = str(tmp_path / "vms.jsonl")
+    coroutine = client.run_main(
+        vcenter_vm_info, vcenter_hostname=env.hostname, dest=dest, **params
+    )
+    env.count(coroutine)
+    with open(dest) as fd:
+        entries = [json.loads(i) for i in fd]
+    assert len(entries) == env.result["count"] > 0
+    for entry in entries:
+        assert "tools" in entry
+        assert "guest_OS" not in entry and "disks" not in entry
+
+
+def test_vm_info_include(env, vm):
+    include = ["disks", "nics", "tools", "guest_identity"]
+    coroutine = env.module(vcenter_vm_info, vm=vm["id"], include=include)
+    # the description, then one call per sub-resource
+    assert env.count(coroutine) <= 3
+    assert set(include) <= set(env.result["value"])
+
+
+def test_vm_info_list_include(env, vm):
+    include = ["disks", "tools", "guest_interfaces"]
+    coroutine = env.module(vcenter_vm_info, folders=[vm["parent"]], include=include)
+    vms = [
+        i for i in env.inventory.objects["vm"].values() if i["parent"] == vm["parent"]
+    ]
+    # the list, then for each VM its description and the sub-resources
+    assert env.count(coroutine) <= 1 + 3 * len(vms)
+    for entry in env.result["value"]:
+        assert entry["disks"] and entry["tools"]
+        assert (entry["guest_interfaces"] is None) == (
+            entry["power_state"] != "POWERED_ON"
+        )
+
+
+def test_lookup_vm(env, vm):
+    path = env.inventory.path("vm", vm["id"])
+    # one call per level of the path, the VM and the datacenter
+    assert env.count(env.lookup("vm", path)) <= depth(path) + 2
+
+
+def test_lookup_folder(env, vm):
+    path = env.inventory.path("folder", vm["parent"])
+    assert env.count(env.lookup("folder", path)) <= depth(path) + 2
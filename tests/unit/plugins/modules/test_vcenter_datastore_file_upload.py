@@ -0,0 +1,108 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import time
+
+import pytest
+
+from ansible_collections.vmware.vmware_rest.plugins.modules import (
+    vcenter_datastore_file_upload,
+)
+from ansible_collections.vmware.vmware_rest.tests.simulator import client, vcenter
+
+ISO = bytes(range(256)) * 40
+KEY = ("my_dc", "datastore0", "isos/my.iso")
+
+
+@pytest.fixture
+def env(start_simulator, tmp_path):
+    src = tmp_path / "my.iso"
+    src.write_bytes(ISO)
+    # the local file was written before the remote copy
+    os.utime(src, (time.time() - 60, time.time() - 60))
+    loop, simulator, hostname = start_simulator(vcenter.Inventory(vms=10))
+    return loop, simulator, hostname, src
+
+
+def upload(env, **params):
+    loop, simulator, hostname, src = env
+    simulator.requests.clear()
+    params.setdefault("src", str(src))
+    return loop.run_until_complete(
+        client.run_module(
+            vcenter_datastore_file_upload,
+            vcenter_hostname=hostname,
+            datacenter=KEY[0],
+            datastore=KEY[1],
+            path=KEY[2],
+            **params,
+        )
+    )
+
+
+def methods(simulator):
+    return [i[0] for i in simulator.requests if i[1].startswith("/folder/")]
+
+
+def test_upload(env):
+    simulator = env[1]
+    result = upload(env)
+    assert result["changed"] and not result.get("failed"), result
+    assert result["value"] == {
+        "datastore_path": "[datastore0] isos/my.iso",
+        "size": 10240,
+    }
+    assert simulator.inventory.datastore_files[KEY] == ISO
+    assert methods(simulator) == ["HEAD", "PUT"]
+
+
+def test_unchanged(env):
+    simulator = env[1]
+    upload(env)
+    result = upload(env)
+    assert not result["changed"]
+    # the size and the modification time are enough, nothing is read back
+    assert methods(simulator) == ["HEAD"]
+
+
+def test_local_file_modified(env):
+    simulator, src = env[1], env[3]
+    upload(env)
+    src.write_bytes(ISO[::-1])
+    os.utime(src, (time.time() + 60, time.time() + 60))
+    result = upload(env)
+    assert result["changed"]
+    assert simulator.inventory.datastore_files[KEY] == ISO[::-1]
+
+
+def test_compare_checksum(env):
+    simulator = env[1]
+    upload(env)
+    result = upload(env, compare_checksum=True)
+    assert not result["changed"]
+    assert methods(simulator) == ["HEAD", "GET"]
+    assert len(result["value"]["checksum"]) == 64
+
+    # a remote file of the same size, more recent, with another content
+    simulator.inventory.datastore_files[KEY] = ISO[::-1]
+    assert not upload(env)["changed"]
+    result = upload(env, compare_checksum=True)
+    assert result["changed"]
+    assert simulator.inventory.datastore_files[KEY] == ISO
+
+
+def test_check_mode(env):
+    simulator = env[1]
+    result = upload(env, check_mode=True)
+    assert result["changed"]
+    assert KEY not in simulator.inventory.datastore_files
+
+
+def test_missing_src(env, tmp_path):
+    result = upload(env, src=str(tmp_path / "missing.iso"))
+    assert result["failed"]
@@ -0,0 +1,70 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+
+import pytest
+
+from ansible_collections.vmware.vmware_rest.plugins.modules import (
+    vcenter_inventory_snapshot,
+)
+from ansible_collections.vmware.vmware_rest.tests.simulator import client, vcenter
+
+
+@pytest.fixture
+def env(start_simulator):
+    return start_simulator(vcenter.Inventory(vms=20, datacenters=2))
+
+
+def snapshot(env, **params):
+    loop, simulator, hostname = env
+    simulator.requests.clear()
+    return loop.run_until_complete(
+        client.run_module(
+            vcenter_inventory_snapshot, vcenter_hostname=hostname, **params
+        )
+    )
+
+
+def lists(simulator, path):
+    return [i for i in simulator.requests if i[1].split("?")[0] == path]
+
+
+def test_datacenters(env):
+    simulator = env[1]
+    objects = simulator.inventory.objects
+    result = snapshot(env)
+    assert not result.get("failed"), result
+    graph = result["value"]
+    for kind, key in (("cluster", "clusters"), ("host", "hosts")):
+        for moid, obj in objects[kind].items():
+            assert graph[key][moid]["datacenter"] == obj["datacenter"]
+    for moid, vm in objects["vm"].items():
+        assert graph["vms"][moid]["datacenter"] == vm["datacenter"]
+    # the first round, then once per datacenter
+    assert len(lists(simulator, "/api/vcenter/cluster")) == 1 + 2
+
+
+def test_single_datacenter(env):
+    simulator = env[1]
+    objects = simulator.inventory.objects
+    datacenter = next(iter(objects["datacenter"]))
+    result = snapshot(env, datacenters=[datacenter])
+    graph = result["value"]
+    assert set(graph["datacenters"]) == {datacenter}
+    assert {i["datacenter"] for i in graph["hosts"].values()} == {datacenter}
+    assert {i["datacenter"] for i in graph["vms"].values()} == {datacenter}
+    # the lists of the first round are reused
+    assert len(lists(simulator, "/api/vcenter/cluster")) == 1
+    assert len(lists(simulator, "/api/vcenter/host")) == 1 + len(graph["clusters"])
+
+
+def test_failed_list(env, monkeypatch):
+    monkeypatch.setattr(vcenter, "MAX_LIST_SIZE", 1)
+    result = snapshot(env)
+    assert result["failed"]
+    assert not result["changed"]
+    assert "Request has failed: GET" in result["msg"]
@@ -0,0 +1,225 @@
+# Copyright: (c) 2021, Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import copy
+
+import pytest
+
+from ansible_collections.vmware.vmware_rest.plugins.modules import (
+    vcenter_vm_hardware_profile,
+)
+from ansible_collections.vmware.vmware_rest.plugins.modules.vcenter_vm_hardware_profile import (
+    plan_changes,
+)
+from ansible_collections.vmware.vmware_rest.tests.simulator import client, vcenter
+
+HARDWARE = {
+    "cpu": {
+        "cores_per_socket": 1,
+        "count": 2,
+        "hot_add_enabled": False,
+        "hot_remove_enabled": False,
+    },
+    "memory": {"hot_add_enabled": False, "size_MiB": 4096},
+    "scsi_adapters": {
+        "1000": {
+            "label": "SCSI controller 0",
+            "scsi": {"bus": 0, "unit": 7},
+            "sharing": "NONE",
+            "type": "PVSCSI",
+        }
+    },
+    "sata_adapters": {},
+    "disks": {
+        "2000": {
+            "label": "Hard disk 1",
+            "scsi": {"bus": 0, "unit": 0},
+            "type": "SCSI",
+        },
+        "2001": {
+            "label": "Hard disk 2",
+            "scsi": {"bus": 0, "unit": 1},
+            "type": "SCSI",
+        },
+    },
+    "nics": {
+        "4000": {
+            "label": "Network adapter 1",
+            "pci_slot_number": 160,
+            "start_connected": False,
+            "type": "VMXNET3",
+        }
+    },
+    "cdroms": {},
+}
+
+
+def plan(purge=False, **profile):
+    params = {
+        "cdroms": None,
+        "cpu": None,
+        "disks": None,
+        "memory": None,
+        "nics": None,
+        "purge": purge,
+        "sata_adapters": None,
+        "scsi_adapters": None,
+    }
+    params.update(copy.deepcopy(profile))
+    first, second = plan_changes(params, copy.deepcopy(HARDWARE))
+    return (
+        [(i["operation"], i["device"], i["id"], i["payload"]) for i in first],
+        [(i["operation"], i["device"], i["id"], i["payload"]) for i in second],
+    )
+
+
+def test_unchanged():
+    first, second = plan(
+        cpu={"count": 2},
+        disks=[{"label": "Hard disk 1"}, {"scsi": {"bus": 0, "unit": 1}}],
+        nics=[{"pci_slot_number": 160, "start_connected": False}],
+    )
+    assert first == second == []
+
+
+def test_add():
+    first, second = plan(
+        scsi_adapters=[{"bus": 1, "type": "PVSCSI"}],
+        disks=[
+            {"label": "Hard disk 3", "type": "SCSI", "new_vmdk": {"capacity": 1}},
+            {
+                "label": "Hard disk 4",
+                "type": "SCSI",
+                "scsi": {"bus": 1},
+                "new_vmdk": {"capacity": 2},
+            },
+            {
+                "label": "Hard disk 5",
+                "type": "SCSI",
+                "scsi": {"bus": 1},
+                "new_vmdk": {"capacity": 3},
+            },
+        ],
+    )
+    # the adapter first, then the disks, each one with its own slot
+    assert first == [("create", "scsi_adapters", None, {"bus": 1, "type": "PVSCSI"})]
+    assert second == [
+        (
+            "create",
+            "disks",
+            None,
+            {
+                "new_vmdk": {"capacity": 1},
+                "scsi": {"bus": 0, "unit": 2},
+                "type": "SCSI",
+            },
+        ),
+        (
+            "create",
+            "disks",
+            None,
+            {
+                "new_vmdk": {"capacity": 2},
+                "scsi": {"bus": 1, "unit": 0},
+                "type": "SCSI",
+            },
+        ),
+        (
+            "create",
+            "disks",
+            None,
+            {
+                "new_vmdk": {"capacity": 3},
+                "scsi": {"bus": 1, "unit": 1},
+                "type": "SCSI",
+            },
+        ),
+    ]
+
+
+def test_update():
+    first, second = plan(
+        cpu={"count": 4, "cores_per_socket": 1},
+        memory={"size_MiB": 4096},
+        nics=[{"label": "Network adapter 1", "start_connected": True}],
+    )
+    assert first == [("update", "cpu", None, {"count": 4})]
+    assert second == [("update", "nics", "4000", {"start_connected": True})]
+
+
+def test_remove():
+    first, second = plan(
+        purge=True,
+        disks=[
+            {"label": "Hard disk 1"},
+            {"label": "Hard disk 3", "type": "SCSI", "new_vmdk": {"capacity": 1}},
+        ],
+        cdroms=[],
+    )
+    # Hard disk 2 goes away, the new disk gets its slot
+    assert first == [("delete", "disks", "2001", {})]
+    assert second == [
+        (
+            "create",
+            "disks",
+            None,
+            {
+                "new_vmdk": {"capacity": 1},
+                "scsi": {"bus": 0, "unit": 1},
+                "type": "SCSI",
+            },
+        )
+    ]
+
+
+def test_remove_adapter():
+    first, second = plan(purge=True, scsi_adapters=[], disks=[])
+    # the disks go away before their adapter
+    assert first == [("delete", "disks", "2000", {}), ("delete", "disks", "2001", {})]
+    assert second == [("delete", "scsi_adapters", "1000", {})]
+
+
+@pytest.fixture
+def env(start_simulator):
+    return start_simulator(vcenter.Inventory(vms=1))
+
+
+def apply(env, **params):
+    loop, simulator, hostname = env
+    vm = next(iter(simulator.inventory.objects["vm"]))
+    return loop.run_until_complete(
+        client.run_module(
+            vcenter_vm_hardware_profile, vcenter_hostname=hostname, vm=vm, **params
+        )
+    )
+
+
+def test_not_designated(env):
+    result = apply(env, disks=[{"type": "SCSI", "new_vmdk": {"capacity": 1}}])
+    assert result["failed"]
+    assert "Each entry of disks needs a disk" in result["msg"]
+    result = apply(env, disks=[{"scsi": {"bus": 0}, "new_vmdk": {"capacity": 1}}])
+    assert result["failed"]
+
+
+@pytest.mark.parametrize("purge", [False, True])
+def test_rerun(env, purge):
+    disks = [
+        {"label": "Hard disk 1"},
+        {"type": "SCSI", "scsi": {"bus": 0, "unit": 1}, "new_vmdk": {"capacity": 1}},
+        {"type": "SCSI", "scsi": {"bus": 0, "unit": 2}, "new_vmdk": {"capacity": 2}},
+    ]
+    result = apply(env, purge=purge, disks=disks)
+    assert result["changed"]
+    assert [i["operation"] for i in result["changes"]] == ["create", "create"]
+    value = result["value"]
+    assert len(value["disks"]) == 3
+    # the disks created by the first run are matched by the next ones
+    for _ in range(2):
+        result = apply(env, purge=purge, disks=disks)
+        assert not result["changed"], result["changes"]
+        assert result["value"]["disks"] == value["disks"]